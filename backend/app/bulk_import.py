@@ -0,0 +1,195 @@
+"""
+Prompt 的批量导入（NDJSON）
+
+每行一个 Prompt，字段与导出一致（多余字段忽略），分组和标签按名称匹配，不存在时创建。
+按 IMPORT_BATCH_SIZE 行一批、每批一个事务写入：
+- 分组、标签：INSERT ... ON CONFLICT DO NOTHING 一条语句创建缺少的，再一次查询取回 id
+- Prompt：多行 INSERT ... RETURNING id
+- 标签关联：一条多行 INSERT
+每批的语句数与行数无关。格式或校验错误的行单独报告，不影响其他行；
+一批写入失败时回滚并逐行重试，定位出错的记录。
+压缩数据中途损坏时，出错位置之前的完整行照常写入，之后的数据不再读取，结果的 aborted 记录出错的行号。
+
+写入逻辑基于同步会话，接口通过 AsyncSession.run_sync 调用，与命令行共用。
+"""
+import logging
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.export import UnsupportedCompressionError, zstandard
+from app.models import Prompt, PromptGroup, PromptTag, prompt_tag_relations
+from app.schemas import ImportRecordError, ImportResponse, PromptImportRecord
+from app.search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+
+class CorruptInputError(Exception):
+    """压缩数据无法解压，line 为出错位置所在的行号"""
+
+    def __init__(self, message: str, line: int):
+        super().__init__(message)
+        self.line = line
+
+
+class NdjsonReader:
+    """增量解压并按行切分，返回 (行号, 行内容)，跳过空行"""
+
+    def __init__(self, compression: str = "none"):
+        if compression == "gzip":
+            self._decompressor = zlib.decompressobj(47)  # 自动识别 gzip / zlib 头
+        elif compression == "zstd":
+            if zstandard is None:
+                raise UnsupportedCompressionError("服务端未安装 zstandard，不支持 zstd 压缩")
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self._decompressor = None
+        self._buffer = b""
+        self._line_no = 0
+
+    def _lines(self, lines: List[bytes]) -> List[Tuple[int, bytes]]:
+        numbered = []
+        for line in lines:
+            self._line_no += 1
+            if line.strip():
+                numbered.append((self._line_no, line))
+        return numbered
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        if self._decompressor is not None:
+            try:
+                data = self._decompressor.decompress(data)
+            except Exception as e:
+                raise CorruptInputError(f"数据解压失败: {e}", self._line_no + 1)
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        return self._lines(lines)
+
+    def finish(self) -> List[Tuple[int, bytes]]:
+        lines, self._buffer = [self._buffer], b""
+        return self._lines(lines)
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        location = ".".join(str(part) for part in first["loc"])
+        return f"{location}: {first['msg']}" if location else first["msg"]
+    return str(getattr(error, "orig", None) or error)
+
+
+def _insert_prompts(db: Session, rows: List[dict]) -> List[int]:
+    """多行插入 Prompt，返回与 rows 顺序一致的 id"""
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(insert(Prompt).returning(Prompt.id, sort_by_parameter_order=True), rows).scalars().all()
+    # SQLite 不保证 RETURNING 的行序（要求按参数顺序时 SQLAlchemy 会退化为逐行插入），
+    # 但写事务独占数据库，同一事务插入的 rowid 按插入顺序递增
+    return sorted(db.execute(insert(Prompt).returning(Prompt.id), rows).scalars().all())
+
+
+class BulkImporter:
+    """
+    批量导入，逐行 parse 后按批调用 import_batch
+    分组、标签的名称到 id 的映射在批次之间缓存（只缓存已提交的）
+    """
+
+    def __init__(self):
+        self.result = ImportResponse()
+        self._group_ids: Dict[str, int] = {}
+        self._tag_ids: Dict[str, int] = {}
+
+    def _error(self, line: int, error: Exception) -> None:
+        self.result.failed += 1
+        self.result.errors.append(ImportRecordError(line=line, error=_describe(error)))
+
+    def abort(self, error: CorruptInputError) -> None:
+        """记录导入中止的位置，之前写入的批次已提交"""
+        self.result.aborted = ImportRecordError(line=error.line, error=str(error))
+
+    def parse(self, lines: Iterable[Tuple[int, bytes]]) -> List[Tuple[int, PromptImportRecord]]:
+        """解析并校验各行，错误的行记录到结果中"""
+        records = []
+        for line_no, line in lines:
+            self.result.total += 1
+            try:
+                records.append((line_no, PromptImportRecord.model_validate_json(line)))
+            except ValidationError as e:
+                self._error(line_no, e)
+        return records
+
+    def _resolve(self, db: Session, model, cache: Dict[str, int], items: Dict[str, dict]) -> Dict[str, int]:
+        """按名称获取 id，不存在的一条语句创建"""
+        resolved = {name: cache[name] for name in items if name in cache}
+        missing = [values for name, values in items.items() if name not in cache]
+        if not missing:
+            return resolved
+        db.execute(dialect_insert(db, model).values(missing).on_conflict_do_nothing(index_elements=[model.name]))
+        names = [values["name"] for values in missing]
+        resolved.update(db.execute(select(model.name, model.id).where(model.name.in_(names))).all())
+        return resolved
+
+    def _write(self, db: Session, batch: List[Tuple[int, PromptImportRecord]]) -> Tuple[List[int], dict, dict]:
+        groups = {}
+        tags = {}
+        for _, record in batch:
+            if record.group is not None:
+                groups.setdefault(record.group.name, record.group.model_dump())
+            for tag in record.tags:
+                tags.setdefault(tag.name, tag.model_dump())
+        group_ids = self._resolve(db, PromptGroup, self._group_ids, groups)
+        tag_ids = self._resolve(db, PromptTag, self._tag_ids, tags)
+
+        now = datetime.utcnow()
+        prompt_ids = _insert_prompts(db, [
+            dict(
+                name=record.name,
+                content=record.content,
+                description=record.description,
+                group_id=group_ids[record.group.name] if record.group is not None else None,
+                usage_count=record.usage_count,
+                created_at=record.created_at or now,
+                updated_at=record.updated_at or record.created_at or now,
+            )
+            for _, record in batch
+        ])
+
+        relations = [
+            dict(prompt_id=prompt_id, tag_id=tag_id)
+            for prompt_id, (_, record) in zip(prompt_ids, batch)
+            for tag_id in dict.fromkeys(tag_ids[tag.name] for tag in record.tags)
+        ]
+        if relations:
+            db.execute(insert(prompt_tag_relations), relations)
+        return prompt_ids, group_ids, tag_ids
+
+    def import_batch(self, db: Session, batch: List[Tuple[int, PromptImportRecord]]) -> None:
+        """
+        在一个事务中写入一批记录并提交
+        失败时回滚，多于一条时逐条重试以定位出错的记录
+        """
+        if not batch:
+            return
+        try:
+            prompt_ids, group_ids, tag_ids = self._write(db, batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                self._error(batch[0][0], e)
+                return
+            logger.warning(f"批量导入写入失败，逐条重试: {_describe(e)}")
+            for item in batch:
+                self.import_batch(db, [item])
+            return
+
+        self._group_ids.update(group_ids)
+        self._tag_ids.update(tag_ids)
+        self.result.imported += len(prompt_ids)
+        # 绕过了 ORM 单元工作，手动更新进程内搜索索引
+        search_index.refresh(db, prompt_ids)
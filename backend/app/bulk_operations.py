@@ -0,0 +1,112 @@
+"""
+Prompt 的批量操作
+
+每个操作是一条集合式 SQL（UPDATE / INSERT ... SELECT / DELETE），不加载 ORM 对象，
+返回实际影响的行数；单个 Prompt 的标签按差异更新。新增标签关联使用 ON CONFLICT DO NOTHING，
+并发请求插入相同的关联时跳过而不是违反唯一索引。调用方负责校验分组、标签存在以及提交事务；
+这些语句绕过了 ORM 单元工作，提交后需调用 refresh_search_index 更新进程内搜索索引。
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models import Prompt, PromptTag, prompt_tag_relations
+from app.search_index import search_index
+from app.taxonomy import taxonomy
+
+async def _rowcount(db: AsyncSession, stmt) -> int:
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+def _insert_relations(db: AsyncSession):
+    """插入标签关联的语句，已存在的 (prompt_id, tag_id) 跳过"""
+    return dialect_insert(db, prompt_tag_relations).on_conflict_do_nothing(index_elements=["prompt_id", "tag_id"])
+
+
+async def soft_delete(db: AsyncSession, ids: List[int]) -> int:
+    """软删除未删除的 Prompt"""
+    return await _rowcount(db, update(Prompt).where(
+        Prompt.id.in_(ids),
+        Prompt.deleted_at.is_(None)
+    ).values(deleted_at=datetime.utcnow()))
+
+
+async def restore(db: AsyncSession, ids: List[int]) -> int:
+    """恢复已软删除的 Prompt"""
+    return await _rowcount(db, update(Prompt).where(
+        Prompt.id.in_(ids),
+        Prompt.deleted_at.is_not(None)
+    ).values(deleted_at=None))
+
+
+async def move_to_group(db: AsyncSession, ids: List[int], group_id: Optional[int]) -> int:
+    """移动到分组（None 表示移出分组），已在目标分组的不计入"""
+    return await _rowcount(db, update(Prompt).where(
+        Prompt.id.in_(ids),
+        Prompt.deleted_at.is_(None),
+        Prompt.group_id.is_distinct_from(group_id)
+    ).values(group_id=group_id))
+
+
+async def add_tags(db: AsyncSession, ids: List[int], tag_ids: List[int]) -> int:
+    """为 Prompt 添加标签，已有的关联跳过，返回新增的关联数"""
+    # Prompt 与标签的笛卡尔积中尚未关联的组合
+    pairs = select(Prompt.id, PromptTag.id).join(PromptTag, true()).where(
+        Prompt.id.in_(ids),
+        Prompt.deleted_at.is_(None),
+        PromptTag.id.in_(tag_ids),
+        ~exists().where(and_(
+            prompt_tag_relations.c.prompt_id == Prompt.id,
+            prompt_tag_relations.c.tag_id == PromptTag.id
+        ))
+    )
+    return await _rowcount(db, _insert_relations(db).from_select(["prompt_id", "tag_id"], pairs))
+
+
+async def remove_tags(db: AsyncSession, ids: List[int], tag_ids: List[int]) -> int:
+    """移除 Prompt 的标签，返回删除的关联数"""
+    live_ids = select(Prompt.id).where(Prompt.id.in_(ids), Prompt.deleted_at.is_(None))
+    return await _rowcount(db, delete(prompt_tag_relations).where(
+        prompt_tag_relations.c.prompt_id.in_(live_ids),
+        prompt_tag_relations.c.tag_id.in_(tag_ids)
+    ))
+
+
+class TagNotFoundError(Exception):
+    """要添加的标签不存在"""
+
+
+async def set_prompt_tags(db: AsyncSession, prompt_id: int, tag_ids: List[int]) -> Tuple[List[int], List[int]]:
+    """
+    把 Prompt 的标签更新为 tag_ids：按差异只插入新增的关联、只删除移除的关联
+    返回 (新增的标签id, 移除的标签id)；新增的标签不存在时抛出 TagNotFoundError
+    """
+    current = set((await db.execute(
+        select(prompt_tag_relations.c.tag_id).where(prompt_tag_relations.c.prompt_id == prompt_id)
+    )).scalars())
+    requested = list(dict.fromkeys(tag_ids))
+    added = [tag_id for tag_id in requested if tag_id not in current]
+    removed = sorted(current - set(requested))
+
+    if added:
+        if await taxonomy.missing_tags(db, added):
+            raise TagNotFoundError("部分标签不存在")
+        await db.execute(_insert_relations(db), [
+            dict(prompt_id=prompt_id, tag_id=tag_id) for tag_id in added
+        ])
+    if removed:
+        await _rowcount(db, delete(prompt_tag_relations).where(
+            prompt_tag_relations.c.prompt_id == prompt_id,
+            prompt_tag_relations.c.tag_id.in_(removed)
+        ))
+    return added, removed
+
+
+async def refresh_search_index(db: AsyncSession, ids: List[int]) -> None:
+    """提交后按 id 重新加载进程内搜索索引"""
+    if search_index.ready:
+        await db.run_sync(search_index.refresh, ids)
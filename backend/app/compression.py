@@ -0,0 +1,179 @@
+"""
+响应压缩中间件
+
+按请求的 Accept-Encoding 协商 zstd / br / gzip（按 COMPRESSION_ENCODINGS 的优先级，
+zstd 需要安装 zstandard，br 需要安装 brotli，未安装的编码不参与协商）：
+- 一次性响应体小于 COMPRESSION_MINIMUM_SIZE 时不压缩
+- 流式响应（如导出）逐块压缩并刷出，客户端可以边收边解压
+- 已有 Content-Encoding、已压缩的内容类型（图片、压缩包等）和排除的路径（/uploads）不压缩
+"""
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.export import zstandard
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时不支持 br
+    brotli = None
+
+# 不压缩的状态码：无响应体、范围响应
+SKIP_STATUS = {204, 206, 304}
+
+
+def available_encodings() -> List[str]:
+    """当前环境可用的编码，按配置的优先级排列"""
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in settings.COMPRESSION_ENCODINGS if installed.get(encoding)]
+
+
+def negotiate(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    """
+    按 Accept-Encoding 选择编码：q 值最高的，q 值相同时按 encodings 的顺序
+    没有可接受的编码时返回 None
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Encoder:
+    """增量编码器：compress 可选刷出完整的块，finish 结束压缩流"""
+
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+        self.encoding = encoding
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + (self._obj.flush() if flush else b"")
+        chunk = self._obj.compress(data)
+        return chunk + self._obj.flush(self._flush_mode) if flush else chunk
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return not any(content_type.startswith(prefix) for prefix in settings.COMPRESSION_EXCLUDED_TYPES)
+
+
+class CompressionMiddleware:
+    """协商压缩响应体的 ASGI 中间件"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or any(
+            scope["path"].startswith(prefix) for prefix in settings.COMPRESSION_EXCLUDED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self.app, encoding)(scope, receive, send)
+
+
+class _CompressedResponse:
+    """单个响应的压缩状态：收到第一块响应体后决定是否压缩"""
+
+    def __init__(self, app: ASGIApp, encoding: str):
+        self.app = app
+        self.encoding = encoding
+        self.send = None
+        self.start: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _start_compressed(self, headers: MutableHeaders) -> None:
+        self.encoder = Encoder(self.encoding)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # 压缩后的表示与原表示字节不同，强 ETag 改为弱 ETag
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # 等第一块响应体确定大小后再发送响应头
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = message["status"] in SKIP_STATUS or not _compressible(headers)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if self.passthrough or (not more_body and len(body) < settings.COMPRESSION_MINIMUM_SIZE):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            self._start_compressed(headers)
+            if more_body:
+                # 流式响应：长度未知，逐块压缩刷出
+                del headers["Content-Length"]
+            else:
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+        elif self.passthrough:
+            await self.send(message)
+            return
+
+        chunk = self.encoder.compress(body, flush=more_body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
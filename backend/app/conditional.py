@@ -0,0 +1,57 @@
+"""
+列表接口的条件请求（ETag / If-None-Match）
+
+弱 ETag 由请求路径、查询参数和接口所依赖数据表的版本号（table_versions，写入提交时递增）计算。
+If-None-Match 匹配时在执行列表查询之前返回 304，数据未变化的轮询只需一次按主键的版本号查询；
+版本号保存在数据库中，多个 worker 之间一致。
+使用次数的变化（增量和回写）不改变版本号：304 对应的 usage_count 可能落后，直到这些表有其他写入。
+"""
+import hashlib
+from typing import Dict
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.static_files import etag_matches
+from app.versions import load_versions
+
+# 客户端可以缓存，但每次使用前需重新验证
+CACHE_CONTROL = "no-cache"
+
+# Prompt 列表、搜索结果依赖的表，任一表有写入提交时 ETag 变化
+PROMPT_LIST_TABLES = ("prompts", "prompt_groups", "prompt_tags", "prompt_tag_relations", "prompt_images")
+# 详情还包含效果图的变体
+PROMPT_DETAIL_TABLES = (*PROMPT_LIST_TABLES, "image_variants")
+
+
+def make_etag(request: Request, versions: tuple) -> str:
+    query = sorted(request.query_params.multi_items())
+    key = f"{request.url.path}?{query}#{versions}"
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return if_none_match is not None and etag_matches(if_none_match, etag)
+
+
+class Conditional:
+    """
+    条件请求依赖：计算 ETag，If-None-Match 匹配时直接返回 304，否则写入响应头并返回 ETag
+    接口直接返回 Response 时需自行加上 cache_headers(etag)
+    """
+
+    def __init__(self, *tables: str):
+        self.tables = tables
+
+    async def __call__(self, request: Request, response: Response, db: AsyncSession = Depends(get_db)) -> str:
+        etag = make_etag(request, await load_versions(db, self.tables))
+        if not_modified(request, etag):
+            raise HTTPException(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
+        return etag
@@ -1,12 +1,30 @@
 """
 数据库连接和会话管理
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, exists, inspect, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-# 创建数据库引擎
+# 异步驱动映射：PostgreSQL 使用 asyncpg，SQLite（本地/测试）使用 aiosqlite
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """将同步数据库URL转换为对应的异步驱动URL"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# 创建数据库引擎（同步：启动建表、索引构建及命令行脚本使用）
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -15,16 +33,83 @@ engine = create_engine(
     echo=settings.ENVIRONMENT == "development"
 )
 
+# 创建异步数据库引擎（API请求使用，数据库往返不阻塞事件循环）
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+# aiosqlite 默认不使用连接池，不接受连接池大小参数
+async_pool_options = {} if ASYNC_DATABASE_URL.startswith("sqlite") else {"pool_size": 10, "max_overflow": 20}
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    echo=settings.ENVIRONMENT == "development",
+    **async_pool_options
+)
+
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 提交后不过期对象：异步会话中访问过期属性会触发隐式IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # 创建基础模型类
 Base = declarative_base()
 
-# 依赖注入：获取数据库会话
-def get_db():
-    db = SessionLocal()
-    try:
+# 依赖注入：获取异步数据库会话
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def dialect_insert(session_or_bind, table):
+    """
+    创建支持 on_conflict_do_nothing / on_conflict_do_update 的 INSERT 语句
+    session_or_bind 为会话（同步或异步）或连接，按其数据库方言选择 PostgreSQL 或 SQLite 的 insert
+    """
+    bind = session_or_bind.get_bind() if hasattr(session_or_bind, "get_bind") else session_or_bind
+    insert = pg_insert if bind.dialect.name == "postgresql" else sqlite_insert
+    return insert(table)
+
+def ensure_indexes(bind):
+    """
+    为已存在的表补建模型中新增的索引
+    create_all 只会为新建的表创建索引；表声明了 info={"dedupe_before_unique_index": True} 时，
+    补建唯一索引前先删除重复行（保留 id 最小的一行）
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        existing = set()
+        if table.name in existing_tables:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique and table.name in existing_tables and table.info.get("dedupe_before_unique_index"):
+                _delete_duplicates(bind, table, [column.name for column in index.columns])
+            index.create(bind=bind, checkfirst=True)
+
+def _delete_duplicates(bind, table, columns):
+    """删除重复行，每组保留 id 最小的一行"""
+    other = table.alias("other")
+    duplicate = exists().where(
+        other.c.id < table.c.id,
+        *(other.c[name] == table.c[name] for name in columns)
+    )
+    with bind.begin() as conn:
+        conn.execute(delete(table).where(duplicate))
+
+def ensure_columns(bind):
+    """
+    为已存在的表补建模型中新增的可空列
+    create_all 不会修改已存在的表
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
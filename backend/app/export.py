@@ -0,0 +1,118 @@
+"""
+Prompt 库的流式 NDJSON 导出
+
+每行一个 Prompt（含分组、标签和效果图元数据），可选 gzip / zstd 压缩。
+查询使用服务端游标按 EXPORT_BATCH_SIZE 分批读取，每批编码后立即输出，
+内存占用与导出总量无关，第一批读取完成即开始发送。
+接口（异步会话）和命令行（同步会话）共用同一查询和编码逻辑。
+"""
+import zlib
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy import Select, select
+
+from app.config import settings
+from app.filters import filter_prompts
+from app.loading import PROMPT_EXPORT
+from app.models import Prompt
+from app.schemas import PromptExportRecord
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时不支持 zstd
+    zstandard = None
+
+# 压缩方式 -> (Content-Type, 文件扩展名)
+COMPRESSIONS = {
+    "none": ("application/x-ndjson", ".ndjson"),
+    "gzip": ("application/gzip", ".ndjson.gz"),
+    "zstd": ("application/zstd", ".ndjson.zst"),
+}
+
+COMPRESSION_PATTERN = "^(none|gzip|zstd)$"
+
+
+def guess_compression(file_name: str) -> str:
+    """按文件扩展名推断压缩方式"""
+    if file_name.endswith(".gz"):
+        return "gzip"
+    if file_name.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+class UnsupportedCompressionError(Exception):
+    """请求的压缩方式在当前环境不可用"""
+
+
+class Compressor:
+    """增量压缩：每批数据压缩后立即刷出完整的块，客户端可以边收边解压"""
+    
+    def __init__(self, compression: str):
+        self.compression = compression
+        if compression == "gzip":
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+        elif compression == "zstd":
+            if zstandard is None:
+                raise UnsupportedCompressionError("服务端未安装 zstandard，不支持 zstd 压缩")
+            self._obj = zstandard.ZstdCompressor().compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj = None
+    
+    def compress(self, data: bytes) -> bytes:
+        if self._obj is None:
+            return data
+        return self._obj.compress(data) + self._obj.flush(self._flush_mode)
+    
+    def finish(self) -> bytes:
+        if self._obj is None:
+            return b""
+        return self._obj.flush()
+
+
+def export_query(db, group_id: Optional[int] = None, tag_id: Optional[int] = None,
+                 keyword: Optional[str] = None) -> Select:
+    """导出查询：筛选条件与列表接口一致，按 id 顺序分批读取"""
+    query = filter_prompts(db, select(Prompt), group_id, tag_id, keyword)
+    return query.options(*PROMPT_EXPORT).order_by(Prompt.id).execution_options(
+        yield_per=settings.EXPORT_BATCH_SIZE
+    )
+
+
+def encode_records(records: Iterable[PromptExportRecord]) -> bytes:
+    return b"".join(record.model_dump_json().encode("utf-8") + b"\n" for record in records)
+
+
+def to_records(prompts: Iterable[Prompt]) -> list:
+    return [PromptExportRecord.model_validate(prompt) for prompt in prompts]
+
+
+async def stream_export(db, query: Select, compressor: Compressor, transform=None) -> AsyncIterator[bytes]:
+    """
+    异步会话上的流式导出，逐批产出（压缩后的）NDJSON
+    transform 为可选的异步函数，在编码前处理每批记录（如叠加未回写的使用次数）
+    """
+    result = await db.stream(query)
+    async for partition in result.scalars().partitions():
+        records = to_records(partition)
+        if transform is not None:
+            records = await transform(records)
+        chunk = compressor.compress(encode_records(records))
+        if chunk:
+            yield chunk
+    tail = compressor.finish()
+    if tail:
+        yield tail
+
+
+def write_export(db, query: Select, output, compressor: Compressor) -> int:
+    """同步会话上的导出，写入二进制文件对象，返回导出的 Prompt 数量"""
+    count = 0
+    for partition in db.execute(query).scalars().partitions():
+        records = to_records(partition)
+        count += len(records)
+        output.write(compressor.compress(encode_records(records)))
+    output.write(compressor.finish())
+    return count
@@ -0,0 +1,174 @@
+"""
+JSON 快速序列化路径
+
+FAST_JSON_ENABLED=true 且安装了 orjson 时启用（否则保持 Pydantic 路径）：
+- FastJSONResponse 使用 orjson 编码，日期时间格式与 Pydantic 一致
+- 列表、搜索按列读取行元组（不构建 ORM 对象），直接组装响应字典
+- 详情从已加载的 ORM 对象直接组装响应字典
+接口直接返回 Response，跳过 response_model 的校验和再序列化；
+组装的字段与对应的响应模型（PromptListItem / PromptResponse）保持一致。
+
+列表、搜索指定 fields= 或 snippet_len= 时（不论是否启用快速路径）同样按列读取：
+只查询请求的字段，content 在数据库中用 substr 截断，响应中只包含请求的字段（id 总是返回）。
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Prompt, PromptGroup, PromptImage, PromptTag, prompt_tag_relations
+from app.usage_counter import usage_counter
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时不启用快速路径
+    orjson = None
+
+PROMPT_FIELDS = ("id", "name", "content", "description", "group_id", "usage_count", "created_at", "updated_at")
+GROUP_FIELDS = ("id", "name", "description", "sort_order", "created_at", "updated_at")
+TAG_FIELDS = ("id", "name", "color", "created_at")
+COVER_FIELDS = ("id", "file_path", "width", "height", "dominant_color", "placeholder")
+IMAGE_FIELDS = (
+    "id", "prompt_id", "file_path", "file_name", "file_size", "file_type", "sort_order", "created_at",
+    "width", "height", "dominant_color", "placeholder",
+)
+VARIANT_FIELDS = ("width", "height", "format", "file_path", "file_size")
+
+# 列表项可选择的字段（cover 由 include_cover 控制）
+LIST_FIELDS = (*PROMPT_FIELDS, "group", "tags")
+FIELDS_PATTERN = "^({0})(,({0}))*$".format("|".join(LIST_FIELDS))
+
+# 分组字段加前缀避免与 Prompt 字段重名
+GROUP_COLUMNS = tuple(getattr(PromptGroup, field).label(f"group_{field}") for field in GROUP_FIELDS)
+
+
+def enabled() -> bool:
+    return settings.FAST_JSON_ENABLED and orjson is not None
+
+
+def parse_fields(fields: Optional[str]) -> Sequence[str]:
+    """解析逗号分隔的 fields 参数（已按 FIELDS_PATTERN 校验），未指定时返回全部字段"""
+    if not fields:
+        return LIST_FIELDS
+    return tuple(dict.fromkeys(["id", *fields.split(",")]))
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 编码的 JSON 响应"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def response(content, **kwargs) -> JSONResponse:
+    """按列组装的响应：启用快速路径时用 orjson 编码，否则用默认编码"""
+    if enabled():
+        return FastJSONResponse(content, **kwargs)
+    return JSONResponse(jsonable_encoder(content), **kwargs)
+
+
+def as_rows(query: Select, fields: Sequence[str] = LIST_FIELDS, snippet_len: Optional[int] = None,
+            extra: Iterable[str] = ()) -> Select:
+    """
+    把 select(Prompt) 查询换成只读取所需列的行查询，保留条件、排序和分页
+    fields 为输出的字段，extra 为额外读取的 Prompt 字段（如游标分页的排序键）；
+    指定 snippet_len 时 content 在数据库中截断为前 snippet_len 个字符
+    """
+    wanted = {"id", *fields, *extra}
+    columns = []
+    for field in PROMPT_FIELDS:
+        if field not in wanted:
+            continue
+        column = getattr(Prompt, field)
+        if field == "content" and snippet_len is not None:
+            column = func.substr(column, 1, snippet_len).label("content")
+        columns.append(column)
+    if "group" not in fields:
+        return query.with_only_columns(*columns, maintain_column_froms=True)
+    return query.with_only_columns(*columns, *GROUP_COLUMNS, maintain_column_froms=True).outerjoin(
+        PromptGroup, PromptGroup.id == Prompt.group_id
+    )
+
+
+def _group(values: Sequence) -> Optional[Dict]:
+    if values[0] is None:
+        return None
+    return {**dict(zip(GROUP_FIELDS, values)), "prompt_count": 0}
+
+
+async def _tags_by_prompt(db: AsyncSession, prompt_ids: List[int]) -> Dict[int, List[Dict]]:
+    rows = (await db.execute(
+        select(prompt_tag_relations.c.prompt_id, *(getattr(PromptTag, field) for field in TAG_FIELDS))
+        .join(PromptTag, PromptTag.id == prompt_tag_relations.c.tag_id)
+        .where(prompt_tag_relations.c.prompt_id.in_(prompt_ids))
+        .order_by(prompt_tag_relations.c.prompt_id, PromptTag.id)
+    )).all()
+    tags: Dict[int, List[Dict]] = {}
+    for prompt_id, *values in rows:
+        tags.setdefault(prompt_id, []).append(dict(zip(TAG_FIELDS, values)))
+    return tags
+
+
+async def _covers_by_prompt(db: AsyncSession, prompt_ids: List[int]) -> Dict[int, Dict]:
+    rows = (await db.execute(
+        select(PromptImage.prompt_id, *(getattr(PromptImage, field) for field in COVER_FIELDS))
+        .where(PromptImage.prompt_id.in_(prompt_ids))
+        .order_by(PromptImage.prompt_id, PromptImage.sort_order, PromptImage.id)
+    )).all()
+    covers: Dict[int, Dict] = {}
+    for prompt_id, *values in rows:
+        covers.setdefault(prompt_id, dict(zip(COVER_FIELDS, values)))
+    return covers
+
+
+async def list_items(db: AsyncSession, rows: Sequence, include_cover: bool = False,
+                     fields: Sequence[str] = LIST_FIELDS) -> List[Dict]:
+    """
+    由 as_rows 查询的行组装 PromptListItem 字典，只包含 fields 中的字段
+    标签（和封面图）各一次查询，叠加未回写的使用次数
+    """
+    prompt_fields = [field for field in PROMPT_FIELDS if field in fields]
+    # 未选择字段时与 PromptListItem 一致，总是包含 cover
+    full = fields == LIST_FIELDS
+    items = []
+    for row in rows:
+        values = row._mapping
+        item = {field: values[field] for field in prompt_fields}
+        if "group" in fields:
+            item["group"] = _group([values[column.name] for column in GROUP_COLUMNS])
+        items.append(item)
+    if not items:
+        return items
+
+    prompt_ids = [row.id for row in rows]
+    tags = await _tags_by_prompt(db, prompt_ids) if "tags" in fields else None
+    covers = await _covers_by_prompt(db, prompt_ids) if include_cover else None
+    pending = await usage_counter.pending(prompt_ids) if "usage_count" in fields else None
+    for prompt_id, item in zip(prompt_ids, items):
+        if pending is not None:
+            item["usage_count"] += pending.get(prompt_id, 0)
+        if tags is not None:
+            item["tags"] = tags.get(prompt_id, [])
+        if include_cover or full:
+            item["cover"] = covers.get(prompt_id) if covers else None
+    return items
+
+
+def _fields(obj, fields: Sequence[str]) -> Dict:
+    return {field: getattr(obj, field) for field in fields}
+
+
+async def prompt_detail(prompt: Prompt) -> Dict:
+    """由按 PROMPT_DETAIL 加载的 Prompt 组装 PromptResponse 字典"""
+    item = _fields(prompt, PROMPT_FIELDS)
+    item["usage_count"] += (await usage_counter.pending([prompt.id])).get(prompt.id, 0)
+    item["group"] = _group([getattr(prompt.group, field) for field in GROUP_FIELDS]) if prompt.group else None
+    item["tags"] = [_fields(tag, TAG_FIELDS) for tag in prompt.tags]
+    item["images"] = [
+        {**_fields(image, IMAGE_FIELDS), "variants": [_fields(variant, VARIANT_FIELDS) for variant in image.variants]}
+        for image in prompt.images
+    ]
+    return item
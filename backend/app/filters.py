@@ -0,0 +1,42 @@
+"""
+Prompt 列表筛选条件
+
+列表、导出等接口共用，保证同样的参数筛选出同样的 Prompt。
+同时支持同步和异步会话（关键词匹配需要根据数据库方言选择条件）。
+"""
+from typing import Optional
+
+from sqlalchemy import Select, select
+
+from app import fulltext
+from app.models import Prompt, prompt_tag_relations
+from app.search_index import search_index
+
+
+def filter_prompts(db, query: Select, group_id: Optional[int] = None, tag_id: Optional[int] = None,
+                   keyword: Optional[str] = None) -> Select:
+    """按分组（0 表示未分组）、标签、关键词筛选未删除的 Prompt"""
+    query = query.where(Prompt.deleted_at.is_(None))
+    
+    # 分组筛选
+    if group_id is not None:
+        if group_id == 0:
+            # group_id=0 表示查询未分组的prompts
+            query = query.where(Prompt.group_id.is_(None))
+        else:
+            query = query.where(Prompt.group_id == group_id)
+    
+    # 标签筛选：只读取关联表的 (tag_id, prompt_id) 索引，不连接标签表
+    if tag_id:
+        query = query.where(Prompt.id.in_(
+            select(prompt_tag_relations.c.prompt_id).where(prompt_tag_relations.c.tag_id == tag_id)
+        ))
+    
+    # 关键词搜索：子串匹配；可用时先按进程内索引的候选 id 缩小范围
+    if keyword:
+        candidate_ids = search_index.substring_candidates(keyword)
+        if candidate_ids is not None:
+            query = query.where(Prompt.id.in_(candidate_ids))
+        query = query.where(fulltext.keyword_clause(db, keyword))
+    
+    return query
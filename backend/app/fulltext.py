@@ -0,0 +1,185 @@
+"""
+全文检索：PostgreSQL tsvector / pg_trgm 索引维护与搜索查询构建
+
+在 PostgreSQL 上：
+- 使用表达式 GIN 索引维护 name/description/content 的 tsvector，按 ts_rank 排序
+- 使用 pg_trgm 的 GIN 索引加速 ILIKE '%kw%' 子串匹配（适用于中文文本）
+其他数据库或缺少扩展时，退化为原来的 ILIKE 匹配。
+"""
+import logging
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import Select, cast, exists, func, literal, literal_column, or_, select, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Prompt, PromptTag, prompt_tag_relations
+from app.search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+# 启动时探测到的数据库能力
+capabilities = {"fts": False, "trgm": False}
+
+# tsvector 表达式：建索引与查询必须使用完全相同的表达式，索引才会生效
+_TSV_TEMPLATE = (
+    "to_tsvector('{config}'::regconfig, "
+    "coalesce({table}name, '') || ' ' || "
+    "coalesce({table}description, '') || ' ' || "
+    "coalesce({table}content, ''))"
+)
+
+_TRGM_INDEXES = {
+    "ix_prompts_name_trgm": "prompts USING gin (name gin_trgm_ops)",
+    "ix_prompts_content_trgm": "prompts USING gin (content gin_trgm_ops)",
+    "ix_prompts_description_trgm": "prompts USING gin (description gin_trgm_ops)",
+    "ix_prompt_tags_name_trgm": "prompt_tags USING gin (name gin_trgm_ops)",
+}
+
+
+def _tsvector_sql(qualified: bool) -> str:
+    return _TSV_TEMPLATE.format(
+        config=settings.SEARCH_TEXT_CONFIG,
+        table="prompts." if qualified else "",
+    )
+
+
+def ensure_search_indexes(engine: Engine) -> dict:
+    """
+    创建全文检索相关的扩展和索引（幂等），并记录可用能力
+    非 PostgreSQL 数据库直接跳过
+    """
+    capabilities["fts"] = False
+    capabilities["trgm"] = False
+
+    if engine.dialect.name != "postgresql" or not settings.SEARCH_FULLTEXT_ENABLED:
+        return capabilities
+
+    # 扩展需要相应权限，失败时仅记录日志
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        logger.warning(f"创建 pg_trgm 扩展失败，子串搜索将不使用三元组索引: {e}")
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_prompts_fts ON prompts "
+                f"USING gin (({_tsvector_sql(qualified=False)}))"
+            ))
+        capabilities["fts"] = True
+    except Exception as e:
+        logger.warning(f"创建全文检索索引失败: {e}")
+
+    try:
+        with engine.begin() as conn:
+            installed = conn.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first()
+            if installed:
+                for name, definition in _TRGM_INDEXES.items():
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+                capabilities["trgm"] = True
+    except Exception as e:
+        logger.warning(f"创建三元组索引失败: {e}")
+
+    logger.info(f"全文检索能力: {capabilities}")
+    return capabilities
+
+
+def _use_fulltext(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql" and capabilities["fts"]
+
+
+def _use_trigram(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql" and capabilities["trgm"]
+
+
+def _tsquery(keyword: str):
+    # 检索配置作为绑定参数传入（tsvector 一侧须与索引表达式一致，仍为字面量）
+    return func.plainto_tsquery(cast(literal(settings.SEARCH_TEXT_CONFIG), REGCONFIG), keyword)
+
+
+def tag_match_clause(keyword: str):
+    """标签名称匹配关键词的 EXISTS 子查询"""
+    return exists().where(
+        prompt_tag_relations.c.prompt_id == Prompt.id,
+        prompt_tag_relations.c.tag_id == PromptTag.id,
+        PromptTag.name.ilike(f"%{keyword}%"),
+    )
+
+
+def keyword_clause(db: AsyncSession, keyword: str, include_tags: bool = False):
+    """
+    构建关键词匹配条件
+    ILIKE 子串匹配保持原有语义（在 PostgreSQL 上由三元组索引支撑），
+    可用时再叠加 tsvector 分词匹配
+    """
+    keyword_pattern = f"%{keyword}%"
+    clauses = [
+        Prompt.name.ilike(keyword_pattern),
+        Prompt.content.ilike(keyword_pattern),
+        Prompt.description.ilike(keyword_pattern),
+    ]
+    if _use_fulltext(db):
+        clauses.append(literal_column(_tsvector_sql(qualified=True)).op("@@")(_tsquery(keyword)))
+    if include_tags:
+        clauses.append(tag_match_clause(keyword))
+    return or_(*clauses)
+
+
+def rank_expression(db: AsyncSession, keyword: str):
+    """相关度排序表达式，不支持时返回 None"""
+    if not _use_fulltext(db):
+        return None
+    rank = func.ts_rank(literal_column(_tsvector_sql(qualified=True)), _tsquery(keyword))
+    if _use_trigram(db):
+        rank = rank + func.similarity(Prompt.name, keyword)
+    return rank
+
+
+def search_query(db: AsyncSession, keyword: str):
+    """
+    构建搜索查询（名称、内容、备注、标签名称），按相关度排序
+    可用时先按进程内索引的候选 id 缩小范围，结果、排序和总数与不使用索引时一致
+    """
+    stmt = select(Prompt).where(
+        Prompt.deleted_at.is_(None),
+        keyword_clause(db, keyword, include_tags=True),
+    )
+    candidate_ids = search_index.substring_candidates(keyword, include_tags=True)
+    if candidate_ids is not None:
+        stmt = stmt.where(Prompt.id.in_(candidate_ids))
+    rank = rank_expression(db, keyword)
+    if rank is not None:
+        return stmt.order_by(rank.desc(), Prompt.usage_count.desc(), Prompt.id.desc())
+    return stmt.order_by(Prompt.created_at.desc(), Prompt.id.desc())
+
+
+async def search(db: AsyncSession, keyword: str, limit: int, options: Sequence = ()) -> Tuple[List[Prompt], int]:
+    """
+    搜索 Prompt
+    使用窗口函数在同一次查询中返回结果和总数，options 为关系加载策略
+    """
+    total_column = func.count().over().label("total")
+    stmt = search_query(db, keyword).options(*options).add_columns(total_column).limit(limit)
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return [], 0
+    return [row[0] for row in rows], rows[0][1]
+
+
+async def search_rows(db: AsyncSession, keyword: str, limit: int, as_rows: Callable[[Select], Select]) -> Tuple[List, int]:
+    """
+    同 search，但返回行元组而不是 ORM 对象
+    as_rows 把 select(Prompt) 查询换成所需的列，总数作为最后一列一并返回
+    """
+    total_column = func.count().over().label("total")
+    stmt = as_rows(search_query(db, keyword)).add_columns(total_column).limit(limit)
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return [], 0
+    return rows, rows[0][-1]
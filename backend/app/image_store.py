@@ -0,0 +1,192 @@
+"""
+内容寻址图片存储
+
+图片按 SHA-256 存放在 {UPLOAD_DIR}/blobs/<前两位>/<sha256><扩展名>，相同内容只保存一份，
+image_blobs 表记录每个文件被多少条 PromptImage 引用，最后一个引用删除时才删除文件。
+
+并发上传 / 删除同一内容时，通过操作顺序保证文件不会丢失：
+- 上传：先提交引用计数，再检查并放置文件
+- 删除：先提交删除记录，把文件改名移走，确认没有新的引用后才真正删除（连同变体），否则移回
+"""
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import delete, exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models import ImageBlob, ImageVariant, PromptImage
+from app.utils import remove_quietly, stream_to_temp_file
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "blobs"
+
+# 项目根目录（backend目录的父目录），数据库中保存相对该目录的路径
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+
+def blob_root() -> Path:
+    return PROJECT_ROOT / settings.UPLOAD_DIR / BLOB_DIR
+
+
+def blob_path(sha256: str, file_ext: str) -> str:
+    """内容对应的文件路径（相对于项目根目录）"""
+    return f"{settings.UPLOAD_DIR}/{BLOB_DIR}/{sha256[:2]}/{sha256}{file_ext.lower()}"
+
+
+def absolute_path(file_path: str) -> Path:
+    return PROJECT_ROOT / file_path
+
+
+@dataclass
+class StagedUpload:
+    """已写入临时文件、尚未放置到最终位置的上传"""
+    temp_path: str
+    sha256: str
+    file_name: str
+    file_size: int
+    file_type: str
+    file_path: str
+
+
+async def stage_upload(upload_file: UploadFile, max_size: Optional[int] = None) -> StagedUpload:
+    """
+    流式写入临时文件并计算内容哈希
+    超过大小限制时抛出 FileTooLargeError
+    """
+    temp_path, size, sha256 = await stream_to_temp_file(upload_file, blob_root(), max_size)
+    return StagedUpload(
+        temp_path=temp_path,
+        sha256=sha256,
+        file_name=upload_file.filename,
+        file_size=size,
+        file_type=upload_file.content_type or "application/octet-stream",
+        file_path=blob_path(sha256, Path(upload_file.filename or "").suffix),
+    )
+
+
+async def acquire(db: AsyncSession, staged: StagedUpload) -> str:
+    """
+    为上传的内容增加一次引用（随调用方的事务提交）
+    返回共享文件的路径：内容已存在时沿用已有文件
+    """
+    await acquire_many(db, [staged])
+    return staged.file_path
+
+
+async def acquire_many(db: AsyncSession, staged_uploads: List[StagedUpload]) -> None:
+    """
+    批量增加引用，一条 upsert 语句完成（随调用方的事务提交）
+    每个 staged.file_path 更新为共享文件的路径
+    """
+    by_hash: Dict[str, List[StagedUpload]] = {}
+    for staged in staged_uploads:
+        by_hash.setdefault(staged.sha256, []).append(staged)
+    if not by_hash:
+        return
+
+    # 同一语句中不能重复更新同一行，相同内容先合并计数
+    stmt = dialect_insert(db, ImageBlob).values([
+        dict(
+            sha256=sha256,
+            file_path=group[0].file_path,
+            file_size=group[0].file_size,
+            file_type=group[0].file_type,
+            ref_count=len(group),
+        )
+        for sha256, group in by_hash.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ImageBlob.sha256],
+        set_={"ref_count": ImageBlob.ref_count + stmt.excluded.ref_count},
+    ).returning(ImageBlob.sha256, ImageBlob.file_path)
+    for sha256, file_path in (await db.execute(stmt)).all():
+        for staged in by_hash[sha256]:
+            staged.file_path = file_path
+
+
+def _place(temp_path: str, target: Path) -> None:
+    if target.exists():
+        # 内容已存在，跳过写入
+        remove_quietly(temp_path)
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp_path, target)
+
+
+async def place(staged: StagedUpload) -> None:
+    """引用计数提交后，把临时文件放置到共享位置"""
+    await run_in_threadpool(_place, staged.temp_path, absolute_path(staged.file_path))
+
+
+async def discard(staged: StagedUpload) -> None:
+    """放弃上传，删除临时文件"""
+    await run_in_threadpool(remove_quietly, staged.temp_path)
+
+
+async def release(db: AsyncSession, file_path: str) -> Optional[str]:
+    """
+    减少一次引用（随调用方的事务提交），调用前应已删除对应的 PromptImage
+    返回提交后需要回收的文件路径，仍有引用时返回 None
+    """
+    ref_count = (await db.execute(
+        update(ImageBlob).where(ImageBlob.file_path == file_path)
+        .values(ref_count=ImageBlob.ref_count - 1)
+        .returning(ImageBlob.ref_count)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+
+    if ref_count is None:
+        # 未纳入内容寻址存储的旧文件：没有其他图片引用时删除
+        await db.flush()
+        still_used = (await db.execute(
+            select(exists().where(PromptImage.file_path == file_path))
+        )).scalar()
+        return None if still_used else file_path
+
+    if ref_count > 0:
+        return None
+    await db.execute(
+        delete(ImageBlob).where(ImageBlob.file_path == file_path, ImageBlob.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    return file_path
+
+
+async def purge(db: AsyncSession, file_path: str) -> None:
+    """提交后回收文件：先改名移走，确认期间没有新的引用再删除，否则移回"""
+    target = absolute_path(file_path)
+    trash = target.with_name(f"{target.name}.{uuid.uuid4().hex}.trash")
+    try:
+        await run_in_threadpool(os.replace, target, trash)
+    except FileNotFoundError:
+        return
+
+    referenced = (await db.execute(
+        select(or_(
+            exists().where(ImageBlob.file_path == file_path),
+            exists().where(PromptImage.file_path == file_path),
+        ))
+    )).scalar()
+    if referenced:
+        await run_in_threadpool(os.replace, trash, target)
+        return
+    await run_in_threadpool(remove_quietly, trash)
+
+    # 同时回收该文件的变体
+    variant_paths = (await db.execute(
+        delete(ImageVariant).where(ImageVariant.source_path == file_path)
+        .returning(ImageVariant.file_path)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.commit()
+    for variant_path in variant_paths:
+        await run_in_threadpool(remove_quietly, absolute_path(variant_path))
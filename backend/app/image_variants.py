@@ -0,0 +1,226 @@
+"""
+图片变体（缩略图）和元数据流水线
+
+上传时提取图片元数据（尺寸、主色、低质量预览图）并生成各尺寸的 WebP/JPEG 变体，
+变体记录到 image_variants 表；已有图片在读取详情时按需补生成。
+缩放在进程池中执行（IMAGE_PROCESS_WORKERS=0 时使用线程池），同一文件同时只生成一次。
+变体存放在 {UPLOAD_DIR}/variants/<前两位>/<文件名>_<宽度>.<扩展名>，按原文件路径关联，
+共享同一文件的图片共享变体。
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import imaging
+from app.config import settings
+from app.database import AsyncSessionLocal, dialect_insert
+from app.image_store import PROJECT_ROOT, absolute_path
+from app.models import ImageVariant, PromptImage
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = "variants"
+
+# 可生成变体的图片类型
+SUPPORTED_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"}
+
+# 后台补生成变体使用的会话工厂
+session_factory = AsyncSessionLocal
+
+_executor: Optional[ProcessPoolExecutor] = None
+_inflight: Dict[str, asyncio.Future] = {}
+# 处理失败的文件 -> 可以重试的时间（time.monotonic）；无法解码的文件不再重试
+_failed: Dict[str, float] = {}
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """图片处理进程池（首次使用时创建），未启用时返回 None"""
+    global _executor
+    if _executor is None and settings.IMAGE_PROCESS_WORKERS > 0:
+        # spawn 启动的子进程不继承事件循环和数据库连接
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_in_process(func, *args):
+    """在图片处理进程池中执行 CPU 密集的函数"""
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+def _record_failure(source_path: str, error: Exception) -> None:
+    """记录处理失败：无法解码的图片不再重试，其他错误（文件不存在、进程池异常等）IMAGE_RETRY_INTERVAL 后重试"""
+    if imaging.is_decode_error(error):
+        _failed[source_path] = float("inf")
+    else:
+        _failed[source_path] = time.monotonic() + settings.IMAGE_RETRY_INTERVAL
+
+
+def _skipped(source_path: str) -> bool:
+    """最近处理失败、尚未到重试时间"""
+    retry_at = _failed.get(source_path)
+    if retry_at is None:
+        return False
+    if time.monotonic() < retry_at:
+        return True
+    del _failed[source_path]
+    return False
+
+
+def variant_dir(source_path: str) -> str:
+    """变体目录（相对于项目根目录）"""
+    stem = Path(source_path).stem
+    return f"{settings.UPLOAD_DIR}/{VARIANT_DIR}/{stem[:2]}"
+
+
+def _needs_variants(file_type: str) -> bool:
+    return bool(settings.IMAGE_VARIANT_WIDTHS) and file_type in SUPPORTED_TYPES
+
+
+async def _render_and_record(db: AsyncSession, source_path: str) -> None:
+    directory = variant_dir(source_path)
+    rendered = await run_in_process(
+        imaging.render_variants,
+        str(absolute_path(source_path)),
+        str(PROJECT_ROOT / directory),
+        Path(source_path).stem,
+        list(settings.IMAGE_VARIANT_WIDTHS),
+        list(settings.IMAGE_VARIANT_FORMATS),
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+    if not rendered:
+        return
+    await db.execute(
+        dialect_insert(db, ImageVariant).values([
+            dict(
+                source_path=source_path,
+                width=item["width"],
+                height=item["height"],
+                format=item["format"],
+                file_path=f"{directory}/{item['file_name']}",
+                file_size=item["file_size"],
+            )
+            for item in rendered
+        ]).on_conflict_do_nothing()
+    )
+    await db.commit()
+
+
+async def ensure_variants(db: AsyncSession, source_path: str, file_type: str) -> bool:
+    """
+    确保文件已生成变体，返回是否新生成
+    同一文件的并发调用合并为一次生成；图片无法解码时只记录日志
+    """
+    if not _needs_variants(file_type):
+        return False
+    if _skipped(source_path):
+        return False
+    found = (await db.execute(
+        select(ImageVariant.id).where(ImageVariant.source_path == source_path).limit(1)
+    )).first()
+    if found:
+        return False
+
+    pending = _inflight.get(source_path)
+    if pending is not None:
+        await asyncio.shield(pending)
+        return False
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[source_path] = future
+    try:
+        await _render_and_record(db, source_path)
+        return True
+    except Exception as e:
+        await db.rollback()
+        _record_failure(source_path, e)
+        logger.warning(f"生成图片变体失败 {source_path}: {e}")
+        return False
+    finally:
+        _inflight.pop(source_path, None)
+        future.set_result(None)
+
+
+async def extract_metadata(db: AsyncSession, file_path: str, source: str, file_type: str) -> Dict:
+    """
+    提取上传图片的元数据（尺寸、主色、低质量预览图），source 为待读取的本地文件
+    共享同一文件的图片已有元数据时直接复用；无法解码时返回空字典
+    """
+    if file_type not in SUPPORTED_TYPES:
+        return {}
+    row = (await db.execute(
+        select(
+            PromptImage.width, PromptImage.height,
+            PromptImage.dominant_color, PromptImage.placeholder
+        ).where(PromptImage.file_path == file_path, PromptImage.width.is_not(None)).limit(1)
+    )).first()
+    if row is not None:
+        return dict(row._mapping)
+    return await analyze_upload(source, file_type)
+
+
+async def analyze_upload(source: str, file_type: str) -> Dict:
+    """在进程池中提取本地文件的元数据，无法解码时返回空字典"""
+    if file_type not in SUPPORTED_TYPES:
+        return {}
+    try:
+        return await run_in_process(imaging.analyze_image, source)
+    except Exception as e:
+        logger.warning(f"提取图片元数据失败 {source}: {e}")
+        return {}
+
+
+async def ensure_metadata(db: AsyncSession, source_path: str, file_type: str) -> bool:
+    """为缺少元数据的已有图片补充元数据，返回是否有更新"""
+    if file_type not in SUPPORTED_TYPES or _skipped(source_path):
+        return False
+    try:
+        metadata = await run_in_process(imaging.analyze_image, str(absolute_path(source_path)))
+    except Exception as e:
+        _record_failure(source_path, e)
+        logger.warning(f"提取图片元数据失败 {source_path}: {e}")
+        return False
+    result = await db.execute(
+        update(PromptImage).where(
+            PromptImage.file_path == source_path,
+            PromptImage.width.is_(None)
+        ).values(**metadata).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def process_pending_images(images: List[tuple]) -> None:
+    """为缺少变体或元数据的图片补生成（在响应返回后执行）"""
+    async with session_factory() as db:
+        for file_path, file_type, needs_metadata in images:
+            await ensure_variants(db, file_path, file_type)
+            if needs_metadata:
+                await ensure_metadata(db, file_path, file_type)
+
+
+def pending_images(images) -> List[tuple]:
+    """筛选尚未生成变体或缺少元数据的图片，返回 [(file_path, file_type, 是否缺少元数据)]"""
+    return list({
+        image.file_path: (image.file_path, image.file_type, image.width is None)
+        for image in images
+        if image.file_type in SUPPORTED_TYPES
+        and not _skipped(image.file_path)
+        and (image.width is None or (not image.variants and _needs_variants(image.file_type)))
+    }.values())
@@ -0,0 +1,146 @@
+"""
+图片处理（Pillow）
+
+这里的函数只依赖 Pillow 和标准库，在进程池的子进程中执行，避免 CPU 密集的解码/缩放阻塞事件循环。
+"""
+import base64
+import io
+import os
+from typing import Dict, Iterable, List
+
+from PIL import Image, ImageOps
+
+# 低质量预览图的最长边（像素）
+PLACEHOLDER_SIZE = 16
+
+# 输出格式 -> (Pillow 格式名, 扩展名, 保存参数)
+FORMATS = {
+    "webp": ("WEBP", ".webp", {"method": 4}),
+    "jpeg": ("JPEG", ".jpg", {"optimize": True, "progressive": True}),
+    "png": ("PNG", ".png", {"optimize": True}),
+}
+
+
+def is_decode_error(error: BaseException) -> bool:
+    """
+    是否为图片内容无法解码的错误（重试也不会成功）
+    Pillow 对无法识别、截断或损坏的图片抛出不带 errno 的 OSError（包括 UnidentifiedImageError）、
+    SyntaxError 或 DecompressionBombError；带 errno 的 OSError 是文件不存在、权限、磁盘已满等文件系统错误
+    """
+    if isinstance(error, (Image.DecompressionBombError, SyntaxError)):
+        return True
+    return isinstance(error, OSError) and error.errno is None
+
+
+def _open_normalized(source: str, max_width: int) -> Image.Image:
+    """打开图片：只取第一帧，按 EXIF 方向旋转，统一为 RGB/RGBA"""
+    image = Image.open(source)
+    # JPEG 可以直接按缩小的尺寸解码，大图省去大部分解码开销
+    image.draft("RGB", (max_width, max_width))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """去掉透明通道（JPEG 不支持），透明部分填充白色"""
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def save_image(image: Image.Image, target: str, fmt: str, quality: int) -> int:
+    """写入临时文件后原子重命名，返回文件大小"""
+    pil_format, _, options = FORMATS[fmt]
+    if fmt == "jpeg":
+        image = _flatten(image)
+    temp = f"{target}.{os.getpid()}.part"
+    image.save(temp, pil_format, quality=quality, **options)
+    os.replace(temp, target)
+    return os.path.getsize(target)
+
+
+def render_variants(source: str, target_dir: str, stem: str, widths: Iterable[int],
+                    formats: Iterable[str], quality: int) -> List[Dict]:
+    """
+    按宽度生成等比缩放的变体，不放大原图
+    返回 [{"width", "height", "format", "file_name", "file_size"}]
+    """
+    widths = sorted(set(widths), reverse=True)
+    image = _open_normalized(source, widths[0])
+    os.makedirs(target_dir, exist_ok=True)
+
+    variants = []
+    done = set()
+    current = image
+    for width in widths:
+        width = min(width, image.width)
+        if width in done:
+            continue
+        done.add(width)
+        height = max(1, round(image.height * width / image.width))
+        # 从上一个较大的变体继续缩小，逐级缩放比每次从原图缩放更快
+        if current.size != (width, height):
+            current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            file_name = f"{stem}_{width}{FORMATS[fmt][1]}"
+            file_size = save_image(current, os.path.join(target_dir, file_name), fmt, quality)
+            variants.append({
+                "width": width,
+                "height": height,
+                "format": fmt,
+                "file_name": file_name,
+                "file_size": file_size,
+            })
+    return variants
+
+
+def render_fit(source: str, target: str, width: int, height: int, fmt: str, quality: int) -> int:
+    """
+    等比缩放到 width x height 的范围内（为 0 的一边不限制），不放大原图
+    返回输出文件大小
+    """
+    bound_w = width or 1 << 16
+    bound_h = height or 1 << 16
+    image = _open_normalized(source, min(bound_w, bound_h))
+    image.thumbnail((bound_w, bound_h), Image.LANCZOS, reducing_gap=3.0)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    return save_image(image, target, fmt, quality)
+
+
+def _dominant_color(image: Image.Image) -> str:
+    """缩小后量化为少量颜色，取像素最多的颜色"""
+    small = _flatten(image).copy()
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=5)
+    count, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def analyze_image(source: str) -> Dict:
+    """
+    提取图片元数据
+    返回 {"width", "height", "dominant_color", "placeholder"}，placeholder 为极小的 WebP data URI
+    """
+    with Image.open(source) as original:
+        width, height = original.size
+        orientation = original.getexif().get(0x0112)
+    # EXIF 方向为 5-8 时显示的宽高互换
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+
+    image = _open_normalized(source, PLACEHOLDER_SIZE * 4)
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=30)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    return {
+        "width": width,
+        "height": height,
+        "dominant_color": _dominant_color(image),
+        "placeholder": placeholder,
+    }
@@ -0,0 +1,50 @@
+"""
+查询加载策略
+
+每个接口按其响应模型声明需要的关系，用 joinedload / selectinload 一次性加载；
+未声明的关系统一 raiseload，意外的懒加载（N+1）会直接抛出异常。
+"""
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from app.models import Prompt, PromptImage
+
+# PromptListItem：分组、标签
+PROMPT_LIST = (
+    joinedload(Prompt.group),
+    selectinload(Prompt.tags),
+    raiseload("*"),
+)
+
+# PromptListItem 附带封面图：分组、标签、效果图（不含变体）
+PROMPT_LIST_WITH_COVER = (
+    joinedload(Prompt.group),
+    selectinload(Prompt.tags),
+    selectinload(Prompt.images),
+    raiseload("*"),
+)
+
+# PromptResponse：分组、标签、效果图及其变体
+PROMPT_DETAIL = (
+    joinedload(Prompt.group),
+    selectinload(Prompt.tags),
+    selectinload(Prompt.images).selectinload(PromptImage.variants),
+    raiseload("*"),
+)
+
+# PromptExportRecord：分组、标签、效果图（不含变体），配合 yield_per 分批加载
+PROMPT_EXPORT = (
+    joinedload(Prompt.group),
+    selectinload(Prompt.tags),
+    selectinload(Prompt.images),
+    raiseload("*"),
+)
+
+# 只读取列字段（复制、删除等）
+PROMPT_COLUMNS = (
+    raiseload("*"),
+)
+
+# PromptImageResponse：变体
+IMAGE_DETAIL = (
+    selectinload(PromptImage.variants),
+    raiseload("*"),
+)
@@ -1,10 +1,12 @@
 """
 数据库模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+# 各表的版本号（写入提交时递增），随模型一起建表并注册提交事件
+import app.versions  # noqa: F401  (registers table)
 
 # Prompt和Tag的多对多关联表
 prompt_tag_relations = Table(
@@ -13,6 +15,11 @@ prompt_tag_relations = Table(
     Column('id', Integer, primary_key=True, index=True),
     Column('prompt_id', Integer, ForeignKey('prompts.id', ondelete='CASCADE'), nullable=False),
     Column('tag_id', Integer, ForeignKey('prompt_tags.id', ondelete='CASCADE'), nullable=False),
+    # 同一Prompt和标签只关联一次；反向索引用于按标签筛选（覆盖索引，无需回表）
+    Index('ix_prompt_tag_relations_prompt_tag', 'prompt_id', 'tag_id', unique=True),
+    Index('ix_prompt_tag_relations_tag_prompt', 'tag_id', 'prompt_id'),
+    # 重复的关联行没有意义，补建唯一索引前直接删除
+    info={"dedupe_before_unique_index": True},
 )
 
 class Prompt(Base):
@@ -30,8 +37,19 @@ class Prompt(Base):
     
     # 关系
     group = relationship("PromptGroup", back_populates="prompts")
-    tags = relationship("PromptTag", secondary=prompt_tag_relations, back_populates="prompts")
+    tags = relationship("PromptTag", secondary=prompt_tag_relations, back_populates="prompts", order_by="PromptTag.id")
     images = relationship("PromptImage", back_populates="prompt", cascade="all, delete-orphan")
+    
+    # 列表排序/游标分页使用的部分复合索引：(排序键, id) WHERE deleted_at IS NULL
+    __table_args__ = tuple(
+        Index(
+            f"ix_prompts_live_{column}_id",
+            column, "id",
+            postgresql_where=text("deleted_at IS NULL"),
+            sqlite_where=text("deleted_at IS NULL")
+        )
+        for column in ("created_at", "updated_at", "usage_count", "name")
+    )
 
 class PromptGroup(Base):
     __tablename__ = "prompt_groups"
@@ -62,12 +80,53 @@ class PromptImage(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete='CASCADE'), nullable=False, index=True)
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False, index=True)
     file_name = Column(String(255), nullable=False)
     file_size = Column(Integer, nullable=False)
     file_type = Column(String(50), nullable=False)
     sort_order = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # 图片元数据：尺寸、主色（#rrggbb）、低质量预览图（base64 data URI）
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    dominant_color = Column(String(7), nullable=True)
+    placeholder = Column(Text, nullable=True)
     
     # 关系
     prompt = relationship("Prompt", back_populates="images")
+    # 变体按文件生成，共享同一文件的图片共享变体
+    variants = relationship(
+        "ImageVariant",
+        primaryjoin="PromptImage.file_path == foreign(ImageVariant.source_path)",
+        order_by="(ImageVariant.width, ImageVariant.format)",
+        viewonly=True,
+    )
+
+class ImageBlob(Base):
+    """内容寻址的图片文件，多条 PromptImage 通过 file_path 共享同一文件"""
+    __tablename__ = "image_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    file_path = Column(String(500), nullable=False, unique=True)
+    file_size = Column(Integer, nullable=False)
+    file_type = Column(String(50), nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ImageVariant(Base):
+    """图片的缩放变体（缩略图）"""
+    __tablename__ = "image_variants"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source_path = Column(String(500), nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    format = Column(String(10), nullable=False)
+    file_path = Column(String(500), nullable=False, unique=True)
+    file_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_image_variants_source", "source_path", "width", "format", unique=True),
+    )
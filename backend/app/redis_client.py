@@ -0,0 +1,33 @@
+"""
+Redis 客户端
+"""
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.config import settings
+
+_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """获取共享的异步 Redis 客户端（首次调用时创建）"""
+    global _client
+    if _client is None:
+        _client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD or None,
+            db=settings.REDIS_DB,
+            socket_timeout=1.0,
+            socket_connect_timeout=1.0,
+        )
+    return _client
+
+
+async def close_redis() -> None:
+    """关闭 Redis 连接"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
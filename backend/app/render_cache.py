@@ -0,0 +1,135 @@
+"""
+按需缩放图片的磁盘 LRU 缓存
+
+缓存文件位于 {RENDER_CACHE_DIR}/<前两位>/<key><扩展名>，key 由原文件路径和缩放参数计算。
+- 命中时直接返回缓存文件路径，并更新访问顺序（同时 touch 文件，重启后按修改时间恢复顺序）
+- 未命中时在图片处理进程池中缩放，同一 key 的并发请求合并为一次缩放（共享的缩放任务不随单个请求取消）
+- 缓存总大小超过 RENDER_CACHE_MAX_BYTES 时按最近最少使用淘汰
+
+多 worker 部署时每个进程各自维护访问顺序；缓存文件被其他进程淘汰时按未命中重新生成。
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app import imaging
+from app.config import settings
+from app.image_store import PROJECT_ROOT
+from app.image_variants import run_in_process
+from app.utils import remove_quietly
+
+RENDER_QUALITY = 80
+
+
+def _scan(root: Path) -> "OrderedDict[str, int]":
+    """扫描已有缓存文件，按修改时间从旧到新排列"""
+    entries = []
+    for path in root.glob("*/*"):
+        if path.name.endswith(".part"):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, str(path), stat.st_size))
+    entries.sort()
+    return OrderedDict((path, size) for _, path, size in entries)
+
+
+def _touch(path: str) -> Optional[int]:
+    """更新访问时间并返回文件大小，文件不存在时返回 None"""
+    try:
+        os.utime(path)
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return None
+
+
+class RenderCache:
+    """缩放结果的磁盘 LRU 缓存"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.root = PROJECT_ROOT / directory
+        self.max_bytes = max_bytes
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def cache_key(source_path: str, width: int, height: int, fmt: str) -> str:
+        raw = f"{source_path}|{width}|{height}|{fmt}|{RENDER_QUALITY}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str, fmt: str) -> str:
+        return str(self.root / key[:2] / f"{key}{imaging.FORMATS[fmt][1]}")
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    async def _load(self) -> None:
+        if self._entries is None:
+            entries = await run_in_threadpool(_scan, self.root)
+            if self._entries is None:
+                self._entries = entries
+                self._total = sum(entries.values())
+
+    def _forget(self, path: str) -> None:
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._total -= size
+
+    async def _evict(self) -> None:
+        # 最新写入的一项始终保留
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._total -= size
+            await run_in_threadpool(remove_quietly, path)
+
+    async def get_or_render(self, source: str, source_path: str, width: int, height: int, fmt: str) -> str:
+        """
+        返回缩放结果的缓存文件路径
+        source 为原图绝对路径；缩放失败时抛出原异常（无法解码的判断见 imaging.is_decode_error）
+        """
+        await self._load()
+        key = self.cache_key(source_path, width, height, fmt)
+        path = self.path_for(key, fmt)
+
+        # 索引中没有的文件可能由其他进程生成，同样视为命中
+        size = await run_in_threadpool(_touch, path)
+        if size is not None:
+            self._forget(path)
+            self._entries[path] = size
+            self._total += size
+            return path
+        self._forget(path)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(source, path, width, height, fmt))
+            self._inflight[key] = task
+
+            def done(finished: asyncio.Task) -> None:
+                self._inflight.pop(key, None)
+                # 所有请求都已取消时，避免 "exception was never retrieved" 警告
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(done)
+        # 请求被取消时不取消共享的缩放任务，同一 key 的其他请求仍能拿到结果
+        return await asyncio.shield(task)
+
+    async def _render(self, source: str, path: str, width: int, height: int, fmt: str) -> str:
+        size = await run_in_process(imaging.render_fit, source, path, width, height, fmt, RENDER_QUALITY)
+        self._forget(path)
+        self._entries[path] = size
+        self._total += size
+        await self._evict()
+        return path
+
+render_cache = RenderCache(settings.RENDER_CACHE_DIR, settings.RENDER_CACHE_MAX_BYTES)
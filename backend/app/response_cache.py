@@ -0,0 +1,204 @@
+"""
+接口响应缓存
+
+列表、搜索、分组和详情接口的响应体以 ETag 为键缓存（见 app.conditional）：
+ETag 由规范化的查询参数和接口依赖表的版本号计算，任一依赖表提交写入后版本号递增、键随之改变，
+旧条目不再命中并在 TTL 后过期，写入方无需逐个删除缓存。
+- memory: 进程内 LRU（单进程部署、桌面端、测试），按条目数和总字节数限制
+- redis: Redis 共享缓存（多 worker），Redis 不可用时视为未命中
+- none: 不缓存
+单个响应超过 RESPONSE_CACHE_MAX_ITEM_BYTES 时不缓存。各接口的命中、未命中等计数由 stats() 返回。
+未回写的使用次数在缓存时已叠加；使用次数回写不改变版本号，缓存的 usage_count 最多落后 RESPONSE_CACHE_TTL。
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.conditional import cache_headers
+from app.config import settings
+from app.fast_json import orjson
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "prompt:cache:"
+
+
+class MemoryCacheBackend:
+    """进程内 LRU 缓存，条目按 TTL 过期"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class RedisCacheBackend:
+    """Redis 共享缓存，条目由 Redis 按 TTL 过期"""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(KEY_PREFIX + key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._redis.set(KEY_PREFIX + key, value, ex=ttl)
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter(match=KEY_PREFIX + "*"):
+            await self._redis.delete(key)
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError
+
+
+def dumps(content) -> bytes:
+    """把响应内容（响应模型、模型列表或按列组装的字典）编码为 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _pack(body: bytes, headers: Dict[str, str]) -> bytes:
+    # 第一行为额外的响应头（紧凑 JSON 不含换行），其余为响应体
+    return json.dumps(headers, separators=(",", ":")).encode("utf-8") + b"\n" + body
+
+
+def _unpack(value: bytes) -> Tuple[bytes, Dict[str, str]]:
+    headers, _, body = value.partition(b"\n")
+    return body, json.loads(headers)
+
+
+class ResponseCache:
+    """按 ETag 缓存的接口响应，backend 为 None 时不缓存"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "stores": 0, "oversized": 0, "errors": 0}
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _count(self, name: str, event: str) -> None:
+        with self._lock:
+            self._stats[name][event] += 1
+
+    @staticmethod
+    def _key(name: str, etag: str) -> str:
+        tag = etag.removeprefix("W/").strip('"')
+        return f"{name}:{tag}"
+
+    @staticmethod
+    def _response(body: bytes, etag: str, headers: Dict[str, str], status: str) -> Response:
+        return Response(body, media_type="application/json", headers={
+            **cache_headers(etag), **headers, "X-Cache": status,
+        })
+
+    async def get(self, name: str, etag: str) -> Optional[Response]:
+        """命中时返回缓存的响应，未命中或缓存不可用时返回 None"""
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(self._key(name, etag))
+        except Exception as e:
+            self._count(name, "errors")
+            logger.warning(f"读取响应缓存失败: {e}")
+            return None
+        if value is None:
+            self._count(name, "misses")
+            return None
+        self._count(name, "hits")
+        body, headers = _unpack(value)
+        return self._response(body, etag, headers, "HIT")
+
+    async def store(self, name: str, etag: str, content, headers: Optional[Dict[str, str]] = None) -> Response:
+        """编码响应内容并写入缓存，返回编码后的响应；写入失败不影响响应"""
+        headers = headers or {}
+        body = dumps(content)
+        value = _pack(body, headers)
+        if len(value) > settings.RESPONSE_CACHE_MAX_ITEM_BYTES:
+            self._count(name, "oversized")
+        else:
+            try:
+                await self.backend.set(self._key(name, etag), value, settings.RESPONSE_CACHE_TTL)
+                self._count(name, "stores")
+            except Exception as e:
+                self._count(name, "errors")
+                logger.warning(f"写入响应缓存失败: {e}")
+        return self._response(body, etag, headers, "MISS")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self._stats.items()}
+        hits = sum(counts["hits"] for counts in endpoints.values())
+        lookups = hits + sum(counts["misses"] for counts in endpoints.values())
+        return {
+            "backend": settings.RESPONSE_CACHE_BACKEND,
+            "hit_rate": hits / lookups if lookups else None,
+            "endpoints": endpoints,
+        }
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+        if self.backend is not None:
+            await self.backend.clear()
+
+
+def _build_backend():
+    backend = settings.RESPONSE_CACHE_BACKEND
+    if backend == "memory":
+        return MemoryCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
+    if backend == "redis":
+        from app.redis_client import get_redis
+        return RedisCacheBackend(get_redis())
+    return None
+
+
+response_cache = ResponseCache(_build_backend())
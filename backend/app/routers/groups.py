@@ -1,46 +1,101 @@
 """
 分组管理路由
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, null, union_all
+from typing import List, Tuple
 from app.database import get_db
 from app.models import PromptGroup, Prompt
 from app.schemas import PromptGroupCreate, PromptGroupUpdate, PromptGroupResponse, MessageResponse
+from app.conditional import Conditional
+from app.response_cache import response_cache
+from app.taxonomy import taxonomy
 
 router = APIRouter()
 
-@router.get("", response_model=List[PromptGroupResponse])
-async def get_groups(db: Session = Depends(get_db)):
-    """获取分组列表"""
-    groups = db.query(PromptGroup).order_by(PromptGroup.sort_order, PromptGroup.created_at).all()
+async def _load_groups_with_counts(db: AsyncSession) -> Tuple[List[PromptGroupResponse], int]:
+    """
+    一次聚合查询获取分组列表、各分组Prompt数量及未分组数量
+    未分组数量作为 id 为 NULL 的一行通过 UNION ALL 返回
+    """
+    counts = select(
+        Prompt.group_id,
+        func.count().label("prompt_count")
+    ).where(Prompt.deleted_at.is_(None)).group_by(Prompt.group_id).cte("group_counts")
+    
+    grouped = select(
+        PromptGroup.id,
+        PromptGroup.name,
+        PromptGroup.description,
+        PromptGroup.sort_order,
+        PromptGroup.created_at,
+        PromptGroup.updated_at,
+        func.coalesce(counts.c.prompt_count, 0).label("prompt_count")
+    ).outerjoin(counts, counts.c.group_id == PromptGroup.id)
+    ungrouped = select(
+        null(), null(), null(), null(), null(), null(),
+        counts.c.prompt_count
+    ).where(counts.c.group_id.is_(None))
+    
+    rows = union_all(grouped, ungrouped).subquery()
+    stmt = select(rows).order_by(rows.c.sort_order, rows.c.created_at)
+    
     result = []
-    for group in groups:
-        # 计算每个分组的prompt数量
-        prompt_count = db.query(Prompt).filter(
-            Prompt.group_id == group.id,
-            Prompt.deleted_at.is_(None)
-        ).count()
-        group_dict = PromptGroupResponse.model_validate(group).model_dump()
-        group_dict['prompt_count'] = prompt_count
-        result.append(PromptGroupResponse(**group_dict))
-    return result
+    ungrouped_count = 0
+    for row in await db.execute(stmt):
+        if row.id is None:
+            ungrouped_count = row.prompt_count
+            continue
+        result.append(PromptGroupResponse(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            sort_order=row.sort_order,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            prompt_count=row.prompt_count
+        ))
+    return result, ungrouped_count
+
+@router.get("", response_model=List[PromptGroupResponse])
+async def get_groups(
+    response: Response,
+    etag: str = Depends(Conditional("prompt_groups", "prompts")),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取分组列表（未分组数量通过 X-Ungrouped-Count 响应头返回）
+    支持 If-None-Match：分组和Prompt未变化时返回 304；启用响应缓存时按 ETag 缓存
+    """
+    cached = await response_cache.get("groups", etag)
+    if cached is not None:
+        return cached
+    
+    groups, ungrouped_count = await _load_groups_with_counts(db)
+    headers = {"X-Ungrouped-Count": str(ungrouped_count)}
+    if response_cache.enabled:
+        return await response_cache.store("groups", etag, groups, headers=headers)
+    response.headers.update(headers)
+    return groups
 
 @router.get("/ungrouped-count", response_model=dict)
-async def get_ungrouped_count(db: Session = Depends(get_db)):
+async def get_ungrouped_count(db: AsyncSession = Depends(get_db)):
     """获取未分组的prompt数量"""
-    count = db.query(Prompt).filter(
-        Prompt.group_id.is_(None),
-        Prompt.deleted_at.is_(None)
-    ).count()
+    count = (await db.execute(
+        select(func.count()).select_from(Prompt).where(
+            Prompt.group_id.is_(None),
+            Prompt.deleted_at.is_(None)
+        )
+    )).scalar_one()
     return {"count": count}
 
 @router.post("", response_model=PromptGroupResponse)
-async def create_group(group_data: PromptGroupCreate, db: Session = Depends(get_db)):
+async def create_group(group_data: PromptGroupCreate, db: AsyncSession = Depends(get_db)):
     """创建分组"""
     # 检查名称是否已存在
-    existing = db.query(PromptGroup).filter(PromptGroup.name == group_data.name).first()
-    if existing:
+    if await taxonomy.group_name_taken(db, group_data.name):
         raise HTTPException(status_code=400, detail="分组名称已存在")
     
     group = PromptGroup(
@@ -50,8 +105,14 @@ async def create_group(group_data: PromptGroupCreate, db: Session = Depends(get_
     )
     
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 快照过期，名称已被其他进程使用
+        await taxonomy.recover(db)
+        raise HTTPException(status_code=400, detail="分组名称已存在")
+    await db.refresh(group)
+    await taxonomy.changed(db)
     
     return PromptGroupResponse.model_validate(group)
 
@@ -59,18 +120,17 @@ async def create_group(group_data: PromptGroupCreate, db: Session = Depends(get_
 async def update_group(
     group_id: int,
     group_data: PromptGroupUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """更新分组"""
-    group = db.query(PromptGroup).filter(PromptGroup.id == group_id).first()
+    group = await db.get(PromptGroup, group_id)
     
     if not group:
         raise HTTPException(status_code=404, detail="分组不存在")
     
     # 检查名称是否与其他分组冲突
     if group_data.name and group_data.name != group.name:
-        existing = db.query(PromptGroup).filter(PromptGroup.name == group_data.name).first()
-        if existing:
+        if await taxonomy.group_name_taken(db, group_data.name):
             raise HTTPException(status_code=400, detail="分组名称已存在")
         group.name = group_data.name
     
@@ -79,29 +139,38 @@ async def update_group(
     if group_data.sort_order is not None:
         group.sort_order = group_data.sort_order
     
-    db.commit()
-    db.refresh(group)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 快照过期，名称已被其他进程使用
+        await taxonomy.recover(db)
+        raise HTTPException(status_code=400, detail="分组名称已存在")
+    await db.refresh(group)
+    await taxonomy.changed(db)
     
     return PromptGroupResponse.model_validate(group)
 
 @router.delete("/{group_id}", response_model=MessageResponse)
-async def delete_group(group_id: int, db: Session = Depends(get_db)):
+async def delete_group(group_id: int, db: AsyncSession = Depends(get_db)):
     """删除分组"""
-    group = db.query(PromptGroup).filter(PromptGroup.id == group_id).first()
+    group = await db.get(PromptGroup, group_id)
     
     if not group:
         raise HTTPException(status_code=404, detail="分组不存在")
     
     # 检查是否有关联的Prompt
-    prompt_count = db.query(Prompt).filter(
-        Prompt.group_id == group_id,
-        Prompt.deleted_at.is_(None)
-    ).count()
+    prompt_count = (await db.execute(
+        select(func.count()).select_from(Prompt).where(
+            Prompt.group_id == group_id,
+            Prompt.deleted_at.is_(None)
+        )
+    )).scalar_one()
     
     if prompt_count > 0:
         raise HTTPException(status_code=400, detail=f"该分组下还有{prompt_count}个Prompt，无法删除")
     
-    db.delete(group)
-    db.commit()
+    await db.delete(group)
+    await db.commit()
+    await taxonomy.changed(db)
     
     return MessageResponse(message="删除成功")
@@ -1,92 +1,271 @@
 """
 图片管理路由
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
 from app.models import Prompt, PromptImage
-from app.schemas import PromptImageResponse, MessageResponse
-from app.utils import save_upload_file, delete_file
+from app.schemas import PromptImageResponse, MessageResponse, BatchUploadItem, BatchUploadResponse
+from app.utils import FileTooLargeError
+from app import image_store, image_variants, imaging
+from app.loading import IMAGE_DETAIL
+from app.render_cache import render_cache
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/jpg", "image/png", "image/gif"]
+UNSUPPORTED_TYPE_MESSAGE = "不支持的文件类型，仅支持JPG、PNG、GIF"
+
+# 批量插入时每行的元数据列必须一致，无法提取的元数据为空
+IMAGE_METADATA_DEFAULTS = {"width": None, "height": None, "dominant_color": None, "placeholder": None}
+
+RENDER_MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+async def _get_image(db: AsyncSession, image_id: int):
+    """获取图片及其变体"""
+    return (await db.execute(
+        select(PromptImage).options(*IMAGE_DETAIL)
+        .where(PromptImage.id == image_id)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+
+async def _ensure_prompt_exists(db: AsyncSession, prompt_id: int) -> None:
+    prompt_exists = (await db.execute(
+        select(Prompt.id).where(
+            Prompt.id == prompt_id,
+            Prompt.deleted_at.is_(None)
+        )
+    )).first()
+    
+    if not prompt_exists:
+        raise HTTPException(status_code=404, detail="Prompt不存在")
 
 @router.post("/{prompt_id}", response_model=PromptImageResponse)
 async def upload_image(
     prompt_id: int,
     file: UploadFile = File(...),
     sort_order: int = 0,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """上传Prompt效果图"""
     # 验证Prompt是否存在
-    prompt = db.query(Prompt).filter(
-        Prompt.id == prompt_id,
-        Prompt.deleted_at.is_(None)
-    ).first()
-    
-    if not prompt:
-        raise HTTPException(status_code=404, detail="Prompt不存在")
+    await _ensure_prompt_exists(db, prompt_id)
     
     # 验证文件类型
     if file.content_type not in ALLOWED_IMAGE_TYPES:
-        raise HTTPException(status_code=400, detail="不支持的文件类型，仅支持JPG、PNG、GIF")
-    
-    # 验证文件大小
-    file_content = await file.read()
-    if len(file_content) > settings.MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"文件大小超过限制（最大{settings.MAX_FILE_SIZE // 1024 // 1024}MB）")
-    
-    # 重置文件指针
-    file.file.seek(0)
-    
-    # 保存文件
-    file_info = save_upload_file(file, prompt_id)
-    
-    # 创建数据库记录
-    image = PromptImage(
-        prompt_id=prompt_id,
-        file_path=file_info["file_path"],
-        file_name=file_info["file_name"],
-        file_size=file_info["file_size"],
-        file_type=file_info["file_type"],
-        sort_order=sort_order
-    )
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_TYPE_MESSAGE)
     
-    db.add(image)
-    db.commit()
-    db.refresh(image)
+    # 分块写入临时文件，边写边校验大小并计算内容哈希
+    try:
+        staged = await image_store.stage_upload(file, settings.MAX_FILE_SIZE)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return PromptImageResponse.model_validate(image)
+    # 创建数据库记录，相同内容的图片共享同一文件
+    try:
+        file_path = await image_store.acquire(db, staged)
+        metadata = await image_variants.extract_metadata(db, file_path, staged.temp_path, staged.file_type)
+        image = PromptImage(
+            prompt_id=prompt_id,
+            file_path=file_path,
+            file_name=staged.file_name,
+            file_size=staged.file_size,
+            file_type=staged.file_type,
+            sort_order=sort_order,
+            **metadata
+        )
+        db.add(image)
+        await db.commit()
+    except BaseException:
+        await image_store.discard(staged)
+        raise
+    
+    await image_store.place(staged)
+    
+    # 生成缩略图变体（相同内容已有变体时跳过）
+    image_id = image.id
+    await image_variants.ensure_variants(db, image.file_path, image.file_type)
+    
+    return PromptImageResponse.model_validate(await _get_image(db, image_id))
+
+@router.post("/{prompt_id}/batch", response_model=BatchUploadResponse)
+async def batch_upload_images(
+    prompt_id: int,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    sort_order: int = 0,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量上传Prompt效果图
+    文件并发写入（UPLOAD_CONCURRENCY），所有记录一条语句插入、一次提交；
+    单个文件失败不影响其他文件，按上传顺序返回每个文件的结果。缩略图变体在响应后生成
+    """
+    if len(files) > settings.MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"单次最多上传{settings.MAX_BATCH_FILES}个文件")
+    
+    await _ensure_prompt_exists(db, prompt_id)
+    
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+    
+    async def stage(file: UploadFile):
+        """写入临时文件并提取元数据，返回 (StagedUpload, 元数据, 错误信息)"""
+        if file.content_type not in ALLOWED_IMAGE_TYPES:
+            return None, None, UNSUPPORTED_TYPE_MESSAGE
+        async with semaphore:
+            try:
+                staged = await image_store.stage_upload(file, settings.MAX_FILE_SIZE)
+            except FileTooLargeError as e:
+                return None, None, str(e)
+            except Exception as e:
+                logger.error(f"保存上传文件失败 {file.filename}: {e}")
+                return None, None, "文件保存失败"
+            metadata = await image_variants.analyze_upload(staged.temp_path, staged.file_type)
+        return staged, {**IMAGE_METADATA_DEFAULTS, **metadata}, None
+    
+    results = await asyncio.gather(*(stage(file) for file in files), return_exceptions=True)
+    stored = [
+        (index, result[0], result[1])
+        for index, result in enumerate(results)
+        if isinstance(result, tuple) and result[0] is not None
+    ]
+    staged_uploads = [staged for _, staged, _ in stored]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        for staged in staged_uploads:
+            await image_store.discard(staged)
+        raise errors[0]
+    
+    # 增加文件引用并一次性插入所有记录
+    image_ids = {}
+    if stored:
+        try:
+            await image_store.acquire_many(db, staged_uploads)
+            # RETURNING 的行序不保证与 VALUES 一致，按 sort_order 对应回文件
+            rows = (await db.execute(
+                insert(PromptImage).values([
+                    dict(
+                        prompt_id=prompt_id,
+                        file_path=staged.file_path,
+                        file_name=staged.file_name,
+                        file_size=staged.file_size,
+                        file_type=staged.file_type,
+                        sort_order=sort_order + index,
+                        **metadata
+                    )
+                    for index, staged, metadata in stored
+                ]).returning(PromptImage.id, PromptImage.sort_order)
+            )).all()
+            await db.commit()
+        except BaseException:
+            for staged in staged_uploads:
+                await image_store.discard(staged)
+            raise
+        image_ids = {row_sort_order - sort_order: image_id for image_id, row_sort_order in rows}
+        await asyncio.gather(*(image_store.place(staged) for staged in staged_uploads))
+    
+    images = {}
+    if image_ids:
+        loaded = (await db.execute(
+            select(PromptImage).options(*IMAGE_DETAIL).where(PromptImage.id.in_(image_ids.values()))
+        )).scalars().all()
+        images = {image.id: image for image in loaded}
+        pending = image_variants.pending_images(loaded)
+        if pending:
+            background_tasks.add_task(image_variants.process_pending_images, pending)
+    
+    items = []
+    for index, (file, result) in enumerate(zip(files, results)):
+        if index in image_ids:
+            items.append(BatchUploadItem(
+                file_name=file.filename or "",
+                success=True,
+                image=PromptImageResponse.model_validate(images[image_ids[index]])
+            ))
+        else:
+            items.append(BatchUploadItem(file_name=file.filename or "", success=False, error=result[2]))
+    succeeded = sum(item.success for item in items)
+    return BatchUploadResponse(items=items, succeeded=succeeded, failed=len(items) - succeeded)
 
 @router.get("/{image_id}", response_model=PromptImageResponse)
-async def get_image(image_id: int, db: Session = Depends(get_db)):
-    """获取图片信息"""
-    image = db.query(PromptImage).filter(PromptImage.id == image_id).first()
+async def get_image(image_id: int, db: AsyncSession = Depends(get_db)):
+    """获取图片信息（缺少变体或元数据时补生成）"""
+    image = await _get_image(db, image_id)
     
     if not image:
         raise HTTPException(status_code=404, detail="图片不存在")
     
+    pending = image_variants.pending_images([image])
+    for file_path, file_type, needs_metadata in pending:
+        await image_variants.ensure_variants(db, file_path, file_type)
+        if needs_metadata:
+            await image_variants.ensure_metadata(db, file_path, file_type)
+    if pending:
+        image = await _get_image(db, image_id)
+    
     return PromptImageResponse.model_validate(image)
 
+@router.get("/{image_id}/render")
+async def render_image(
+    image_id: int,
+    w: int = Query(0, ge=0, le=settings.RENDER_MAX_DIMENSION, description="最大宽度，0 表示不限制"),
+    h: int = Query(0, ge=0, le=settings.RENDER_MAX_DIMENSION, description="最大高度，0 表示不限制"),
+    fmt: str = Query("webp", regex="^(webp|jpeg|png)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """按需缩放图片（等比缩放到 w x h 范围内，不放大），结果缓存在磁盘上"""
+    if not w and not h:
+        raise HTTPException(status_code=400, detail="请至少指定宽度或高度")
+    
+    file_path = (await db.execute(
+        select(PromptImage.file_path).where(PromptImage.id == image_id)
+    )).scalar_one_or_none()
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="图片不存在")
+    
+    source = image_store.absolute_path(file_path)
+    if not await run_in_threadpool(source.exists):
+        raise HTTPException(status_code=404, detail="图片文件不存在")
+    
+    try:
+        path = await render_cache.get_or_render(str(source), file_path, w, h, fmt)
+    except Exception as e:
+        # 图片无法解码或缩放参数无效时返回 400，文件系统、进程池等其他错误按服务器错误处理
+        if imaging.is_decode_error(e) or isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail="图片无法处理")
+        raise
+    
+    return FileResponse(
+        path,
+        media_type=RENDER_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
 @router.delete("/{image_id}", response_model=MessageResponse)
-async def delete_image(image_id: int, db: Session = Depends(get_db)):
+async def delete_image(image_id: int, db: AsyncSession = Depends(get_db)):
     """删除图片"""
-    image = db.query(PromptImage).filter(PromptImage.id == image_id).first()
+    image = await db.get(PromptImage, image_id)
     
     if not image:
         raise HTTPException(status_code=404, detail="图片不存在")
     
-    file_path = image.file_path
-    
-    # 删除数据库记录
-    db.delete(image)
-    db.commit()
+    # 删除数据库记录并减少文件引用
+    await db.delete(image)
+    await db.flush()
+    released = await image_store.release(db, image.file_path)
+    await db.commit()
     
-    # 删除文件
-    delete_file(file_path)
+    # 最后一个引用删除后回收文件
+    if released:
+        await image_store.purge(db, released)
     
     return MessageResponse(message="删除成功")
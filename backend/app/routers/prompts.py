@@ -1,22 +1,73 @@
 """
 Prompt管理路由
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import DateTime, func, literal, select, tuple_
+from typing import Iterable, List, Optional
+from datetime import datetime
 from app.database import get_db
-from app.models import Prompt, PromptGroup, PromptTag, PromptImage
+from app.models import Prompt
 from app.schemas import (
     PromptCreate, PromptUpdate, PromptResponse, PromptListResponse,
-    PromptListItem, MessageResponse
+    PromptListItem, ImagePlaceholderResponse, ImportResponse, MessageResponse,
+    PromptIds, PromptBulkOperation, PromptBulkOperationResponse
 )
-from app.utils import save_upload_file
-import os
+from app.utils import encode_cursor, decode_cursor
+from app.totals import TOTAL_MODE_PATTERN, resolve_total
+from app.loading import PROMPT_LIST, PROMPT_LIST_WITH_COVER, PROMPT_DETAIL, PROMPT_COLUMNS
+from app.usage_counter import usage_counter, increment_direct, apply_pending_usage
+from app.filters import filter_prompts
+from app.conditional import Conditional, PROMPT_DETAIL_TABLES, PROMPT_LIST_TABLES, cache_headers
+from app.response_cache import response_cache
+from app.bulk_import import BulkImporter, CorruptInputError, NdjsonReader
+from app.taxonomy import taxonomy
+from app.export import (
+    COMPRESSIONS, COMPRESSION_PATTERN, Compressor, UnsupportedCompressionError,
+    export_query, stream_export
+)
+from app import bulk_operations, fast_json, image_variants
 from app.config import settings
 
 router = APIRouter()
 
+# 可排序字段，与 Prompt 上的 keyset 复合索引一一对应
+SORT_COLUMNS = {
+    "created_at": Prompt.created_at,
+    "updated_at": Prompt.updated_at,
+    "usage_count": Prompt.usage_count,
+    "name": Prompt.name,
+}
+
+async def _get_live_prompt(db: AsyncSession, prompt_id: int, options=PROMPT_COLUMNS, populate_existing: bool = False):
+    """按指定加载策略获取未删除的Prompt"""
+    stmt = select(Prompt).options(*options).where(
+        Prompt.id == prompt_id,
+        Prompt.deleted_at.is_(None)
+    )
+    if populate_existing:
+        stmt = stmt.execution_options(populate_existing=True)
+    return (await db.execute(stmt)).scalars().first()
+
+def _sort_expression(db: AsyncSession, column):
+    """
+    排序和游标比较使用的表达式
+    SQLite 按文本保存时间：服务端默认值（CURRENT_TIMESTAMP）不带微秒，ORM 写入的和游标参数带微秒，
+    按文本比较时同一秒内的行越不过游标；SQLite 上时间字段改为按 julianday（毫秒精度）排序和比较
+    """
+    if db.get_bind().dialect.name == "sqlite" and isinstance(column.type, DateTime):
+        return func.julianday(column)
+    return column
+
+def _cover_of(prompt: Prompt) -> Optional[ImagePlaceholderResponse]:
+    """排序最靠前的效果图作为封面"""
+    if not prompt.images:
+        return None
+    cover = min(prompt.images, key=lambda image: (image.sort_order, image.id))
+    return ImagePlaceholderResponse.model_validate(cover)
+
 @router.get("", response_model=PromptListResponse)
 async def get_prompts(
     page: int = Query(1, ge=1),
@@ -26,121 +77,257 @@ async def get_prompts(
     keyword: Optional[str] = None,
     sort_by: str = Query("created_at", regex="^(created_at|updated_at|usage_count|name)$"),
     order: str = Query("desc", regex="^(asc|desc)$"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="游标分页：首页传空字符串，之后传上一页返回的next_cursor"),
+    total_mode: Optional[str] = Query(None, regex=TOTAL_MODE_PATTERN, description="总数计算方式：exact / cached / estimated / none，默认页码分页为 exact、游标分页为 none"),
+    include_cover: bool = Query(False, description="是否返回封面图的尺寸、主色和低质量预览图"),
+    fields: Optional[str] = Query(None, regex=fast_json.FIELDS_PATTERN, description="只返回指定字段，逗号分隔（id 总是返回）"),
+    snippet_len: Optional[int] = Query(None, ge=1, le=10000, description="content 截断为前N个字符"),
+    etag: str = Depends(Conditional(*PROMPT_LIST_TABLES)),
+    db: AsyncSession = Depends(get_db)
 ):
-    """获取Prompt列表"""
-    query = db.query(Prompt).filter(Prompt.deleted_at.is_(None))
-    
-    # 分组筛选
-    if group_id is not None:
-        if group_id == 0:
-            # group_id=0 表示查询未分组的prompts
-            query = query.filter(Prompt.group_id.is_(None))
-        else:
-            query = query.filter(Prompt.group_id == group_id)
-    
-    # 标签筛选
-    if tag_id:
-        query = query.join(Prompt.tags).filter(PromptTag.id == tag_id)
-    
-    # 关键词搜索
-    if keyword:
-        keyword_pattern = f"%{keyword}%"
-        query = query.filter(
-            or_(
-                Prompt.name.ilike(keyword_pattern),
-                Prompt.content.ilike(keyword_pattern),
-                Prompt.description.ilike(keyword_pattern)
-            )
+    """
+    获取Prompt列表（默认页码分页，传入cursor时使用游标分页）
+    支持 If-None-Match：数据未变化时返回 304；启用响应缓存时按 ETag 缓存
+    """
+    cached = await response_cache.get("prompts", etag)
+    if cached is not None:
+        return cached
+    
+    options = PROMPT_LIST_WITH_COVER if include_cover else PROMPT_LIST
+    query = filter_prompts(db, select(Prompt), group_id, tag_id, keyword)
+    
+    # 排序，id 作为相同排序键时的次级排序
+    sort_column = _sort_expression(db, SORT_COLUMNS[sort_by])
+    if order == "asc":
+        query = query.order_by(sort_column.asc(), Prompt.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Prompt.id.desc())
+    
+    # 总数：游标分页默认不计算，保持每页代价与翻页深度无关
+    if total_mode is None:
+        total_mode = "none" if cursor is not None else "exact"
+    total, total_kind = await resolve_total(db, query, total_mode, cache_key=("prompts", group_id, tag_id, keyword))
+    
+    # 快速路径或指定了字段、截断时只读取所需列的行元组，否则加载ORM对象
+    rows = fast_json.enabled() or fields is not None or snippet_len is not None
+    selected = fast_json.parse_fields(fields)
+    
+    async def fetch(page_query):
+        if rows:
+            return (await db.execute(fast_json.as_rows(page_query, selected, snippet_len, extra=[sort_by]))).all()
+        return (await db.execute(page_query.options(*options))).scalars().all()
+    
+    next_cursor = None
+    if cursor is not None:
+        # 游标分页：从上一页最后一行之后开始读取，代价与翻页深度无关
+        if cursor:
+            position = decode_cursor(cursor, sort_by, order)
+            if position is None:
+                raise HTTPException(status_code=400, detail="无效的分页游标")
+            key, row_id = position
+            boundary = tuple_(sort_column, Prompt.id)
+            after = tuple_(_sort_expression(db, literal(key, SORT_COLUMNS[sort_by].type)), row_id)
+            query = query.where(boundary > after if order == "asc" else boundary < after)
+        
+        items = await fetch(query.limit(page_size + 1))
+        if len(items) > page_size:
+            items = items[:page_size]
+            last = items[-1]
+            next_cursor = encode_cursor(sort_by, order, getattr(last, sort_by), last.id)
+        has_more = next_cursor is not None
+    else:
+        # 分页，多取一行判断是否还有下一页
+        items = await fetch(query.offset((page - 1) * page_size).limit(page_size + 1))
+        has_more = len(items) > page_size
+        items = items[:page_size]
+    
+    if rows:
+        result = {
+            "items": await fast_json.list_items(db, items, include_cover, selected),
+            "total": total,
+            "total_kind": total_kind,
+            "has_more": has_more,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+        }
+    else:
+        list_items = [PromptListItem.model_validate(item) for item in items]
+        if include_cover:
+            for list_item, item in zip(list_items, items):
+                list_item.cover = _cover_of(item)
+        result = PromptListResponse(
+            items=await apply_pending_usage(list_items),
+            total=total,
+            total_kind=total_kind,
+            has_more=has_more,
+            page=page,
+            page_size=page_size,
+            next_cursor=next_cursor
         )
     
-    # 排序
-    if sort_by == "name":
-        order_by = Prompt.name.asc() if order == "asc" else Prompt.name.desc()
-    elif sort_by == "usage_count":
-        order_by = Prompt.usage_count.asc() if order == "asc" else Prompt.usage_count.desc()
-    elif sort_by == "updated_at":
-        order_by = Prompt.updated_at.asc() if order == "asc" else Prompt.updated_at.desc()
-    else:  # created_at
-        order_by = Prompt.created_at.asc() if order == "asc" else Prompt.created_at.desc()
-    
-    query = query.order_by(order_by)
-    
-    # 总数
-    total = query.count()
-    
-    # 分页
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    
-    return PromptListResponse(
-        items=[PromptListItem.model_validate(item) for item in items],
-        total=total,
-        page=page,
-        page_size=page_size
+    if response_cache.enabled:
+        return await response_cache.store("prompts", etag, result)
+    if rows:
+        return fast_json.response(result, headers=cache_headers(etag))
+    return result
+
+@router.get("/export")
+async def export_prompts(
+    group_id: Optional[int] = None,
+    tag_id: Optional[int] = None,
+    keyword: Optional[str] = None,
+    compression: str = Query("none", regex=COMPRESSION_PATTERN, description="压缩方式：none / gzip / zstd"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    流式导出Prompt（NDJSON，每行一个Prompt，含分组、标签和效果图元数据）
+    筛选参数与列表接口一致
+    """
+    try:
+        compressor = Compressor(compression)
+    except UnsupportedCompressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type, extension = COMPRESSIONS[compression]
+    file_name = f"prompts-{datetime.utcnow():%Y%m%d%H%M%S}{extension}"
+    query = export_query(db, group_id, tag_id, keyword)
+    return StreamingResponse(
+        stream_export(db, query, compressor, transform=apply_pending_usage),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
     )
 
+@router.post("/import", response_model=ImportResponse)
+async def import_prompts(
+    request: Request,
+    response: Response,
+    compression: str = Query("none", regex=COMPRESSION_PATTERN, description="请求体压缩方式：none / gzip / zstd"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量导入Prompt（请求体为NDJSON，格式与导出一致）
+    边接收边解析，按IMPORT_BATCH_SIZE行一批写入；返回每条失败记录的行号和原因
+    请求体中途无法解压时返回 400，响应体仍为导入结果：已导入的数量和 aborted（出错的行号）
+    """
+    try:
+        reader = NdjsonReader(compression)
+    except UnsupportedCompressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    importer = BulkImporter()
+    batch = []
+    
+    async def consume(lines):
+        nonlocal batch
+        batch.extend(importer.parse(lines))
+        while len(batch) >= settings.IMPORT_BATCH_SIZE:
+            await db.run_sync(importer.import_batch, batch[:settings.IMPORT_BATCH_SIZE])
+            batch = batch[settings.IMPORT_BATCH_SIZE:]
+    
+    try:
+        async for chunk in request.stream():
+            await consume(reader.feed(chunk))
+        await consume(reader.finish())
+        await db.run_sync(importer.import_batch, batch)
+    except CorruptInputError as e:
+        # 之前的批次已提交，出错位置之前已解析的完整行同样写入
+        await db.run_sync(importer.import_batch, batch)
+        importer.abort(e)
+        response.status_code = 400
+    finally:
+        # 导入时可能创建了分组和标签
+        await taxonomy.changed(db)
+    return importer.result
+
 @router.get("/{prompt_id}", response_model=PromptResponse)
-async def get_prompt(prompt_id: int, db: Session = Depends(get_db)):
-    """获取Prompt详情"""
-    prompt = db.query(Prompt).filter(
-        Prompt.id == prompt_id,
-        Prompt.deleted_at.is_(None)
-    ).first()
+async def get_prompt(
+    prompt_id: int,
+    background_tasks: BackgroundTasks,
+    etag: str = Depends(Conditional(*PROMPT_DETAIL_TABLES)),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取Prompt详情（支持 If-None-Match；启用响应缓存时按 ETag 缓存）"""
+    cached = await response_cache.get("prompt", etag)
+    if cached is not None:
+        return cached
+    
+    prompt = await _get_live_prompt(db, prompt_id, PROMPT_DETAIL)
     
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt不存在")
     
-    return PromptResponse.model_validate(prompt)
+    # 已有图片缺少缩略图变体或元数据时，在响应后补生成
+    pending = image_variants.pending_images(prompt.images)
+    if pending:
+        background_tasks.add_task(image_variants.process_pending_images, pending)
+    
+    if fast_json.enabled():
+        result = await fast_json.prompt_detail(prompt)
+    else:
+        result = (await apply_pending_usage([PromptResponse.model_validate(prompt)]))[0]
+    # 补生成完成前的内容不缓存
+    if response_cache.enabled and not pending:
+        return await response_cache.store("prompt", etag, result)
+    if fast_json.enabled():
+        return fast_json.FastJSONResponse(result, headers=cache_headers(etag), background=background_tasks)
+    return result
+
+async def _raise_reference_error(db: AsyncSession, error: IntegrityError,
+                                 group_id: Optional[int] = None, tag_ids: Iterable[int] = ()):
+    """
+    写入违反外键约束时调用：分组、标签快照过期（已被其他进程删除）时返回与校验相同的 400，
+    其他约束错误原样抛出
+    """
+    detail = await taxonomy.reference_error(db, group_id, tag_ids)
+    if detail is None:
+        raise error
+    raise HTTPException(status_code=400, detail=detail) from error
 
 @router.post("", response_model=PromptResponse)
 async def create_prompt(
     prompt_data: PromptCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """创建Prompt"""
-    # 验证分组是否存在
-    if prompt_data.group_id:
-        group = db.query(PromptGroup).filter(PromptGroup.id == prompt_data.group_id).first()
-        if not group:
-            raise HTTPException(status_code=400, detail="分组不存在")
+    # 验证分组、标签是否存在（从分组、标签快照读取）
+    if prompt_data.group_id and await taxonomy.missing_group(db, prompt_data.group_id):
+        raise HTTPException(status_code=400, detail="分组不存在")
     
-    # 验证标签是否存在
+    tags = []
     if prompt_data.tag_ids:
-        tags = db.query(PromptTag).filter(PromptTag.id.in_(prompt_data.tag_ids)).all()
-        if len(tags) != len(prompt_data.tag_ids):
+        tags = await taxonomy.tag_instances(db, prompt_data.tag_ids)
+        if tags is None:
             raise HTTPException(status_code=400, detail="部分标签不存在")
     
-    # 创建Prompt
+    # 创建Prompt并关联标签
     prompt = Prompt(
         name=prompt_data.name,
         content=prompt_data.content,
         description=prompt_data.description,
-        group_id=prompt_data.group_id
+        group_id=prompt_data.group_id,
+        tags=tags
     )
     
     db.add(prompt)
-    db.flush()  # 获取prompt.id
-    
-    # 关联标签
-    if prompt_data.tag_ids:
-        prompt.tags = tags
-    
-    db.commit()
-    db.refresh(prompt)
-    
+    try:
+        await db.flush()  # 获取prompt.id
+        prompt_id = prompt.id
+        await db.commit()
+    except IntegrityError as e:
+        await _raise_reference_error(db, e, prompt_data.group_id, prompt_data.tag_ids or ())
+    
+    prompt = await _get_live_prompt(db, prompt_id, PROMPT_DETAIL, populate_existing=True)
     return PromptResponse.model_validate(prompt)
 
 @router.put("/{prompt_id}", response_model=PromptResponse)
 async def update_prompt(
     prompt_id: int,
     prompt_data: PromptUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """更新Prompt"""
-    prompt = db.query(Prompt).filter(
-        Prompt.id == prompt_id,
-        Prompt.deleted_at.is_(None)
-    ).first()
+    prompt = await _get_live_prompt(db, prompt_id)
     
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt不存在")
@@ -156,79 +343,135 @@ async def update_prompt(
         if prompt_data.group_id == 0:  # 0表示移除分组
             prompt.group_id = None
         else:
-            group = db.query(PromptGroup).filter(PromptGroup.id == prompt_data.group_id).first()
-            if not group:
+            if await taxonomy.missing_group(db, prompt_data.group_id):
                 raise HTTPException(status_code=400, detail="分组不存在")
             prompt.group_id = prompt_data.group_id
     
-    # 更新标签
-    if prompt_data.tag_ids is not None:
-        tags = db.query(PromptTag).filter(PromptTag.id.in_(prompt_data.tag_ids)).all()
-        if len(tags) != len(prompt_data.tag_ids):
+    # 更新标签：只插入新增、只删除移除的关联
+    tags_changed = False
+    try:
+        if prompt_data.tag_ids is not None:
+            try:
+                added, removed = await bulk_operations.set_prompt_tags(db, prompt_id, prompt_data.tag_ids)
+            except bulk_operations.TagNotFoundError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            tags_changed = bool(added or removed)
+        
+        await db.commit()
+    except IntegrityError as e:
+        await _raise_reference_error(db, e, prompt_data.group_id, prompt_data.tag_ids or ())
+    if tags_changed:
+        await bulk_operations.refresh_search_index(db, [prompt_id])
+    
+    prompt = await _get_live_prompt(db, prompt_id, PROMPT_DETAIL, populate_existing=True)
+    return (await apply_pending_usage([PromptResponse.model_validate(prompt)]))[0]
+
+async def _batch_delete(db: AsyncSession, ids: List[int]) -> MessageResponse:
+    deleted = await bulk_operations.soft_delete(db, ids)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="未找到要删除的Prompt")
+    await db.commit()
+    await bulk_operations.refresh_search_index(db, ids)
+    return MessageResponse(message=f"成功删除{deleted}个Prompt")
+
+@router.delete("/batch", response_model=MessageResponse)
+async def batch_delete_prompts(
+    data: PromptIds,
+    db: AsyncSession = Depends(get_db)
+):
+    """批量删除Prompt（软删除）"""
+    return await _batch_delete(db, data.ids)
+
+@router.post("/batch", response_model=MessageResponse)
+async def batch_delete_prompts_legacy(
+    ids: List[int],
+    db: AsyncSession = Depends(get_db)
+):
+    """批量删除Prompt（兼容旧接口，请求体为ID数组）"""
+    return await _batch_delete(db, ids)
+
+@router.post("/bulk", response_model=PromptBulkOperationResponse)
+async def bulk_operation(
+    operation: PromptBulkOperation,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量操作：delete 软删除 / restore 恢复 / move 移动分组 / add_tags 添加标签 / remove_tags 移除标签
+    每个操作执行一条集合式SQL，返回实际影响的行数
+    """
+    ids = list(dict.fromkeys(operation.ids))
+    action = operation.action
+    group_id, tag_ids = None, []
+    
+    if action == "move":
+        if operation.group_id is None:
+            raise HTTPException(status_code=400, detail="move操作需要group_id")
+        group_id = operation.group_id or None  # 0表示移出分组
+        if group_id is not None and await taxonomy.missing_group(db, group_id):
+            raise HTTPException(status_code=400, detail="分组不存在")
+    elif action in ("add_tags", "remove_tags"):
+        tag_ids = list(dict.fromkeys(operation.tag_ids))
+        if not tag_ids:
+            raise HTTPException(status_code=400, detail=f"{action}操作需要tag_ids")
+        if await taxonomy.missing_tags(db, tag_ids):
             raise HTTPException(status_code=400, detail="部分标签不存在")
-        prompt.tags = tags
-    
-    db.commit()
-    db.refresh(prompt)
     
-    return PromptResponse.model_validate(prompt)
+    try:
+        if action == "move":
+            affected = await bulk_operations.move_to_group(db, ids, group_id)
+        elif action == "add_tags":
+            affected = await bulk_operations.add_tags(db, ids, tag_ids)
+        elif action == "remove_tags":
+            affected = await bulk_operations.remove_tags(db, ids, tag_ids)
+        elif action == "restore":
+            affected = await bulk_operations.restore(db, ids)
+        else:
+            affected = await bulk_operations.soft_delete(db, ids)
+        await db.commit()
+    except IntegrityError as e:
+        await _raise_reference_error(db, e, group_id, tag_ids)
+    # 移动分组不影响搜索索引的内容
+    if affected and action != "move":
+        await bulk_operations.refresh_search_index(db, ids)
+    
+    return PromptBulkOperationResponse(action=action, requested=len(ids), affected=affected)
 
 @router.delete("/{prompt_id}", response_model=MessageResponse)
-async def delete_prompt(prompt_id: int, db: Session = Depends(get_db)):
+async def delete_prompt(prompt_id: int, db: AsyncSession = Depends(get_db)):
     """删除Prompt（软删除）"""
     from datetime import datetime
     
-    prompt = db.query(Prompt).filter(
-        Prompt.id == prompt_id,
-        Prompt.deleted_at.is_(None)
-    ).first()
+    prompt = await _get_live_prompt(db, prompt_id)
     
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt不存在")
     
     prompt.deleted_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     return MessageResponse(message="删除成功")
 
-@router.post("/batch", response_model=MessageResponse)
-async def batch_delete_prompts(
-    ids: List[int],
-    db: Session = Depends(get_db)
-):
-    """批量删除Prompt"""
-    from datetime import datetime
-    
-    prompts = db.query(Prompt).filter(
-        Prompt.id.in_(ids),
-        Prompt.deleted_at.is_(None)
-    ).all()
-    
-    if not prompts:
-        raise HTTPException(status_code=404, detail="未找到要删除的Prompt")
-    
-    for prompt in prompts:
-        prompt.deleted_at = datetime.utcnow()
-    
-    db.commit()
-    
-    return MessageResponse(message=f"成功删除{len(prompts)}个Prompt")
-
 @router.post("/{prompt_id}/copy", response_model=MessageResponse)
-async def copy_prompt(prompt_id: int, db: Session = Depends(get_db)):
+async def copy_prompt(prompt_id: int, db: AsyncSession = Depends(get_db)):
     """复制Prompt（增加使用次数）"""
-    prompt = db.query(Prompt).filter(
-        Prompt.id == prompt_id,
-        Prompt.deleted_at.is_(None)
-    ).first()
+    content = None
+    if usage_counter.buffered:
+        # 只读取内容列，使用次数累加到计数存储，由后台批量回写
+        content = (await db.execute(
+            select(Prompt.content).where(
+                Prompt.id == prompt_id,
+                Prompt.deleted_at.is_(None)
+            )
+        )).scalar_one_or_none()
+        if content is not None and not await usage_counter.increment(prompt_id):
+            content = await increment_direct(db, prompt_id)
+    else:
+        content = await increment_direct(db, prompt_id)
     
-    if not prompt:
+    if content is None:
         raise HTTPException(status_code=404, detail="Prompt不存在")
     
-    prompt.usage_count += 1
-    db.commit()
-    
     return MessageResponse(
         message="复制成功",
-        data={"content": prompt.content}
+        data={"content": content}
     )
@@ -1,13 +1,17 @@
 """
 搜索路由
 """
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models import Prompt, PromptTag
 from app.schemas import SearchResponse, PromptListItem
+from app.totals import TOTAL_MODE_PATTERN, resolve_total
+from app.loading import PROMPT_LIST
+from app.usage_counter import apply_pending_usage
+from app import fast_json, fulltext
+from app.conditional import Conditional, PROMPT_LIST_TABLES, cache_headers
+from app.response_cache import response_cache
 
 router = APIRouter()
 
@@ -15,42 +19,64 @@ router = APIRouter()
 async def search_prompts(
     keyword: str = Query(..., min_length=1, description="搜索关键词"),
     limit: int = Query(20, ge=1, le=100, description="返回数量限制"),
-    db: Session = Depends(get_db)
+    total_mode: str = Query("exact", regex=TOTAL_MODE_PATTERN, description="总数计算方式：exact / cached / estimated / none"),
+    fields: Optional[str] = Query(None, regex=fast_json.FIELDS_PATTERN, description="只返回指定字段，逗号分隔（id 总是返回）"),
+    snippet_len: Optional[int] = Query(None, ge=1, le=10000, description="content 截断为前N个字符"),
+    etag: str = Depends(Conditional(*PROMPT_LIST_TABLES)),
+    db: AsyncSession = Depends(get_db)
 ):
-    """搜索Prompt"""
+    """搜索Prompt（支持 If-None-Match；启用响应缓存时按 ETag 缓存）"""
     if not keyword:
         return SearchResponse(items=[], total=0)
     
-    keyword_pattern = f"%{keyword}%"
+    cached = await response_cache.get("search", etag)
+    if cached is not None:
+        return cached
     
-    # 搜索Prompt名称、内容、备注
-    query = db.query(Prompt).filter(
-        Prompt.deleted_at.is_(None),
-        or_(
-            Prompt.name.ilike(keyword_pattern),
-            Prompt.content.ilike(keyword_pattern),
-            Prompt.description.ilike(keyword_pattern)
-        )
-    )
+    # 快速路径或指定了字段、截断时只读取所需列的行元组，否则加载ORM对象
+    rows = fast_json.enabled() or fields is not None or snippet_len is not None
+    selected = fast_json.parse_fields(fields)
     
-    # 搜索标签名称
-    tag_ids = db.query(PromptTag.id).filter(PromptTag.name.ilike(keyword_pattern)).all()
-    tag_ids = [tid[0] for tid in tag_ids]
+    def as_rows(query):
+        return fast_json.as_rows(query, selected, snippet_len)
     
-    if tag_ids:
-        # 如果找到匹配的标签，也搜索使用这些标签的Prompt
-        query = query.union(
-            db.query(Prompt).join(Prompt.tags).filter(
-                PromptTag.id.in_(tag_ids),
-                Prompt.deleted_at.is_(None)
-            )
-        )
+    async def fetch(query):
+        if rows:
+            return (await db.execute(as_rows(query))).all()
+        return (await db.execute(query.options(*PROMPT_LIST))).scalars().all()
+    
+    if total_mode == "exact":
+        # 搜索Prompt名称、内容、备注及标签名称，结果与总数一次查询返回
+        if rows:
+            items, total = await fulltext.search_rows(db, keyword, limit, as_rows)
+        else:
+            items, total = await fulltext.search(db, keyword, limit, options=PROMPT_LIST)
+        total_kind = "exact"
+        has_more = total > len(items)
+    else:
+        query = fulltext.search_query(db, keyword)
+        items = await fetch(query.limit(limit + 1))
+        has_more = len(items) > limit
+        items = items[:limit]
+        total, total_kind = await resolve_total(db, query, total_mode, cache_key=("search", keyword))
     
-    # 去重并限制数量
-    items = query.distinct().limit(limit).all()
-    total = query.distinct().count()
+    if rows:
+        result = {
+            "items": await fast_json.list_items(db, items, fields=selected),
+            "total": total,
+            "total_kind": total_kind,
+            "has_more": has_more,
+        }
+    else:
+        result = SearchResponse(
+            items=await apply_pending_usage([PromptListItem.model_validate(item) for item in items]),
+            total=total,
+            total_kind=total_kind,
+            has_more=has_more
+        )
     
-    return SearchResponse(
-        items=[PromptListItem.model_validate(item) for item in items],
-        total=total
-    )
+    if response_cache.enabled:
+        return await response_cache.store("search", etag, result)
+    if rows:
+        return fast_json.response(result, headers=cache_headers(etag))
+    return result
@@ -1,27 +1,36 @@
 """
 标签管理路由
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
-from app.models import PromptTag
+from app.models import PromptTag, prompt_tag_relations
 from app.schemas import PromptTagCreate, PromptTagUpdate, PromptTagResponse, MessageResponse
+from app.conditional import cache_headers, make_etag, not_modified
+from app.taxonomy import taxonomy
 
 router = APIRouter()
 
 @router.get("", response_model=List[PromptTagResponse])
-async def get_tags(db: Session = Depends(get_db)):
-    """获取标签列表"""
-    tags = db.query(PromptTag).order_by(PromptTag.created_at).all()
-    return [PromptTagResponse.model_validate(tag) for tag in tags]
+async def get_tags(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    获取标签列表（从分组、标签快照返回，只查询 table_versions 中标签表的版本号）
+    支持 If-None-Match：标签未变化时返回 304
+    """
+    snapshot = await taxonomy.get_current(db, ("prompt_tags",))
+    etag = make_etag(request, (snapshot.db_versions["prompt_tags"],))
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return Response(snapshot.tags_body, media_type="application/json", headers=cache_headers(etag))
 
 @router.post("", response_model=PromptTagResponse)
-async def create_tag(tag_data: PromptTagCreate, db: Session = Depends(get_db)):
+async def create_tag(tag_data: PromptTagCreate, db: AsyncSession = Depends(get_db)):
     """创建标签"""
     # 检查名称是否已存在
-    existing = db.query(PromptTag).filter(PromptTag.name == tag_data.name).first()
-    if existing:
+    if await taxonomy.tag_name_taken(db, tag_data.name):
         raise HTTPException(status_code=400, detail="标签名称已存在")
     
     tag = PromptTag(
@@ -30,8 +39,14 @@ async def create_tag(tag_data: PromptTagCreate, db: Session = Depends(get_db)):
     )
     
     db.add(tag)
-    db.commit()
-    db.refresh(tag)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 快照过期，名称已被其他进程使用
+        await taxonomy.recover(db)
+        raise HTTPException(status_code=400, detail="标签名称已存在")
+    await db.refresh(tag)
+    await taxonomy.changed(db)
     
     return PromptTagResponse.model_validate(tag)
 
@@ -39,38 +54,46 @@ async def create_tag(tag_data: PromptTagCreate, db: Session = Depends(get_db)):
 async def update_tag(
     tag_id: int,
     tag_data: PromptTagUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """更新标签"""
-    tag = db.query(PromptTag).filter(PromptTag.id == tag_id).first()
+    tag = await db.get(PromptTag, tag_id)
     
     if not tag:
         raise HTTPException(status_code=404, detail="标签不存在")
     
     # 检查名称是否与其他标签冲突
     if tag_data.name and tag_data.name != tag.name:
-        existing = db.query(PromptTag).filter(PromptTag.name == tag_data.name).first()
-        if existing:
+        if await taxonomy.tag_name_taken(db, tag_data.name):
             raise HTTPException(status_code=400, detail="标签名称已存在")
         tag.name = tag_data.name
     
     if tag_data.color is not None:
         tag.color = tag_data.color
     
-    db.commit()
-    db.refresh(tag)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 快照过期，名称已被其他进程使用
+        await taxonomy.recover(db)
+        raise HTTPException(status_code=400, detail="标签名称已存在")
+    await db.refresh(tag)
+    await taxonomy.changed(db)
     
     return PromptTagResponse.model_validate(tag)
 
 @router.delete("/{tag_id}", response_model=MessageResponse)
-async def delete_tag(tag_id: int, db: Session = Depends(get_db)):
+async def delete_tag(tag_id: int, db: AsyncSession = Depends(get_db)):
     """删除标签"""
-    tag = db.query(PromptTag).filter(PromptTag.id == tag_id).first()
+    tag = await db.get(PromptTag, tag_id)
     
     if not tag:
         raise HTTPException(status_code=404, detail="标签不存在")
     
-    db.delete(tag)
-    db.commit()
+    # 显式删除关联（而不是依赖数据库的级联删除），使 prompt_tag_relations 的版本号递增
+    await db.execute(delete(prompt_tag_relations).where(prompt_tag_relations.c.tag_id == tag_id))
+    await db.delete(tag)
+    await db.commit()
+    await taxonomy.changed(db)
     
     return MessageResponse(message="删除成功")
@@ -1,7 +1,7 @@
 """
 Pydantic schemas for API request/response
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -46,6 +46,16 @@ class PromptTagResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ImageVariantResponse(BaseModel):
+    width: int
+    height: int
+    format: str
+    file_path: str
+    file_size: int
+    
+    class Config:
+        from_attributes = True
+
 class PromptImageResponse(BaseModel):
     id: int
     prompt_id: int
@@ -55,10 +65,27 @@ class PromptImageResponse(BaseModel):
     file_type: str
     sort_order: int
     created_at: datetime
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = Field(None, description="低质量预览图（base64 data URI）")
+    variants: List[ImageVariantResponse] = []
     
     class Config:
         from_attributes = True
 
+class BatchUploadItem(BaseModel):
+    """批量上传中单个文件的结果"""
+    file_name: str
+    success: bool
+    image: Optional[PromptImageResponse] = None
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    items: List[BatchUploadItem]
+    succeeded: int
+    failed: int
+
 class PromptResponse(BaseModel):
     id: int
     name: str
@@ -75,6 +102,18 @@ class PromptResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ImagePlaceholderResponse(BaseModel):
+    """列表封面图：尺寸、主色和低质量预览图，用于预留布局和占位"""
+    id: int
+    file_path: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
 class PromptListItem(BaseModel):
     id: int
     name: str
@@ -86,15 +125,124 @@ class PromptListItem(BaseModel):
     updated_at: datetime
     group: Optional[PromptGroupResponse] = None
     tags: List[PromptTagResponse] = []
+    cover: Optional[ImagePlaceholderResponse] = Field(None, description="封面图占位信息，include_cover=true时返回")
     
     class Config:
         from_attributes = True
 
 class PromptListResponse(BaseModel):
     items: List[PromptListItem]
-    total: int
+    total: Optional[int] = Field(None, description="总数，total_kind为none时为空")
+    total_kind: str = Field("exact", description="总数类型：exact / cached / estimated / none")
+    has_more: bool = False
     page: int
     page_size: int
+    next_cursor: Optional[str] = Field(None, description="游标分页模式下的下一页游标，没有更多数据时为空")
+
+# 导出相关schemas（NDJSON，每行一个Prompt）
+class ExportGroup(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    sort_order: Optional[int] = 0
+    
+    class Config:
+        from_attributes = True
+
+class ExportTag(BaseModel):
+    id: int
+    name: str
+    color: str
+    
+    class Config:
+        from_attributes = True
+
+class ExportImage(BaseModel):
+    file_path: str
+    file_name: str
+    file_size: int
+    file_type: str
+    sort_order: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class PromptExportRecord(BaseModel):
+    id: int
+    name: str
+    content: str
+    description: Optional[str]
+    usage_count: int
+    created_at: datetime
+    updated_at: datetime
+    group: Optional[ExportGroup] = None
+    tags: List[ExportTag] = []
+    images: List[ExportImage] = []
+    
+    class Config:
+        from_attributes = True
+
+# 导入相关schemas（NDJSON，字段与导出一致，分组和标签按名称匹配，可直接写名称字符串）
+class ImportGroup(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    description: Optional[str] = None
+    sort_order: int = 0
+
+class ImportTag(BaseModel):
+    name: str = Field(..., min_length=1, max_length=50)
+    color: str = Field("#1890ff", max_length=20)
+
+class PromptImportRecord(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    content: str = Field(..., min_length=1)
+    description: Optional[str] = None
+    usage_count: int = Field(0, ge=0)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    group: Optional[ImportGroup] = None
+    tags: List[ImportTag] = []
+    
+    @field_validator("group", mode="before")
+    @classmethod
+    def _group_name(cls, value):
+        return {"name": value} if isinstance(value, str) else value
+    
+    @field_validator("tags", mode="before")
+    @classmethod
+    def _tag_names(cls, value):
+        if isinstance(value, list):
+            return [{"name": item} if isinstance(item, str) else item for item in value]
+        return value
+
+class ImportRecordError(BaseModel):
+    line: int = Field(..., description="NDJSON中的行号（从1开始）")
+    error: str
+
+class ImportResponse(BaseModel):
+    total: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRecordError] = []
+    aborted: Optional[ImportRecordError] = Field(None, description="请求体中途无法解压时中止导入的行号和原因，之前的行已导入")
+
+# 批量操作相关schemas
+class PromptIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+class PromptBulkOperation(PromptIds):
+    action: str = Field(..., pattern="^(delete|restore|move|add_tags|remove_tags)$",
+                        description="delete / restore / move / add_tags / remove_tags")
+    group_id: Optional[int] = Field(None, description="move的目标分组ID，0表示移出分组")
+    tag_ids: List[int] = Field(default_factory=list, description="add_tags / remove_tags的标签ID列表")
+
+class PromptBulkOperationResponse(BaseModel):
+    action: str
+    requested: int = Field(..., description="请求的Prompt数量")
+    affected: int = Field(..., description="实际影响的行数（标签操作为新增/删除的关联数）")
 
 # 分组相关schemas
 class PromptGroupCreate(PromptGroupBase):
@@ -120,7 +268,9 @@ class PromptTagUpdate(BaseModel):
 # 搜索相关schemas
 class SearchResponse(BaseModel):
     items: List[PromptListItem]
-    total: int
+    total: Optional[int] = None
+    total_kind: str = "exact"
+    has_more: bool = False
 
 # 通用响应
 class MessageResponse(BaseModel):
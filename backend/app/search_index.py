@@ -0,0 +1,351 @@
+"""
+进程内倒排索引（可选）
+
+- 中文/日文/韩文按字符一元 + 二元切分，拉丁文本按单词切分（查询时按前缀匹配）
+- 倒排表为有序的 array('i')，内存紧凑，求交集使用二分查找
+- 启动时从 Prompt 表构建，之后通过 SQLAlchemy Session 事件增量更新：
+  after_flush 记录变更快照，after_commit 生效，回滚则丢弃
+- 搜索时只返回命中的 prompt id；列表和搜索接口把它作为候选集合缩小数据库查询的范围，匹配条件、排序和总数仍由数据库决定
+"""
+import bisect
+import logging
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Prompt, PromptTag, prompt_tag_relations
+
+logger = logging.getLogger(__name__)
+
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"([{_CJK_CHARS}]+)|([^\W{_CJK_CHARS}]+)")
+# 拉丁单词字符（关键词以它开头时可能从单词中间开始匹配）
+_WORD_CHAR_RE = re.compile(rf"[^\W{_CJK_CHARS}]")
+
+_PENDING_KEY = "search_index_pending"
+
+
+def tokenize(text: Optional[str]) -> Set[str]:
+    """文档切词：CJK 字符一元和二元，拉丁文本整词"""
+    tokens = set()
+    if not text:
+        return tokens
+    for cjk, word in _TOKEN_RE.findall(text.lower()):
+        if cjk:
+            tokens.update(cjk)
+            tokens.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.add(word)
+    return tokens
+
+
+def _query_terms(keyword: str) -> List[tuple]:
+    """查询切词：返回 (词, 是否前缀匹配) 列表"""
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(keyword.lower()):
+        if cjk:
+            if len(cjk) == 1:
+                terms.append((cjk, False))
+            else:
+                terms.extend((cjk[i:i + 2], False) for i in range(len(cjk) - 1))
+        else:
+            terms.append((word, True))
+    return terms
+
+
+def _intersect(small: array, large: array) -> array:
+    """有序数组求交集：遍历较短的一侧，在较长的一侧二分查找"""
+    result = array("i")
+    lo = 0
+    n = len(large)
+    for value in small:
+        lo = bisect.bisect_left(large, value, lo)
+        if lo == n:
+            break
+        if large[lo] == value:
+            result.append(value)
+    return result
+
+
+def _union(arrays: Iterable[array]) -> array:
+    merged: Set[int] = set()
+    for arr in arrays:
+        merged.update(arr)
+    return array("i", sorted(merged))
+
+
+def _insert(postings: array, value: int) -> None:
+    i = bisect.bisect_left(postings, value)
+    if i == len(postings) or postings[i] != value:
+        postings.insert(i, value)
+
+
+def _remove(postings: array, value: int) -> None:
+    i = bisect.bisect_left(postings, value)
+    if i < len(postings) and postings[i] == value:
+        del postings[i]
+
+
+class PromptSearchIndex:
+    """Prompt 倒排索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self._clear()
+
+    def _clear(self):
+        self._postings: Dict[str, array] = {}
+        self._doc_tokens: Dict[int, frozenset] = {}
+        self._words: List[str] = []
+        self._words_dirty = False
+        self._tag_names: Dict[int, str] = {}
+        self._tag_postings: Dict[int, array] = {}
+        self._prompt_tags: Dict[int, Set[int]] = {}
+
+    # ---------- 构建 ----------
+
+    def rebuild(self, db: Session) -> None:
+        """从数据库全量构建索引"""
+        with self._lock:
+            self._clear()
+            rows = db.query(
+                Prompt.id, Prompt.name, Prompt.content, Prompt.description
+            ).filter(Prompt.deleted_at.is_(None)).yield_per(1000)
+            for prompt_id, name, content, description in rows:
+                self._index_text(prompt_id, name, content, description)
+
+            for tag_id, name in db.query(PromptTag.id, PromptTag.name):
+                self._tag_names[tag_id] = (name or "").lower()
+
+            relations = db.query(
+                prompt_tag_relations.c.prompt_id, prompt_tag_relations.c.tag_id
+            ).join(Prompt, Prompt.id == prompt_tag_relations.c.prompt_id).filter(
+                Prompt.deleted_at.is_(None)
+            )
+            for prompt_id, tag_id in relations:
+                self._prompt_tags.setdefault(prompt_id, set()).add(tag_id)
+                _insert(self._tag_postings.setdefault(tag_id, array("i")), prompt_id)
+
+            self.ready = True
+            logger.info(f"搜索索引构建完成: {len(self._doc_tokens)} 个Prompt, {len(self._postings)} 个词项")
+
+    def refresh(self, db: Session, prompt_ids: Iterable[int]) -> None:
+        """
+        按id从数据库重新加载指定Prompt
+        供绕过ORM单元工作的批量SQL写操作在提交后调用
+        """
+        if not self.ready:
+            return
+        prompt_ids = list(prompt_ids)
+        if not prompt_ids:
+            return
+        rows = db.query(
+            Prompt.id, Prompt.name, Prompt.content, Prompt.description, Prompt.deleted_at
+        ).filter(Prompt.id.in_(prompt_ids)).all()
+        relations = db.query(
+            prompt_tag_relations.c.prompt_id, prompt_tag_relations.c.tag_id
+        ).filter(prompt_tag_relations.c.prompt_id.in_(prompt_ids)).all()
+        tags_by_prompt: Dict[int, Set[int]] = {prompt_id: set() for prompt_id in prompt_ids}
+        for prompt_id, tag_id in relations:
+            tags_by_prompt[prompt_id].add(tag_id)
+        # 批量写入时可能同时创建了标签
+        new_tag_ids = {tag_id for _, tag_id in relations} - set(self._tag_names)
+        new_tags = db.query(PromptTag.id, PromptTag.name).filter(
+            PromptTag.id.in_(new_tag_ids)
+        ).all() if new_tag_ids else []
+
+        with self._lock:
+            for tag_id, name in new_tags:
+                self._tag_names[tag_id] = (name or "").lower()
+            found = set()
+            for prompt_id, name, content, description, deleted_at in rows:
+                found.add(prompt_id)
+                if deleted_at is not None:
+                    self._remove_prompt(prompt_id)
+                else:
+                    self._index_text(prompt_id, name, content, description)
+                    self._set_prompt_tags(prompt_id, tags_by_prompt[prompt_id])
+            for prompt_id in set(prompt_ids) - found:
+                self._remove_prompt(prompt_id)
+
+    # ---------- 增量维护 ----------
+
+    def _index_text(self, prompt_id: int, name, content, description) -> None:
+        tokens = frozenset(tokenize(name) | tokenize(content) | tokenize(description))
+        old = self._doc_tokens.get(prompt_id, frozenset())
+        for token in old - tokens:
+            postings = self._postings.get(token)
+            if postings is not None:
+                _remove(postings, prompt_id)
+                if not postings:
+                    del self._postings[token]
+                    self._words_dirty = True
+        for token in tokens - old:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("i")
+                self._words_dirty = True
+            _insert(postings, prompt_id)
+        self._doc_tokens[prompt_id] = tokens
+
+    def _set_prompt_tags(self, prompt_id: int, tag_ids: Set[int]) -> None:
+        old = self._prompt_tags.get(prompt_id, set())
+        for tag_id in old - tag_ids:
+            postings = self._tag_postings.get(tag_id)
+            if postings is not None:
+                _remove(postings, prompt_id)
+        for tag_id in tag_ids - old:
+            _insert(self._tag_postings.setdefault(tag_id, array("i")), prompt_id)
+        if tag_ids:
+            self._prompt_tags[prompt_id] = set(tag_ids)
+        else:
+            self._prompt_tags.pop(prompt_id, None)
+
+    def _remove_prompt(self, prompt_id: int) -> None:
+        self._index_text(prompt_id, None, None, None)
+        self._doc_tokens.pop(prompt_id, None)
+        self._set_prompt_tags(prompt_id, set())
+
+    def _apply(self, ops: List[tuple]) -> None:
+        with self._lock:
+            for op in ops:
+                kind = op[0]
+                if kind == "prompt":
+                    _, prompt_id, fields, tag_ids = op
+                    if fields is None:
+                        self._remove_prompt(prompt_id)
+                        continue
+                    self._index_text(prompt_id, *fields)
+                    if tag_ids is not None:
+                        self._set_prompt_tags(prompt_id, tag_ids)
+                elif kind == "tag":
+                    _, tag_id, name = op
+                    if name is None:
+                        self._tag_names.pop(tag_id, None)
+                        for prompt_id in self._tag_postings.pop(tag_id, array("i")):
+                            self._prompt_tags.get(prompt_id, set()).discard(tag_id)
+                    else:
+                        self._tag_names[tag_id] = name.lower()
+
+    # ---------- 查询 ----------
+
+    def _prefix_postings(self, prefix: str) -> List[array]:
+        if self._words_dirty:
+            self._words = sorted(self._postings)
+            self._words_dirty = False
+        start = bisect.bisect_left(self._words, prefix)
+        result = []
+        for word in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            result.append(self._postings[word])
+        return result
+
+    def search(self, keyword: str, include_tags: bool = True) -> Optional[List[int]]:
+        """
+        返回命中的prompt id（按id倒序，即新建的在前）
+        关键词无法切出有效词项时返回None，由调用方退回数据库查询
+        """
+        terms = _query_terms(keyword)
+        if not terms:
+            return None
+
+        with self._lock:
+            groups = []
+            for term, prefix in terms:
+                if prefix:
+                    postings = self._prefix_postings(term)
+                    groups.append(postings[0] if len(postings) == 1 else _union(postings))
+                else:
+                    groups.append(self._postings.get(term, array("i")))
+
+            groups.sort(key=len)
+            hits = groups[0]
+            for postings in groups[1:]:
+                if not hits:
+                    break
+                hits = _intersect(hits, postings)
+
+            if include_tags:
+                needle = keyword.lower()
+                tag_hits = [
+                    self._tag_postings[tag_id]
+                    for tag_id, name in self._tag_names.items()
+                    if needle in name and tag_id in self._tag_postings
+                ]
+                if tag_hits:
+                    hits = _union([hits, *tag_hits])
+
+            return list(reversed(hits))
+
+    def substring_candidates(self, keyword: str, include_tags: bool = False) -> Optional[List[int]]:
+        """
+        可能以子串形式包含 keyword 的prompt id（include_tags 时包括标签名称），是子串匹配结果的超集，
+        调用方用于缩小查询范围，仍需按子串条件过滤。以下情况返回None，由调用方只用数据库条件：
+        - 索引未启用，或关键词无法切出有效词项
+        - 关键词以拉丁单词字符开头：可能从单词中间开始匹配，按前缀查找的词项无法覆盖
+        - 候选超过 SEARCH_INDEX_MAX_IDS，避免过长的 IN 列表
+        """
+        if not self.ready or _WORD_CHAR_RE.match(keyword.lower()):
+            return None
+        hits = self.search(keyword, include_tags=include_tags)
+        if hits is None or len(hits) > settings.SEARCH_INDEX_MAX_IDS:
+            return None
+        return hits
+
+
+search_index = PromptSearchIndex()
+
+
+# ---------- Session 事件 ----------
+
+def _snapshot_prompt(prompt: Prompt) -> tuple:
+    if prompt.deleted_at is not None:
+        return ("prompt", prompt.id, None, None)
+    state = inspect(prompt)
+    tag_ids = None
+    if "tags" in state.dict:
+        tag_ids = {tag.id for tag in prompt.tags}
+    return ("prompt", prompt.id, (prompt.name, prompt.content, prompt.description), tag_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if not search_index.ready:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, Prompt):
+            pending.append(_snapshot_prompt(obj))
+        elif isinstance(obj, PromptTag):
+            pending.append(("tag", obj.id, obj.name))
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=True):
+            continue
+        if isinstance(obj, Prompt):
+            pending.append(_snapshot_prompt(obj))
+        elif isinstance(obj, PromptTag):
+            pending.append(("tag", obj.id, obj.name))
+    for obj in session.deleted:
+        if isinstance(obj, Prompt):
+            pending.append(("prompt", obj.id, None, None))
+        elif isinstance(obj, PromptTag):
+            pending.append(("tag", obj.id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and search_index.ready:
+        search_index._apply(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,166 @@
+"""
+上传文件的静态访问
+
+上传目录下的文件名均为内容哈希或 uuid，写入后不会再修改，因此：
+- 返回长期缓存的 Cache-Control: immutable
+- 强 ETag 由文件名（内容哈希 / uuid）和文件大小构成，无需读取文件内容
+- 支持 If-None-Match / If-Modified-Since 返回 304
+- 支持单个字节范围的 Range 请求（206 / 416），多个范围时返回完整内容
+- 在访问文件系统之前拒绝包含 ..、反斜杠、空字符等的路径
+"""
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CHUNK_SIZE = 64 * 1024
+
+_SAFE_PATH_RE = re.compile(r"^[A-Za-z0-9_\-./]+$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def safe_relative_path(path: str) -> Optional[str]:
+    """校验请求路径，只允许普通的多级文件名，不合法时返回 None"""
+    path = path.lstrip("/")
+    if not path or not _SAFE_PATH_RE.match(path):
+        return None
+    if any(part in ("", ".", "..") for part in path.split("/")):
+        return None
+    return path
+
+
+def make_etag(path: str, size: int) -> str:
+    return f'"{Path(path).stem}-{size:x}"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match 使用弱比较
+    etag = etag.removeprefix("W/")
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围，返回 [start, end]（闭区间）
+    格式不支持（如多个范围）时返回 None，范围无法满足时抛出 ValueError
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # 最后 N 个字节
+        length = int(end)
+        if length == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+async def _iter_file(path: str, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class UploadFiles:
+    """上传目录的静态文件服务（ASGI 应用）"""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        response = await self.get_response(request)
+        await response(scope, receive, send)
+
+    async def get_response(self, request: Request) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            return PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+
+        relative = safe_relative_path(request.scope["path"])
+        if relative is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        full_path = os.path.join(self.directory, relative)
+        try:
+            st = await anyio.to_thread.run_sync(os.stat, full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return PlainTextResponse("Not Found", status_code=404)
+        if not stat.S_ISREG(st.st_mode):
+            return PlainTextResponse("Not Found", status_code=404)
+
+        size = st.st_size
+        etag = make_etag(relative, size)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+        if _not_modified(request, etag, st.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+        start, length, status_code = 0, size, 200
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range.strip() == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        headers["Content-Length"] = str(length)
+        if request.method == "HEAD":
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        return StreamingResponse(
+            _iter_file(full_path, start, length),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+        )
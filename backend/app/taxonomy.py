@@ -0,0 +1,246 @@
+"""
+分组、标签的进程内快照
+
+创建、更新 Prompt 时校验分组和标签，分组、标签检查重名，标签列表接口，都从快照读取，不查询数据库：
+- 快照是不可变对象，重新加载后整体替换，读取方不会看到加载到一半的状态
+- 本进程提交的 prompt_groups / prompt_tags 写入使进程内版本号变化（见 app.versions），写入接口提交后立即重新加载
+- TAXONOMY_INVALIDATION=redis 时写入方通过 Redis 频道通知其他 worker，其他 worker 下次读取时重新加载
+- 快照超过 TAXONOMY_CACHE_TTL 后重新加载，限制未发出通知的写入（如未配置 Redis 时的命令行导入）造成的过期时间
+会拒绝请求的结果（分组或标签不存在、名称已存在）先重新加载快照再确认，过期的快照不会误拒请求；
+过期的快照放行的写入违反外键或唯一约束时，接口回滚并重新加载快照，返回与校验相同的 400。
+标签列表接口另外核对 table_versions 中的版本号（一次按主键的查询），各 worker 返回一致的内容和 ETag。
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import versions
+from app.config import settings
+from app.fast_json import GROUP_FIELDS, TAG_FIELDS
+from app.models import PromptGroup, PromptTag
+from app.response_cache import dumps
+
+logger = logging.getLogger(__name__)
+
+# 快照依赖的表
+TAXONOMY_TABLES = ("prompt_groups", "prompt_tags")
+CHANNEL = "prompt:taxonomy"
+# 订阅断开后重新订阅的间隔（秒）
+RESUBSCRIBE_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """某一时刻的全部分组和标签，加载后不再修改"""
+    key: Tuple[int, ...]
+    # 加载时 table_versions 中的版本号
+    db_versions: Dict[str, int]
+    loaded_at: float
+    groups: Dict[int, Dict]
+    group_names: Dict[str, int]
+    tags: Dict[int, Dict]
+    tag_names: Dict[str, int]
+    # 标签列表接口的响应体（按创建时间排序）
+    tags_body: bytes
+
+
+class TaxonomyCache:
+    """分组、标签快照：过期时加载（并发读取只加载一次），写入后刷新"""
+
+    def __init__(self):
+        self._snapshot: Optional[Snapshot] = None
+        # 收到其他 worker 的通知时递增，使当前快照过期
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._token = uuid.uuid4().hex.encode()
+
+    def _key(self) -> Tuple[int, ...]:
+        return (self._generation, *versions.get_versions(*TAXONOMY_TABLES))
+
+    def _fresh(self, snapshot: Optional[Snapshot]) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.key == self._key()
+            and time.monotonic() - snapshot.loaded_at < settings.TAXONOMY_CACHE_TTL
+        )
+
+    def invalidate(self) -> None:
+        """使当前快照过期，下次读取时重新加载"""
+        self._generation += 1
+
+    async def _load(self, db: AsyncSession) -> Snapshot:
+        # 版本号在查询之前读取：查询期间提交的写入使快照在下次读取时重新加载
+        key = self._key()
+        db_versions = dict(zip(TAXONOMY_TABLES, await versions.load_versions(db, TAXONOMY_TABLES)))
+        group_rows = (await db.execute(select(*(getattr(PromptGroup, field) for field in GROUP_FIELDS)))).all()
+        tag_rows = (await db.execute(
+            select(*(getattr(PromptTag, field) for field in TAG_FIELDS)).order_by(PromptTag.created_at, PromptTag.id)
+        )).all()
+        groups = {row.id: dict(zip(GROUP_FIELDS, row)) for row in group_rows}
+        tags = {row.id: dict(zip(TAG_FIELDS, row)) for row in tag_rows}
+        return Snapshot(
+            key=key,
+            db_versions=db_versions,
+            loaded_at=time.monotonic(),
+            groups=groups,
+            group_names={group["name"]: group_id for group_id, group in groups.items()},
+            tags=tags,
+            tag_names={tag["name"]: tag_id for tag_id, tag in tags.items()},
+            tags_body=dumps(list(tags.values())),
+        )
+
+    async def get(self, db: AsyncSession, refresh: bool = False) -> Snapshot:
+        """获取当前快照，过期或 refresh 时重新加载"""
+        seen = self._snapshot
+        if not refresh and self._fresh(seen):
+            return seen
+        async with self._lock:
+            snapshot = self._snapshot
+            # 等待期间其他请求已经重新加载
+            if snapshot is not seen and self._fresh(snapshot):
+                return snapshot
+            snapshot = await self._load(db)
+            self._snapshot = snapshot
+            return snapshot
+
+    async def get_current(self, db: AsyncSession, tables: Sequence[str] = TAXONOMY_TABLES) -> Snapshot:
+        """与 table_versions 核对后的快照：其他进程写入了 tables 时重新加载"""
+        current = dict(zip(tables, await versions.load_versions(db, tables)))
+        snapshot = await self.get(db)
+        if any(snapshot.db_versions[table] != version for table, version in current.items()):
+            snapshot = await self.get(db, refresh=True)
+        return snapshot
+
+    async def recover(self, db: AsyncSession) -> Snapshot:
+        """写入因快照过期违反约束后调用：回滚事务并重新加载快照"""
+        await db.rollback()
+        return await self.get(db, refresh=True)
+
+    async def reference_error(self, db: AsyncSession, group_id: Optional[int] = None,
+                              tag_ids: Iterable[int] = ()) -> Optional[str]:
+        """
+        写入违反外键约束后调用：回滚并重新加载快照，返回与校验相同的错误信息
+        分组和标签都存在（不是快照过期造成的）时返回 None
+        """
+        snapshot = await self.recover(db)
+        if group_id and group_id not in snapshot.groups:
+            return "分组不存在"
+        if not snapshot.tags.keys() >= set(tag_ids):
+            return "部分标签不存在"
+        return None
+
+    async def _rejected(self, db: AsyncSession, rejects: Callable[[Snapshot], bool]) -> bool:
+        """按快照判断是否拒绝请求，拒绝前重新加载快照确认"""
+        if not rejects(await self.get(db)):
+            return False
+        return rejects(await self.get(db, refresh=True))
+
+    async def missing_group(self, db: AsyncSession, group_id: int) -> bool:
+        return await self._rejected(db, lambda snapshot: group_id not in snapshot.groups)
+
+    async def missing_tags(self, db: AsyncSession, tag_ids: Iterable[int]) -> bool:
+        tag_ids = set(tag_ids)
+        return await self._rejected(db, lambda snapshot: not tag_ids <= snapshot.tags.keys())
+
+    async def group_name_taken(self, db: AsyncSession, name: str) -> bool:
+        return await self._rejected(db, lambda snapshot: name in snapshot.group_names)
+
+    async def tag_name_taken(self, db: AsyncSession, name: str) -> bool:
+        return await self._rejected(db, lambda snapshot: name in snapshot.tag_names)
+
+    async def tag_instances(self, db: AsyncSession, tag_ids: Iterable[int]) -> Optional[List[PromptTag]]:
+        """
+        由快照构造会话中的标签对象（不查询数据库），用于设置 Prompt.tags
+        部分标签不存在时返回 None
+        """
+        tag_ids = list(dict.fromkeys(tag_ids))
+        snapshot = await self.get(db)
+        if not snapshot.tags.keys() >= set(tag_ids):
+            snapshot = await self.get(db, refresh=True)
+            if not snapshot.tags.keys() >= set(tag_ids):
+                return None
+        tags = []
+        for tag_id in tag_ids:
+            tag = PromptTag(**snapshot.tags[tag_id])
+            make_transient_to_detached(tag)
+            tags.append(await db.merge(tag, load=False))
+        return tags
+
+    async def changed(self, db: AsyncSession) -> None:
+        """分组或标签写入提交后调用：重新加载本进程的快照并通知其他 worker"""
+        await self.get(db, refresh=True)
+        if settings.TAXONOMY_INVALIDATION != "redis":
+            return
+        from app.redis_client import get_redis
+        try:
+            await get_redis().publish(CHANNEL, self._token)
+        except Exception as e:
+            logger.warning(f"发送分组、标签刷新通知失败: {e}")
+
+    async def _listen(self) -> None:
+        from app.redis_client import get_redis
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                # 未订阅期间可能错过通知
+                self.invalidate()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.5)
+                    if message is not None and message["data"] != self._token:
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"订阅分组、标签刷新通知失败: {e}")
+                await asyncio.sleep(RESUBSCRIBE_INTERVAL)
+            finally:
+                await pubsub.reset()
+
+    def start(self) -> None:
+        """清空快照（首次读取时加载），TAXONOMY_INVALIDATION=redis 时订阅其他 worker 的刷新通知"""
+        self._snapshot = None
+        self._lock = asyncio.Lock()
+        if settings.TAXONOMY_INVALIDATION == "redis" and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def notify_sync() -> None:
+    """不运行事件循环的进程（命令行导入）写入分组或标签后通知各 worker 刷新"""
+    if settings.TAXONOMY_INVALIDATION != "redis":
+        return
+    import redis
+    client = redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD or None,
+        db=settings.REDIS_DB,
+        socket_timeout=1.0,
+        socket_connect_timeout=1.0,
+    )
+    try:
+        client.publish(CHANNEL, b"cli")
+    except Exception as e:
+        logger.warning(f"发送分组、标签刷新通知失败: {e}")
+    finally:
+        client.close()
+
+
+taxonomy = TaxonomyCache()
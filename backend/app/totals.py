@@ -0,0 +1,123 @@
+"""
+列表总数计算
+
+支持按请求选择总数的计算方式：
+- exact: 每次执行 COUNT
+- cached: 缓存 COUNT 结果，prompts / prompt_tag_relations 表提交写入后失效
+  （按 table_versions 中的版本号判断，其他 worker 和命令行的写入同样使缓存失效）
+- estimated: 使用 PostgreSQL 查询计划的估算行数（其他数据库退回 cached）
+- none: 不计算总数，仅通过 has_more 判断是否还有下一页
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app import versions
+
+logger = logging.getLogger(__name__)
+
+TOTAL_MODE_PATTERN = "^(exact|cached|estimated|none)$"
+
+# 总数依赖的表
+COUNTED_TABLES = ("prompts", "prompt_tag_relations")
+
+
+class CountCache:
+    """按查询条件缓存的 COUNT 结果（LRU）"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[tuple, int]]" = OrderedDict()
+        self.max_entries = max_entries
+
+    def get(self, key: Hashable, current: tuple) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            version, total = entry
+            if version != current:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return total
+
+    def set(self, key: Hashable, total: int, version: tuple) -> None:
+        with self._lock:
+            self._entries[key] = (version, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def count_statement(stmt: Select) -> Select:
+    """将查询包装为 COUNT 语句"""
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
+
+
+async def estimate_count(db: AsyncSession, stmt: Select) -> Optional[int]:
+    """通过 EXPLAIN 获取查询计划估算的行数，仅支持 PostgreSQL"""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    try:
+        compiled = stmt.order_by(None).compile(
+            dialect=bind.dialect,
+            compile_kwargs={"literal_binds": True, "render_postcompile": True}
+        )
+        # 在保存点中执行，失败时不影响外层事务
+        async with db.begin_nested():
+            plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"估算总数失败，改用精确计数: {e}")
+        return None
+
+
+async def exact_count(db: AsyncSession, stmt: Select) -> int:
+    """精确计数"""
+    return (await db.execute(count_statement(stmt))).scalar_one()
+
+
+async def cached_count(db: AsyncSession, stmt: Select, cache_key: Hashable) -> Tuple[int, str]:
+    """读取缓存的总数，未命中时精确计数并写入缓存"""
+    # 先取版本号再计数：计数期间有写入提交时，缓存项会被视为过期
+    version = await versions.load_versions(db, COUNTED_TABLES)
+    total = count_cache.get(cache_key, version)
+    if total is not None:
+        return total, "cached"
+    total = await exact_count(db, stmt)
+    count_cache.set(cache_key, total, version)
+    return total, "exact"
+
+
+async def resolve_total(db: AsyncSession, stmt: Select, mode: str, cache_key: Hashable) -> Tuple[Optional[int], str]:
+    """
+    按指定方式计算查询的总数
+    返回 (总数, 实际使用的方式)，mode 为 none 时总数为 None
+    """
+    if mode == "none":
+        return None, "none"
+    if mode == "estimated":
+        total = await estimate_count(db, stmt)
+        if total is not None:
+            return total, "estimated"
+        mode = "cached"
+    if mode == "cached":
+        return await cached_count(db, stmt, cache_key)
+    return await exact_count(db, stmt), "exact"
@@ -0,0 +1,69 @@
+"""
+上传请求体大小限制中间件
+
+Starlette 解析 multipart 表单时先把整个请求体写入临时文件（SpooledTemporaryFile），
+路由里 stream_to_temp_file 的大小检查在接收完成之后才执行。本中间件在解析之前限制图片上传请求体的大小：
+- 单文件上传最多 MAX_FILE_SIZE，批量上传最多 MAX_BATCH_FILES 个 MAX_FILE_SIZE，另加 multipart 边界和字段头的余量
+- Content-Length 超过限制时直接返回 413，不读取请求体
+- 没有 Content-Length（分块传输）时边接收边计数，超过限制时在解析中抛出 HTTPException(413) 中止接收
+未超过请求体限制、但单个文件超过 MAX_FILE_SIZE 的上传仍由路由返回 400（批量上传时为该文件的错误信息）。
+"""
+import re
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+# 图片上传接口：单文件 /api/v1/images/{prompt_id}，批量 /api/v1/images/{prompt_id}/batch
+UPLOAD_PATH = re.compile(r"^/api/v1/images/\d+(/batch)?/?$")
+# 每个文件的 multipart 边界和字段头的余量（字节）
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+def upload_limit(path: str) -> Optional[int]:
+    """请求路径对应的请求体大小上限，不是图片上传接口时返回 None"""
+    match = UPLOAD_PATH.match(path)
+    if match is None:
+        return None
+    files = settings.MAX_BATCH_FILES if match.group(1) else 1
+    return files * (settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD)
+
+
+def _detail(limit: int) -> str:
+    return f"上传内容超过大小限制（最大{limit // 1024 // 1024}MB）"
+
+
+class UploadLimitMiddleware:
+    """在解析 multipart 请求体之前限制图片上传大小的 ASGI 中间件"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = upload_limit(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse({"detail": _detail(limit)}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # 在路由解析请求体时抛出，由异常处理返回 413
+                    raise HTTPException(status_code=413, detail=_detail(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
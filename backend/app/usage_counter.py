@@ -0,0 +1,284 @@
+"""
+Prompt 使用次数计数（写后回写）
+
+复制操作只在计数存储中累加增量，后台任务定期用一条集合式 UPDATE 批量回写数据库：
+- memory: 进程内存储（单进程部署、测试）
+- redis: Redis 哈希存储（多 worker 部署），不可用时退回直接更新
+- direct: 不缓冲，每次复制执行一条原子 UPDATE
+
+回写前的增量通过 pending() 叠加到读取结果中，保证读到的次数不丢失。
+回写和直接更新都不递增 prompts 表的版本号（见 app.versions.UNVERSIONED），不会使 ETag 和响应缓存失效；
+因此 304 和缓存命中返回的 usage_count 可能落后，直到该表有其他写入或缓存条目过期（RESPONSE_CACHE_TTL）。
+"""
+import asyncio
+import logging
+import threading
+import uuid
+from typing import Dict, Iterable, Optional
+
+from redis.exceptions import ResponseError
+from sqlalchemy import Integer, case, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Prompt
+from app.versions import UNVERSIONED
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCounterStore:
+    """进程内增量存储"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+        self._inflight: Dict[int, int] = {}
+
+    async def incr(self, prompt_id: int, amount: int = 1) -> None:
+        with self._lock:
+            self._pending[prompt_id] = self._pending.get(prompt_id, 0) + amount
+
+    async def drain(self) -> Dict[int, int]:
+        """取出全部待回写增量，回写确认前仍计入 pending()"""
+        with self._lock:
+            for prompt_id, amount in self._pending.items():
+                self._inflight[prompt_id] = self._inflight.get(prompt_id, 0) + amount
+            self._pending = {}
+            return dict(self._inflight)
+
+    async def ack(self) -> None:
+        with self._lock:
+            self._inflight = {}
+
+    async def restore(self) -> None:
+        """回写失败，增量放回待回写队列"""
+        with self._lock:
+            for prompt_id, amount in self._inflight.items():
+                self._pending[prompt_id] = self._pending.get(prompt_id, 0) + amount
+            self._inflight = {}
+
+    async def pending(self, prompt_ids: Iterable[int]) -> Dict[int, int]:
+        with self._lock:
+            result = {}
+            for prompt_id in prompt_ids:
+                amount = self._pending.get(prompt_id, 0) + self._inflight.get(prompt_id, 0)
+                if amount:
+                    result[prompt_id] = amount
+            return result
+
+
+class RedisCounterStore:
+    """
+    Redis 哈希增量存储，多 worker 共享
+    回写由 SET NX PX 锁保证同一时间只有一个 worker 取出 inflight；
+    持锁的 worker 异常退出时锁过期，其他 worker 接手遗留的 inflight
+    """
+
+    PENDING_KEY = "prompt:usage:pending"
+    INFLIGHT_KEY = "prompt:usage:inflight"
+    LOCK_KEY = "prompt:usage:flush_lock"
+    # 锁的有效期（毫秒），应远大于一次回写的耗时
+    LOCK_TTL_MS = 60000
+    # 仍持有锁时删除 inflight 并释放锁
+    ACK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("del", KEYS[2])
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+    # 仍持有锁时释放锁
+    RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._token = uuid.uuid4().hex
+
+    async def incr(self, prompt_id: int, amount: int = 1) -> None:
+        await self._redis.hincrby(self.PENDING_KEY, prompt_id, amount)
+
+    async def drain(self) -> Dict[int, int]:
+        # 其他 worker 正在回写时跳过本次
+        if not await self._redis.set(self.LOCK_KEY, self._token, nx=True, px=self.LOCK_TTL_MS):
+            return {}
+        try:
+            # 上次回写未确认时先处理遗留的 inflight，否则原子地把 pending 改名为 inflight
+            if not await self._redis.exists(self.INFLIGHT_KEY):
+                try:
+                    await self._redis.rename(self.PENDING_KEY, self.INFLIGHT_KEY)
+                except ResponseError:
+                    # pending 不存在，没有待回写的增量
+                    await self.restore()
+                    return {}
+            raw = await self._redis.hgetall(self.INFLIGHT_KEY)
+        except Exception:
+            await self.restore()
+            raise
+        if not raw:
+            await self.restore()
+        return {int(prompt_id): int(amount) for prompt_id, amount in raw.items()}
+
+    async def ack(self) -> None:
+        await self._redis.eval(self.ACK_SCRIPT, 2, self.LOCK_KEY, self.INFLIGHT_KEY, self._token)
+
+    async def restore(self) -> None:
+        # 保留 inflight，释放锁，下次回写时重试
+        await self._redis.eval(self.RELEASE_SCRIPT, 1, self.LOCK_KEY, self._token)
+
+    async def pending(self, prompt_ids: Iterable[int]) -> Dict[int, int]:
+        prompt_ids = list(prompt_ids)
+        if not prompt_ids:
+            return {}
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hmget(self.PENDING_KEY, prompt_ids)
+            pipe.hmget(self.INFLIGHT_KEY, prompt_ids)
+            pending, inflight = await pipe.execute()
+        result = {}
+        for prompt_id, a, b in zip(prompt_ids, pending, inflight):
+            amount = int(a or 0) + int(b or 0)
+            if amount:
+                result[prompt_id] = amount
+        return result
+
+
+def flush_statement(dialect_name: str, deltas: Dict[int, int]):
+    """
+    构建批量回写语句
+    PostgreSQL: UPDATE ... FROM (VALUES ...)；其他数据库: CASE 表达式
+    """
+    if dialect_name == "postgresql":
+        rows = values(
+            column("id", Integer), column("delta", Integer), name="usage_deltas"
+        ).data(list(deltas.items()))
+        stmt = update(Prompt).where(Prompt.id == rows.c.id).values(
+            usage_count=Prompt.usage_count + rows.c.delta
+        )
+    else:
+        stmt = update(Prompt).where(Prompt.id.in_(list(deltas))).values(
+            usage_count=Prompt.usage_count + case(deltas, value=Prompt.id, else_=0)
+        )
+    return stmt.execution_options(synchronize_session=False, **{UNVERSIONED: True})
+
+
+async def increment_direct(db: AsyncSession, prompt_id: int) -> Optional[str]:
+    """
+    原子地增加一次使用次数并返回内容
+    Prompt 不存在或已删除时返回 None
+    """
+    stmt = update(Prompt).where(
+        Prompt.id == prompt_id,
+        Prompt.deleted_at.is_(None)
+    ).values(usage_count=Prompt.usage_count + 1).returning(Prompt.content)
+    stmt = stmt.execution_options(synchronize_session=False, **{UNVERSIONED: True})
+    content = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return content
+
+
+class UsageCounter:
+    """使用次数计数器"""
+
+    def __init__(self, store=None, interval: float = 2.0, session_factory=AsyncSessionLocal):
+        self.store = store
+        self.interval = interval
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def buffered(self) -> bool:
+        return self.store is not None
+
+    async def increment(self, prompt_id: int) -> bool:
+        """累加一次使用，存储不可用时返回 False，由调用方走直接更新"""
+        try:
+            await self.store.incr(prompt_id)
+            return True
+        except Exception as e:
+            logger.warning(f"使用次数计数存储不可用，改为直接更新: {e}")
+            return False
+
+    async def pending(self, prompt_ids: Iterable[int]) -> Dict[int, int]:
+        """尚未回写数据库的增量"""
+        if not self.buffered:
+            return {}
+        try:
+            return await self.store.pending(prompt_ids)
+        except Exception as e:
+            logger.warning(f"读取待回写使用次数失败: {e}")
+            return {}
+
+    async def flush(self) -> int:
+        """把累积的增量一次性回写数据库，返回涉及的Prompt数量"""
+        if not self.buffered:
+            return 0
+        async with self._flush_lock:
+            deltas = await self.store.drain()
+            if not deltas:
+                return 0
+            try:
+                async with self.session_factory() as db:
+                    stmt = flush_statement(db.get_bind().dialect.name, deltas)
+                    await db.execute(stmt)
+                    await db.commit()
+            except Exception:
+                await self.store.restore()
+                raise
+            await self.store.ack()
+            return len(deltas)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"使用次数回写失败: {e}")
+
+    def start(self) -> None:
+        """启动定期回写任务"""
+        if self.buffered and self._task is None:
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止定期回写并回写剩余增量"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"使用次数回写失败: {e}")
+
+
+def _build_store():
+    backend = settings.USAGE_COUNTER_BACKEND
+    if backend == "memory":
+        return MemoryCounterStore()
+    if backend == "redis":
+        from app.redis_client import get_redis
+        return RedisCounterStore(get_redis())
+    return None
+
+
+usage_counter = UsageCounter(_build_store(), interval=settings.USAGE_FLUSH_INTERVAL)
+
+
+async def apply_pending_usage(items):
+    """把尚未回写的增量叠加到响应模型的 usage_count 上"""
+    pending = await usage_counter.pending(item.id for item in items)
+    for item in items:
+        item.usage_count += pending.get(item.id, 0)
+    return items
@@ -2,48 +2,63 @@
 工具函数
 """
 import os
-import uuid
+import json
+import base64
+import hashlib
+import tempfile
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Optional, Tuple
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
 
-def save_upload_file(upload_file: UploadFile, prompt_id: int) -> dict:
+# 上传文件分块读写的块大小
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class FileTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+def remove_quietly(path) -> None:
+    """删除文件，文件不存在时忽略"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def stream_to_temp_file(upload_file: UploadFile, directory: Path, max_size: Optional[int] = None) -> Tuple[str, int, str]:
     """
-    保存上传的文件
-    返回: {
-        "file_path": str,
-        "file_name": str,
-        "file_size": int,
-        "file_type": str
-    }
+    分块流式写入上传的文件
+    边读边写入 directory 下的临时文件并计算 SHA-256，超过 max_size 立即中止并删除临时文件。
+    磁盘读写在线程池中执行，不阻塞事件循环；调用方负责把临时文件重命名到最终位置。
+    upload_file 由 Starlette 解析 multipart 时接收完整个请求体后才交给路由，这里的检查不限制接收量，
+    接收前的请求体大小限制见 app.upload_limit。
+    超过大小限制时抛出 FileTooLargeError
+    返回: (临时文件路径, 文件大小, SHA-256)
     """
-    # 获取项目根目录（backend目录的父目录）
-    backend_dir = Path(__file__).parent.parent.absolute()
-    project_root = backend_dir.parent
-    
-    # 创建上传目录（相对于项目根目录）
-    upload_dir = project_root / settings.UPLOAD_DIR / str(prompt_id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 生成唯一文件名
-    file_ext = Path(upload_file.filename).suffix
-    file_name = f"{uuid.uuid4()}{file_ext}"
-    file_path = upload_dir / file_name
-    
-    # 保存文件
-    with open(file_path, "wb") as f:
-        content = upload_file.file.read()
-        f.write(content)
+    if max_size is None:
+        max_size = settings.MAX_FILE_SIZE
     
-    # 返回相对路径（相对于项目根目录）
-    relative_path = str(file_path.relative_to(project_root)).replace("\\", "/")
+    await run_in_threadpool(directory.mkdir, parents=True, exist_ok=True)
+    fd, temp_path = await run_in_threadpool(tempfile.mkstemp, dir=directory, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"文件大小超过限制（最大{max_size // 1024 // 1024}MB）")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        await run_in_threadpool(remove_quietly, temp_path)
+        raise
     
-    return {
-        "file_path": relative_path,
-        "file_name": upload_file.filename,
-        "file_size": len(content),
-        "file_type": upload_file.content_type or "application/octet-stream"
-    }
+    return temp_path, size, digest.hexdigest()
 
 def delete_file(file_path: str) -> bool:
     """删除文件（file_path是相对于项目根目录的路径）"""
@@ -62,3 +77,36 @@ def delete_file(file_path: str) -> bool:
     except Exception as e:
         print(f"删除文件失败: {e}")
         return False
+
+def encode_cursor(sort_by: str, order: str, key: Any, row_id: int) -> str:
+    """编码分页游标：排序字段、方向、最后一行的排序键和id"""
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps([sort_by, order, key, row_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Optional[Tuple[Any, int]]:
+    """
+    解码分页游标，返回 (排序键, id)
+    游标无效或与当前排序方式不一致时返回 None
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_order, key, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if cursor_sort_by != sort_by or cursor_order != order or not _is_int(row_id):
+        return None
+    if sort_by in ("created_at", "updated_at"):
+        try:
+            key = datetime.fromisoformat(key)
+        except (ValueError, TypeError):
+            return None
+    elif sort_by == "usage_count" and not _is_int(key):
+        return None
+    elif sort_by == "name" and not isinstance(key, str):
+        return None
+    return key, row_id
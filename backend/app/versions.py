@@ -0,0 +1,89 @@
+"""
+数据表版本号
+
+通过引擎事件记录每个连接在事务中写入过的表，事务提交时递增这些表的版本号，
+回滚则丢弃。计数缓存等依赖数据变化的缓存通过比较版本号判断是否失效。
+
+版本号同时记录在进程内和 table_versions 表中：
+- 进程内版本号（get_versions）无需查询，只反映本进程的写入
+- table_versions 在提交前与写入在同一事务中递增，多个 worker 和命令行的写入都可见（load_versions）
+
+执行选项 UNVERSIONED 为 True 的写入不递增版本号（使用次数回写：只改 usage_count，
+若递增版本号，每个回写周期都会使 ETag、响应缓存和计数缓存全部失效）。
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Sequence, Tuple
+
+from sqlalchemy import Column, Integer, String, Table, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.database import Base, dialect_insert
+
+_WRITTEN_TABLES_KEY = "written_tables"
+# 写入语句的执行选项：不递增所写表的版本号
+UNVERSIONED = "unversioned"
+
+table_versions = Table(
+    "table_versions",
+    Base.metadata,
+    Column("name", String(100), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = defaultdict(int)
+
+
+def get_versions(*tables: str) -> Tuple[int, ...]:
+    """获取指定表的当前版本号"""
+    with _lock:
+        return tuple(_versions[table] for table in tables)
+
+
+def bump(*tables: str) -> None:
+    """递增指定表的版本号"""
+    with _lock:
+        for table in tables:
+            _versions[table] += 1
+
+
+async def load_versions(db: AsyncSession, tables: Sequence[str]) -> Tuple[int, ...]:
+    """从 table_versions 读取指定表的版本号（一次按主键的查询），未写入过的表为 0"""
+    rows = dict((await db.execute(
+        select(table_versions.c.name, table_versions.c.version).where(table_versions.c.name.in_(tables))
+    )).all())
+    return tuple(rows.get(table, 0) for table in tables)
+
+
+def _persist(conn, tables) -> None:
+    # 按名称顺序加锁，并发提交不会互相死锁
+    stmt = dialect_insert(conn, table_versions).values([dict(name=name, version=1) for name in sorted(tables)])
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[table_versions.c.name],
+        set_={"version": table_versions.c.version + 1},
+    ))
+
+
+@event.listens_for(Engine, "after_execute")
+def _track_writes(conn, clauseelement, multiparams, params, execution_options, result):
+    if isinstance(clauseelement, UpdateBase) and not execution_options.get(UNVERSIONED):
+        table = getattr(clauseelement, "table", None)
+        name = getattr(table, "name", None)
+        if name and name != table_versions.name:
+            conn.info.setdefault(_WRITTEN_TABLES_KEY, set()).add(name)
+
+
+@event.listens_for(Engine, "commit")
+def _bump_on_commit(conn):
+    tables = conn.info.pop(_WRITTEN_TABLES_KEY, None)
+    if tables:
+        _persist(conn, tables)
+        bump(*tables)
+
+
+@event.listens_for(Engine, "rollback")
+def _discard_on_rollback(conn):
+    conn.info.pop(_WRITTEN_TABLES_KEY, None)
@@ -0,0 +1,80 @@
+"""
+响应压缩基准测试
+
+在进程内取得列表、搜索和导出接口的未压缩响应体，分别用可用的各编码压缩，
+统计压缩后大小、压缩率和每个响应的 CPU 耗时；导出同时按批刷出（与流式响应一致）测试：
+
+    python -m benchmarks.compression --prompts 2000 --rounds 20
+
+默认使用临时 SQLite 数据库并写入测试数据（见 benchmarks.serialization）；
+zstd / br 需要安装 zstandard / brotli，未安装的编码跳过。
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+
+def _cpu_ms(func: Callable[[], bytes], rounds: int) -> float:
+    """多次执行的平均 CPU 耗时（毫秒）"""
+    start = time.process_time()
+    for _ in range(rounds):
+        func()
+    return (time.process_time() - start) * 1000 / rounds
+
+
+def _compress(encoding: str, chunks: List[bytes]) -> bytes:
+    from app.compression import Encoder
+
+    encoder = Encoder(encoding)
+    flush = len(chunks) > 1
+    return b"".join(encoder.compress(chunk, flush=flush) for chunk in chunks) + encoder.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应压缩基准测试")
+    parser.add_argument("--prompts", type=int, default=2000, help="写入的测试Prompt数量")
+    parser.add_argument("--rounds", type=int, default=20, help="每种编码的压缩次数")
+    args = parser.parse_args()
+
+    # 数据库地址在导入应用之前确定
+    directory = tempfile.mkdtemp(prefix="compression-benchmark-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.db"
+    os.environ.setdefault("ENVIRONMENT", "benchmark")
+
+    from fastapi.testclient import TestClient
+    from app.compression import available_encodings
+    from app.config import settings
+    from app.database import Base, engine
+    from benchmarks.serialization import seed_prompts
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    seed_prompts(args.prompts)
+
+    identity = {"Accept-Encoding": "identity"}
+    with TestClient(app) as client:
+        payloads = {
+            "列表(100条)": [client.get("/api/v1/prompts?page_size=100", headers=identity).content],
+            "搜索(100条)": [client.get("/api/v1/search?keyword=基准&limit=100", headers=identity).content],
+        }
+        export = client.get("/api/v1/prompts/export", headers=identity).content
+
+    # 导出按 EXPORT_BATCH_SIZE 行一块，与流式响应的刷出粒度一致
+    lines = export.splitlines(keepends=True)
+    size = settings.EXPORT_BATCH_SIZE
+    payloads["导出(流式)"] = [b"".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+
+    print(f"{'响应':<12}{'编码':<8}{'大小 KB':>10}{'压缩率':>8}{'CPU ms':>10}")
+    for name, chunks in payloads.items():
+        original = sum(len(chunk) for chunk in chunks)
+        print(f"{name:<12}{'无':<8}{original / 1024:>10.1f}{1:>8.2f}{0:>10.2f}")
+        for encoding in available_encodings():
+            compressed = _compress(encoding, chunks)
+            cpu = _cpu_ms(lambda: _compress(encoding, chunks), args.rounds)
+            print(f"{'':<12}{encoding:<8}{len(compressed) / 1024:>10.1f}{original / len(compressed):>8.2f}{cpu:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
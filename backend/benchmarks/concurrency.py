@@ -0,0 +1,85 @@
+"""
+并发吞吐基准测试
+
+对运行中的服务发起固定并发数的请求，统计吞吐量和延迟分位数。
+对比同步/异步数据库层时，用相同的 uvicorn worker 数分别启动两个版本：
+
+    uvicorn main:app --workers 1 --port 8000
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000 --concurrency 50 --duration 20
+
+数据库往返延迟越高，差异越明显（同步会话会阻塞事件循环，请求串行执行）。
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/api/v1/prompts?page_size=20",
+    "/api/v1/groups",
+    "/api/v1/tags",
+    "/api/v1/search?keyword=a",
+]
+
+
+async def _worker(client: httpx.AsyncClient, paths: List[str], deadline: float,
+                  latencies: List[float], errors: List[int], offset: int) -> None:
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(url: str, concurrency: int, duration: float, paths: List[str]) -> dict:
+    latencies: List[float] = []
+    errors: List[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        # 预热
+        await asyncio.gather(*(client.get(path) for path in paths))
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _worker(client, paths, deadline, latencies, errors, offset)
+            for offset in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发吞吐基准测试")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="持续时间（秒）")
+    parser.add_argument("--path", action="append", dest="paths", help="请求路径，可重复指定")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.concurrency, args.duration, args.paths or DEFAULT_PATHS))
+    print(f"并发数: {args.concurrency}  持续: {args.duration}s")
+    print(f"请求数: {result['requests']}  错误: {result['errors']}")
+    print(f"吞吐量: {result['throughput']:.1f} req/s")
+    print(f"延迟 p50: {result['p50_ms']:.1f} ms  p95: {result['p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
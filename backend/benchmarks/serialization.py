@@ -0,0 +1,135 @@
+"""
+响应序列化基准测试
+
+在进程内（TestClient，不经过网络）分别以默认路径和 JSON 快速路径请求列表、搜索、详情接口，
+比较单次请求耗时，并由两种返回数量的耗时差估算每条记录的序列化开销：
+
+    python -m benchmarks.serialization --prompts 2000 --rounds 50
+
+默认使用临时 SQLite 数据库并写入测试数据；--database-url 可指定已有数据的数据库（不写入数据）。
+快速路径需要安装 orjson。
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+SIZES = (10, 100)
+
+
+def seed_prompts(count: int) -> int:
+    """写入测试数据，返回一个有分组、标签和效果图的 Prompt 的 id"""
+    from app.database import SessionLocal
+    from app.models import Prompt, PromptGroup, PromptImage, PromptTag
+
+    db = SessionLocal()
+    try:
+        groups = [PromptGroup(name=f"基准分组{i}") for i in range(10)]
+        tags = [PromptTag(name=f"基准标签{i}") for i in range(20)]
+        db.add_all(groups + tags)
+        db.flush()
+        for i in range(count):
+            prompt = Prompt(
+                name=f"基准Prompt{i}",
+                content="基准测试内容 " * 20,
+                description="基准测试描述",
+                group_id=groups[i % len(groups)].id,
+                tags=[tags[(i + j) % len(tags)] for j in range(3)],
+            )
+            prompt.images = [
+                PromptImage(file_path=f"uploads/benchmark/{i}_{j}.png", file_name=f"{j}.png",
+                            file_size=1, file_type="text/plain", width=100, height=100)
+                for j in range(2)
+            ]
+            db.add(prompt)
+        db.commit()
+        return db.query(Prompt.id).order_by(Prompt.id).first()[0]
+    finally:
+        db.close()
+
+
+def _time(request: Callable[[], object], rounds: int) -> float:
+    """多次请求耗时的中位数（毫秒）"""
+    request()  # 预热
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = request()
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples) * 1000
+
+
+def run(client, prompt_id: int, rounds: int) -> List[Tuple[str, str, float, float, float]]:
+    """返回 [(接口, 模式, 少量耗时, 大量耗时, 每条耗时)]，每条耗时单位为微秒"""
+    from app import fast_json
+    from app.config import settings
+
+    endpoints = [
+        ("列表", "/api/v1/prompts?page_size={size}"),
+        ("列表+封面", "/api/v1/prompts?page_size={size}&include_cover=true"),
+        ("搜索", "/api/v1/search?keyword=基准&limit={size}"),
+    ]
+    results = []
+    for fast in (False, True):
+        if fast and fast_json.orjson is None:
+            print("未安装 orjson，跳过快速路径", file=sys.stderr)
+            break
+        settings.FAST_JSON_ENABLED = fast
+        mode = "快速" if fast else "默认"
+        for name, url in endpoints:
+            small, large = (_time(lambda: client.get(url.format(size=size)), rounds) for size in SIZES)
+            per_item = (large - small) * 1000 / (SIZES[1] - SIZES[0])
+            results.append((name, mode, small, large, per_item))
+        detail = _time(lambda: client.get(f"/api/v1/prompts/{prompt_id}"), rounds)
+        results.append(("详情", mode, detail, detail, 0.0))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化基准测试")
+    parser.add_argument("--prompts", type=int, default=2000, help="写入的测试Prompt数量")
+    parser.add_argument("--rounds", type=int, default=50, help="每个接口的请求次数")
+    parser.add_argument("--database-url", help="使用已有数据的数据库（不写入测试数据）")
+    args = parser.parse_args()
+
+    # 数据库地址在导入应用之前确定
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        directory = tempfile.mkdtemp(prefix="serialization-benchmark-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.db"
+    # 关闭SQL日志，避免输出影响计时
+    os.environ.setdefault("ENVIRONMENT", "benchmark")
+
+    from fastapi.testclient import TestClient
+    from app.database import Base, engine
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    if args.database_url:
+        from app.database import SessionLocal
+        from app.models import Prompt
+
+        db = SessionLocal()
+        prompt_id = db.query(Prompt.id).order_by(Prompt.id).first()[0]
+        db.close()
+    else:
+        prompt_id = seed_prompts(args.prompts)
+
+    with TestClient(app) as client:
+        results = run(client, prompt_id, args.rounds)
+
+    print(f"{'接口':<8}{'模式':<6}{f'{SIZES[0]}条 ms':>10}{f'{SIZES[1]}条 ms':>10}{'每条 µs':>10}")
+    for name, mode, small, large, per_item in results:
+        if name == "详情":
+            print(f"{name:<8}{mode:<6}{small:>10.2f}{'-':>10}{'-':>10}")
+        else:
+            print(f"{name:<8}{mode:<6}{small:>10.2f}{large:>10.2f}{per_item:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
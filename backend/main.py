@@ -3,16 +3,28 @@ Prompt管理工具 - 后端主入口
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import os
 import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
-from app.database import engine, Base
+from sqlalchemy import text
+from app.database import engine, async_engine, Base, SessionLocal, ensure_columns, ensure_indexes
 from app.routers import prompts, groups, tags, search, images
 from app.config import settings
+from app.fulltext import ensure_search_indexes
+from app.search_index import search_index
+from app.usage_counter import usage_counter
+from app.taxonomy import taxonomy
+from app.redis_client import close_redis
+from app.image_variants import shutdown_executor
+from app.static_files import UploadFiles
+from app.compression import CompressionMiddleware
+from app.upload_limit import UploadLimitMiddleware
+from app import fast_json
+from app.response_cache import response_cache
 
 # 配置日志
 import logging.handlers
@@ -65,21 +77,44 @@ async def lifespan(app: FastAPI):
     # 启动时创建表
     try:
         Base.metadata.create_all(bind=engine)
+        ensure_columns(engine)
+        ensure_indexes(engine)
         logger.info("数据库连接成功，表创建完成")
+        ensure_search_indexes(engine)
+        if settings.SEARCH_INDEX_ENABLED:
+            db = SessionLocal()
+            try:
+                search_index.rebuild(db)
+            finally:
+                db.close()
     except Exception as e:
         logger.error(f"数据库连接失败: {e}")
         logger.warning("应用将在无数据库连接的情况下启动，相关API功能可能不可用")
         logger.warning("请检查数据库配置：DATABASE_URL、用户名、密码等")
+    usage_counter.start()
+    taxonomy.start()
     yield
-    # 关闭时清理（如果需要）
+    # 关闭时回写剩余的使用次数并释放连接
+    await taxonomy.stop()
+    await usage_counter.stop()
+    await close_redis()
+    shutdown_executor()
+    await async_engine.dispose()
+
+if settings.FAST_JSON_ENABLED and not fast_json.enabled():
+    logger.warning("FAST_JSON_ENABLED 已开启但未安装 orjson，使用默认JSON序列化")
 
 app = FastAPI(
     title="Prompt管理工具 API",
     description="Prompt管理工具后端API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=fast_json.FastJSONResponse if fast_json.enabled() else JSONResponse
 )
 
+# 图片上传在解析请求体之前检查大小（在 CORS 之内，413 响应也带 CORS 头）
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS配置
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
 app.add_middleware(
@@ -88,8 +123,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Ungrouped-Count"],
 )
 
+# 响应压缩（最外层，CORS 等中间件添加的响应头不受影响）
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 # 注册路由
 app.include_router(prompts.router, prefix="/api/v1/prompts", tags=["prompts"])
 app.include_router(groups.router, prefix="/api/v1/groups", tags=["groups"])
@@ -106,8 +146,8 @@ project_root = backend_dir.parent
 upload_dir = project_root / settings.UPLOAD_DIR
 upload_dir.mkdir(parents=True, exist_ok=True)
 # 挂载uploads目录，这样/uploads/images/xxx可以访问到uploads/images/xxx文件
-# StaticFiles的mount会去掉URL前缀，所以挂载/uploads到uploads目录
-app.mount("/uploads", StaticFiles(directory=str(project_root / "uploads")), name="uploads")
+# mount会去掉URL前缀，所以挂载/uploads到uploads目录；文件不可变，返回长期缓存头并支持304和Range
+app.mount("/uploads", UploadFiles(directory=str(project_root / "uploads")), name="uploads")
 
 @app.get("/")
 async def root():
@@ -118,8 +158,8 @@ async def health():
     """健康检查端点，检查数据库连接状态"""
     db_status = "unknown"
     try:
-        with engine.connect() as conn:
-            conn.execute("SELECT 1")
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
             db_status = "connected"
     except Exception as e:
         db_status = f"disconnected: {str(e)}"
@@ -129,6 +169,11 @@ async def health():
         "database": db_status
     }
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """接口响应缓存的命中统计"""
+    return response_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,173 @@
+"""
+一次性迁移：把已有的上传文件去重到内容寻址存储
+
+遍历 prompt_images，计算每个文件的 SHA-256，放置到 {UPLOAD_DIR}/blobs/ 下的共享位置并改写
+file_path，在同一事务中把 image_variants.source_path 改为新路径（新路径已有相同宽度和格式的变体时删除重复的一份），
+最后按实际引用重算 image_blobs.ref_count。原文件和重复的变体文件在数据库提交后才删除，
+可重复执行；--dry-run 只统计不修改。
+
+    python -m scripts.dedupe_images [--dry-run]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, engine, ensure_columns, ensure_indexes
+from app.image_store import absolute_path, blob_path
+from app.models import ImageBlob, ImageVariant, PromptImage
+from app.utils import UPLOAD_CHUNK_SIZE, remove_quietly
+
+logger = logging.getLogger(__name__)
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(f"{target.name}.part")
+    try:
+        os.link(source, temp)
+    except OSError:
+        shutil.copy2(source, temp)
+    os.replace(temp, target)
+
+
+def _move_variants(db: Session, renamed: dict) -> list:
+    """
+    变体的 source_path 跟随原图改写为共享路径
+    共享路径已有相同宽度和格式的变体时删除重复的一份，返回被删除变体的文件路径
+    """
+    removed = []
+    # 共享路径 -> 已有变体的 (宽度, 格式)，包含本次改写过去的
+    targets = {}
+    for old_path, new_path in renamed.items():
+        existing = targets.get(new_path)
+        if existing is None:
+            existing = targets[new_path] = set(db.execute(
+                select(ImageVariant.width, ImageVariant.format).where(ImageVariant.source_path == new_path)
+            ).all())
+        for variant in db.execute(select(ImageVariant).where(ImageVariant.source_path == old_path)).scalars():
+            if (variant.width, variant.format) in existing:
+                removed.append(variant.file_path)
+                db.delete(variant)
+            else:
+                existing.add((variant.width, variant.format))
+                variant.source_path = new_path
+    return removed
+
+
+def dedupe(db: Session, dry_run: bool = False) -> dict:
+    """
+    执行去重迁移
+    返回统计: {"images": 扫描的图片数, "moved": 改写路径的图片数, "missing": 文件缺失数,
+              "blobs": 共享文件数, "bytes_saved": 节省的字节数, "variants_removed": 删除的重复变体数}
+    """
+    stats = {"images": 0, "moved": 0, "missing": 0, "blobs": 0, "bytes_saved": 0, "variants_removed": 0}
+    blobs = {
+        blob.sha256: blob
+        for blob in db.execute(select(ImageBlob)).scalars()
+    }
+    seen = set(blobs)
+    obsolete = []
+    renamed = {}
+
+    images = db.execute(select(PromptImage).order_by(PromptImage.id)).scalars().all()
+    for image in images:
+        stats["images"] += 1
+        source = absolute_path(image.file_path)
+        if not source.exists():
+            stats["missing"] += 1
+            logger.warning(f"图片文件不存在，跳过: {image.file_path}")
+            continue
+
+        sha256 = _file_sha256(source)
+        duplicate = sha256 in seen
+        seen.add(sha256)
+
+        blob = blobs.get(sha256)
+        if blob is None:
+            blob = ImageBlob(
+                sha256=sha256,
+                file_path=blob_path(sha256, source.suffix),
+                file_size=source.stat().st_size,
+                file_type=image.file_type,
+                ref_count=0,
+            )
+            blobs[sha256] = blob
+            if not dry_run:
+                db.add(blob)
+                _link_or_copy(source, absolute_path(blob.file_path))
+
+        if image.file_path != blob.file_path:
+            stats["moved"] += 1
+            if duplicate:
+                stats["bytes_saved"] += source.stat().st_size
+            if not dry_run:
+                obsolete.append(image.file_path)
+                renamed[image.file_path] = blob.file_path
+                image.file_path = blob.file_path
+
+    stats["blobs"] = len(blobs)
+    if dry_run:
+        db.rollback()
+        return stats
+
+    removed_variants = _move_variants(db, renamed)
+    stats["variants_removed"] = len(removed_variants)
+    db.flush()
+    # 按实际引用重算引用计数
+    db.execute(
+        update(ImageBlob).values(
+            ref_count=select(func.count(PromptImage.id))
+            .where(PromptImage.file_path == ImageBlob.file_path)
+            .scalar_subquery()
+        )
+    )
+    db.commit()
+
+    # 提交后删除已不再被引用的原文件
+    still_used = set(db.execute(select(PromptImage.file_path).distinct()).scalars())
+    for file_path in set(obsolete) - still_used:
+        remove_quietly(absolute_path(file_path))
+    for file_path in removed_variants:
+        remove_quietly(absolute_path(file_path))
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上传图片去重迁移")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改文件和数据库")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    Base.metadata.create_all(bind=engine)
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    db = SessionLocal()
+    try:
+        stats = dedupe(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(
+        f"扫描 {stats['images']} 张图片，改写 {stats['moved']} 条路径，缺失 {stats['missing']} 个文件，"
+        f"共享文件 {stats['blobs']} 个，节省 {stats['bytes_saved'] / 1024 / 1024:.2f} MB，"
+        f"删除重复变体 {stats['variants_removed']} 个"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+导出 Prompt 库为 NDJSON（每行一个 Prompt，含分组、标签和效果图元数据）
+
+筛选参数与列表接口一致；压缩方式默认按输出文件扩展名推断（.gz / .zst），
+未指定输出文件时写到标准输出。
+
+    python -m scripts.export_prompts -o prompts.ndjson.gz [--group-id N] [--tag-id N] [--keyword K]
+"""
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.export import Compressor, export_query, guess_compression, write_export
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="流式导出 Prompt 库（NDJSON）")
+    parser.add_argument("-o", "--output", help="输出文件，默认标准输出")
+    parser.add_argument("--compression", choices=["none", "gzip", "zstd"], help="压缩方式，默认按扩展名推断")
+    parser.add_argument("--group-id", type=int, help="分组ID，0 表示未分组")
+    parser.add_argument("--tag-id", type=int, help="标签ID")
+    parser.add_argument("--keyword", help="关键词")
+    args = parser.parse_args()
+
+    compression = args.compression or (guess_compression(args.output) if args.output else "none")
+    compressor = Compressor(compression)
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    db = SessionLocal()
+    try:
+        query = export_query(db, args.group_id, args.tag_id, args.keyword)
+        count = write_export(db, query, output, compressor)
+    finally:
+        db.close()
+        if args.output:
+            output.close()
+    print(f"导出 {count} 个 Prompt", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+从 NDJSON 批量导入 Prompt（格式与导出一致，分组和标签按名称匹配，不存在时创建）
+
+压缩方式默认按文件扩展名推断（.gz / .zst），文件名为 - 时从标准输入读取。
+
+    python -m scripts.import_prompts prompts.ndjson.gz [--batch-size 1000]
+"""
+import argparse
+import sys
+import time
+
+from app.bulk_import import BulkImporter, CorruptInputError, NdjsonReader
+from app.config import settings
+from app.export import guess_compression
+from app.database import Base, SessionLocal, engine, ensure_columns, ensure_indexes
+from app.taxonomy import notify_sync
+from app.utils import UPLOAD_CHUNK_SIZE
+
+# 最多打印的错误条数
+MAX_PRINTED_ERRORS = 20
+
+
+def import_file(db, source, compression: str, batch_size: int) -> BulkImporter:
+    reader = NdjsonReader(compression)
+    importer = BulkImporter()
+    batch = []
+    try:
+        for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+            batch.extend(importer.parse(reader.feed(chunk)))
+            while len(batch) >= batch_size:
+                importer.import_batch(db, batch[:batch_size])
+                batch = batch[batch_size:]
+        batch.extend(importer.parse(reader.finish()))
+    except CorruptInputError as e:
+        importer.abort(e)
+    importer.import_batch(db, batch)
+    return importer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量导入 Prompt（NDJSON）")
+    parser.add_argument("input", help="输入文件，- 表示标准输入")
+    parser.add_argument("--compression", choices=["none", "gzip", "zstd"], help="压缩方式，默认按扩展名推断")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE, help="每个事务写入的行数")
+    args = parser.parse_args()
+
+    compression = args.compression or guess_compression(args.input)
+    Base.metadata.create_all(bind=engine)
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        importer = import_file(db, source, compression, args.batch_size)
+    finally:
+        db.close()
+        if source is not sys.stdin.buffer:
+            source.close()
+        # 导入时可能创建了分组和标签，通知运行中的服务刷新快照
+        notify_sync()
+    elapsed = time.perf_counter() - started
+
+    result = importer.result
+    for error in result.errors[:MAX_PRINTED_ERRORS]:
+        print(f"第 {error.line} 行: {error.error}", file=sys.stderr)
+    if result.failed > MAX_PRINTED_ERRORS:
+        print(f"... 共 {result.failed} 条错误", file=sys.stderr)
+    print(
+        f"共 {result.total} 条，导入 {result.imported} 条，失败 {result.failed} 条，"
+        f"耗时 {elapsed:.1f} 秒（{result.imported / max(elapsed, 1e-9):.0f} 条/秒）"
+    )
+    if result.aborted is not None:
+        print(f"第 {result.aborted.line} 行起无法读取，导入中止: {result.aborted.error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,13 @@
 """
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from app.database import Base, get_db, to_async_url, AsyncSessionLocal
+from app.usage_counter import usage_counter
+from app import image_variants
 from app.models import Prompt, PromptGroup, PromptTag, PromptImage
 from main import app
 import os
@@ -16,6 +20,26 @@ TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "postgresql://prompt_user:Pro
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# API请求使用的异步引擎；每个TestClient运行在独立的事件循环中，不复用连接
+async_engine = create_async_engine(to_async_url(TEST_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+@pytest.fixture(autouse=True)
+def isolated_files(tmp_path, monkeypatch):
+    """上传文件、变体和缩放缓存写入临时目录，不在项目目录中留下文件"""
+    from app import image_store, image_variants as variants_module
+    from app.config import settings
+    from app.render_cache import render_cache
+    
+    monkeypatch.setattr(image_store, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(variants_module, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(render_cache, "root", tmp_path / settings.RENDER_CACHE_DIR)
+    monkeypatch.setattr(render_cache, "_entries", None)
+    monkeypatch.setattr(render_cache, "_total", 0)
+    uploads = next(route.app for route in app.routes if getattr(route, "name", None) == "uploads")
+    monkeypatch.setattr(uploads, "directory", str(tmp_path / "uploads"))
+    yield tmp_path
+
 @pytest.fixture(scope="function")
 def db_session():
     """创建测试数据库会话"""
@@ -30,16 +54,50 @@ def db_session():
 @pytest.fixture(scope="function")
 def client(db_session):
     """创建测试客户端"""
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
     
     app.dependency_overrides[get_db] = override_get_db
+    # 后台任务（使用次数回写、变体补生成）同样使用测试数据库
+    usage_counter.session_factory = TestingAsyncSessionLocal
+    image_variants.session_factory = TestingAsyncSessionLocal
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+    usage_counter.session_factory = AsyncSessionLocal
+    image_variants.session_factory = AsyncSessionLocal
+
+@pytest.fixture
+def query_counter(db_session):
+    """统计测试期间执行的SQL语句数量（不含 table_versions 版本号的读取和递增）"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "table_versions" not in statement:
+            statements.append(statement)
+    
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture
+def make_prompts(db_session):
+    """批量创建Prompt的工厂：make_prompts(count, prefix="Prompt", **fields)
+    
+    名称为 prefix 加序号，content 默认为"内容"；fields 中的值为可调用对象时以序号调用，用于逐个生成字段值
+    """
+    def make(count, prefix="Prompt", **fields):
+        prompts = []
+        for i in range(count):
+            values = {"name": f"{prefix}{i}", "content": "内容"}
+            values.update({key: value(i) if callable(value) else value for key, value in fields.items()})
+            prompts.append(Prompt(**values))
+        db_session.add_all(prompts)
+        db_session.commit()
+        return prompts
+    
+    return make
 
 @pytest.fixture
 def sample_group(db_session):
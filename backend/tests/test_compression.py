@@ -0,0 +1,104 @@
+"""
+响应压缩测试
+"""
+import io
+import json
+import zlib
+import pytest
+from fastapi import status
+from app.compression import Encoder, negotiate
+
+@pytest.fixture
+def many_prompts(db_session):
+    """足够大、需要压缩的列表"""
+    from app.models import Prompt
+    
+    db_session.add_all([Prompt(name=f"压缩{i}", content="可压缩的内容 " * 50) for i in range(20)])
+    db_session.commit()
+
+class TestNegotiate:
+    """Accept-Encoding 协商测试"""
+    
+    def test_server_preference(self):
+        """测试q值相同时按服务端优先级"""
+        assert negotiate("gzip, br, zstd", ["zstd", "br", "gzip"]) == "zstd"
+        assert negotiate("gzip, br", ["zstd", "br", "gzip"]) == "br"
+        assert negotiate("gzip, deflate", ["zstd", "br", "gzip"]) == "gzip"
+    
+    def test_quality_values(self):
+        """测试q值和通配符"""
+        assert negotiate("zstd;q=0.5, gzip;q=0.8", ["zstd", "gzip"]) == "gzip"
+        assert negotiate("gzip;q=0, *", ["zstd", "gzip"]) == "zstd"
+        assert negotiate("gzip;q=0", ["gzip"]) is None
+        assert negotiate("identity", ["gzip"]) is None
+        assert negotiate("", ["gzip"]) is None
+    
+    def test_unavailable_encoding(self):
+        """测试未安装的编码不参与协商"""
+        assert negotiate("zstd, br", ["gzip"]) is None
+
+class TestCompressionMiddleware:
+    """压缩中间件测试"""
+    
+    def test_compress_large_response(self, client, many_prompts):
+        """测试超过阈值的JSON响应按gzip压缩"""
+        response = client.get("/api/v1/prompts?page_size=20", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-encoding"] == "gzip"
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert int(response.headers["content-length"]) < len(response.content)
+        assert len(response.json()["items"]) == 20
+    
+    def test_skip_small_and_identity(self, client, many_prompts):
+        """测试小响应和不接受压缩的请求不压缩"""
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        response = client.get("/api/v1/prompts?page_size=20", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert len(response.json()["items"]) == 20
+    
+    def test_minimum_size(self, client, monkeypatch):
+        """测试压缩阈值可配置"""
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "COMPRESSION_MINIMUM_SIZE", 1)
+        response = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["version"] == "1.0.0"
+    
+    def test_streaming_export(self, client, many_prompts):
+        """测试流式导出逐块压缩，已压缩的导出不再压缩"""
+        response = client.get("/api/v1/prompts/export", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        lines = response.text.splitlines()
+        assert len(lines) == 20
+        assert json.loads(lines[0])["name"].startswith("压缩")
+        
+        response = client.get("/api/v1/prompts/export?compression=gzip", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-type"] == "application/gzip"
+    
+    def test_skip_uploads(self, client, sample_prompt, monkeypatch):
+        """测试上传文件路径不压缩"""
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "COMPRESSION_EXCLUDED_TYPES", [])
+        files = {"file": ("plain.png", io.BytesIO(b"\x00" * 4096), "image/png")}
+        data = client.post(f"/api/v1/images/{sample_prompt.id}", files=files).json()
+        response = client.get("/" + data["file_path"], headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == status.HTTP_200_OK
+        assert "content-encoding" not in response.headers
+        assert response.content == b"\x00" * 4096
+
+class TestEncoder:
+    """增量编码器测试"""
+    
+    def test_flushed_chunks_decode_incrementally(self):
+        """测试每块刷出后客户端即可解压"""
+        encoder = Encoder("gzip")
+        decoder = zlib.decompressobj(31)
+        for chunk in (b"first line\n", b"second line\n"):
+            assert decoder.decompress(encoder.compress(chunk, flush=True)) == chunk
+        assert decoder.decompress(encoder.finish()) == b""
+        assert decoder.eof
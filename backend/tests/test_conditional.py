@@ -0,0 +1,71 @@
+"""
+条件请求（ETag / If-None-Match）测试
+"""
+import pytest
+from fastapi import status
+
+class TestConditionalGet:
+    """列表、分组、标签接口的ETag测试"""
+    
+    def _etag(self, client, url):
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"].startswith('W/"')
+        assert response.headers["cache-control"] == "no-cache"
+        return response.headers["etag"]
+    
+    def test_not_modified_skips_query(self, client, sample_prompt, query_counter):
+        """测试ETag匹配时返回304，不执行列表查询"""
+        etag = self._etag(client, "/api/v1/prompts")
+        query_counter.clear()
+        response = client.get("/api/v1/prompts", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert query_counter == []
+    
+    def test_etag_varies_by_query(self, client, sample_prompt):
+        """测试不同查询参数的ETag不同，参数顺序无关"""
+        assert self._etag(client, "/api/v1/prompts?page_size=5&order=asc") == self._etag(client, "/api/v1/prompts?order=asc&page_size=5")
+        assert self._etag(client, "/api/v1/prompts?page_size=5") != self._etag(client, "/api/v1/prompts?page_size=6")
+    
+    def test_write_changes_etag(self, client, sample_prompt, sample_tag):
+        """测试Prompt或标签关联变化后返回新内容"""
+        etag = self._etag(client, "/api/v1/prompts")
+        client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": []})
+        response = client.get("/api/v1/prompts", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["items"][0]["tags"] == []
+        assert response.headers["etag"] != etag
+    
+    def test_write_from_other_session(self, client, db_session, sample_prompt):
+        """测试其他连接（其他worker、命令行）提交的写入同样使ETag变化"""
+        etag = self._etag(client, "/api/v1/prompts")
+        sample_prompt.name = "其他进程修改"
+        db_session.commit()
+        response = client.get("/api/v1/prompts", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["items"][0]["name"] == "其他进程修改"
+    
+    def test_groups_and_tags(self, client, sample_prompt, sample_group, sample_tag):
+        """测试分组、标签接口只在相关表变化时更新ETag"""
+        groups_etag = self._etag(client, "/api/v1/groups")
+        tags_etag = self._etag(client, "/api/v1/tags")
+        
+        client.post("/api/v1/groups", json={"name": "新分组"})
+        assert client.get("/api/v1/groups", headers={"If-None-Match": groups_etag}).status_code == status.HTTP_200_OK
+        assert client.get("/api/v1/tags", headers={"If-None-Match": tags_etag}).status_code == status.HTTP_304_NOT_MODIFIED
+        
+        client.put(f"/api/v1/tags/{sample_tag.id}", json={"color": "#000000"})
+        response = client.get("/api/v1/tags", headers={"If-None-Match": tags_etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]["color"] == "#000000"
+    
+    def test_fast_path_headers(self, client, sample_prompt, monkeypatch):
+        """测试快速路径直接返回的响应同样带ETag"""
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+        etag = self._etag(client, "/api/v1/prompts?fields=name")
+        response = client.get("/api/v1/prompts?fields=name", headers={"If-None-Match": f'"other", {etag}'})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
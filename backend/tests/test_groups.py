@@ -3,6 +3,7 @@
 """
 import pytest
 from fastapi import status
+from app.models import PromptGroup, Prompt
 
 class TestGroupCRUD:
     """分组CRUD操作测试"""
@@ -86,3 +87,47 @@ class TestGroupCRUD:
         """测试删除不存在的分组"""
         response = client.delete("/api/v1/groups/99999")
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+class TestGroupCounts:
+    """分组数量统计测试"""
+    
+    def test_get_groups_prompt_count(self, client, db_session, sample_group, sample_prompt):
+        """测试分组Prompt数量与未分组数量"""
+        from app.models import Prompt
+        from datetime import datetime
+        
+        db_session.add(Prompt(name="未分组", content="内容"))
+        db_session.add(Prompt(name="已删除", content="内容", group_id=sample_group.id, deleted_at=datetime.utcnow()))
+        db_session.add(PromptGroup(name="空分组"))
+        db_session.commit()
+        
+        response = client.get("/api/v1/groups")
+        assert response.status_code == status.HTTP_200_OK
+        counts = {group["name"]: group["prompt_count"] for group in response.json()}
+        assert counts == {sample_group.name: 1, "空分组": 0}
+        assert response.headers["X-Ungrouped-Count"] == "1"
+        assert client.get("/api/v1/groups/ungrouped-count").json() == {"count": 1}
+    
+    def test_get_groups_sort_order(self, client, db_session):
+        """测试分组按sort_order排序"""
+        db_session.add_all([PromptGroup(name="第二", sort_order=2), PromptGroup(name="第一", sort_order=1)])
+        db_session.commit()
+        
+        response = client.get("/api/v1/groups")
+        assert [group["name"] for group in response.json()] == ["第一", "第二"]
+    
+    def test_get_groups_constant_query_count(self, client, db_session, query_counter):
+        """测试查询次数与分组数量无关"""
+        def count_queries(group_count):
+            for i in range(group_count):
+                group = PromptGroup(name=f"分组{group_count}-{i}")
+                db_session.add(group)
+                db_session.flush()
+                db_session.add(Prompt(name=f"Prompt{i}", content="内容", group_id=group.id))
+            db_session.commit()
+            query_counter.clear()
+            response = client.get("/api/v1/groups")
+            assert response.status_code == status.HTTP_200_OK
+            return len(query_counter)
+        
+        assert count_queries(2) == count_queries(30) == 1
@@ -50,3 +50,499 @@ class TestImageUpload:
         """测试删除不存在的图片"""
         response = client.delete("/api/v1/images/99999")
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+class TestStreamingUpload:
+    """流式上传测试"""
+    
+    def _temp_files(self):
+        from app.image_store import blob_root
+        return list(blob_root().glob("*.part")) if blob_root().exists() else []
+    
+    def test_upload_streams_to_disk(self, client, sample_prompt, monkeypatch):
+        """测试分块写入的文件完整且不残留临时文件"""
+        import hashlib
+        from app import utils
+        from app.image_store import absolute_path
+        
+        monkeypatch.setattr(utils, "UPLOAD_CHUNK_SIZE", 1000)
+        payload = bytes(range(256)) * 100
+        files = {"file": ("big.png", io.BytesIO(payload), "image/png")}
+        response = client.post(f"/api/v1/images/{sample_prompt.id}", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["file_size"] == len(payload)
+        
+        saved = absolute_path(data["file_path"])
+        assert hashlib.sha256(saved.read_bytes()).hexdigest() == hashlib.sha256(payload).hexdigest()
+        assert saved.stem == hashlib.sha256(payload).hexdigest()
+        assert not self._temp_files()
+        client.delete(f"/api/v1/images/{data['id']}")
+    
+    def test_upload_too_large(self, client, db_session, sample_prompt, monkeypatch):
+        """测试超过大小限制时中止上传并清理临时文件"""
+        from app.config import settings
+        from app.models import PromptImage
+        
+        monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+        files = {"file": ("big.png", io.BytesIO(b"x" * 5000), "image/png")}
+        response = client.post(f"/api/v1/images/{sample_prompt.id}", files=files)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not self._temp_files()
+        assert db_session.query(PromptImage).count() == 0
+    
+    def test_request_too_large_rejected_before_parsing(self, client, sample_prompt, monkeypatch):
+        """测试请求体超过上传限制时在解析之前返回 413（按 Content-Length 或边接收边计数）"""
+        from app.config import settings
+        from app.upload_limit import MULTIPART_OVERHEAD
+        
+        monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+        files = {"file": ("big.png", io.BytesIO(b"x" * (1024 + MULTIPART_OVERHEAD)), "image/png")}
+        response = client.post(f"/api/v1/images/{sample_prompt.id}", files=files)
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        
+        # 分块传输，没有 Content-Length
+        monkeypatch.setattr(settings, "MAX_BATCH_FILES", 2)
+        chunks = (b"x" * MULTIPART_OVERHEAD for _ in range(4))
+        response = client.post(
+            f"/api/v1/images/{sample_prompt.id}/batch",
+            content=chunks,
+            headers={"Content-Type": "multipart/form-data; boundary=b"}
+        )
+        assert "content-length" not in response.request.headers
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert not self._temp_files()
+
+class TestImageDeduplication:
+    """内容寻址去重测试"""
+    
+    def _upload(self, client, prompt_id, payload, name="same.png"):
+        files = {"file": (name, io.BytesIO(payload), "image/png")}
+        response = client.post(f"/api/v1/images/{prompt_id}", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+    
+    def test_same_content_shares_file(self, client, db_session, sample_prompt):
+        """测试相同内容的图片共享同一文件，最后一个引用删除时才删除文件"""
+        from app.models import ImageBlob, Prompt
+        from app.image_store import absolute_path
+        
+        other = Prompt(name="另一个", content="内容")
+        db_session.add(other)
+        db_session.commit()
+        
+        payload = b"shared image bytes"
+        first = self._upload(client, sample_prompt.id, payload)
+        second = self._upload(client, other.id, payload, name="copy.png")
+        assert first["file_path"] == second["file_path"]
+        assert "/blobs/" in first["file_path"]
+        
+        blob = db_session.query(ImageBlob).one()
+        assert blob.ref_count == 2
+        path = absolute_path(first["file_path"])
+        assert path.read_bytes() == payload
+        
+        assert client.delete(f"/api/v1/images/{first['id']}").status_code == status.HTTP_200_OK
+        db_session.expire_all()
+        assert db_session.query(ImageBlob).one().ref_count == 1
+        assert path.exists()
+        
+        assert client.delete(f"/api/v1/images/{second['id']}").status_code == status.HTTP_200_OK
+        db_session.expire_all()
+        assert db_session.query(ImageBlob).count() == 0
+        assert not path.exists()
+    
+    def test_dedupe_migration(self, db_session, sample_prompt):
+        """测试迁移脚本把已有的重复文件合并为共享文件"""
+        from app.config import settings
+        from app.image_store import absolute_path
+        from app.models import ImageBlob, ImageVariant, PromptImage
+        from scripts.dedupe_images import dedupe
+        
+        legacy_paths = []
+        variant_files = []
+        for i, payload in enumerate([b"legacy-a", b"legacy-a", b"legacy-b"]):
+            file_path = f"{settings.UPLOAD_DIR}/{sample_prompt.id}/legacy-{i}.png"
+            absolute_path(file_path).parent.mkdir(parents=True, exist_ok=True)
+            absolute_path(file_path).write_bytes(payload)
+            legacy_paths.append(file_path)
+            db_session.add(PromptImage(
+                prompt_id=sample_prompt.id, file_path=file_path, file_name=f"{i}.png",
+                file_size=len(payload), file_type="image/png"
+            ))
+            variant_path = f"{settings.UPLOAD_DIR}/variants/legacy-{i}-256.webp"
+            absolute_path(variant_path).parent.mkdir(parents=True, exist_ok=True)
+            absolute_path(variant_path).write_bytes(b"variant")
+            variant_files.append(variant_path)
+            db_session.add(ImageVariant(
+                source_path=file_path, width=256, height=256, format="webp", file_path=variant_path, file_size=7
+            ))
+        db_session.commit()
+        
+        assert dedupe(db_session, dry_run=True)["bytes_saved"] == len(b"legacy-a")
+        assert all(absolute_path(p).exists() for p in legacy_paths)
+        
+        stats = dedupe(db_session)
+        assert stats["moved"] == 3
+        assert stats["blobs"] == 2
+        assert stats["variants_removed"] == 1
+        
+        paths = [image.file_path for image in db_session.query(PromptImage).order_by(PromptImage.id)]
+        assert paths[0] == paths[1] != paths[2]
+        assert {blob.file_path: blob.ref_count for blob in db_session.query(ImageBlob)} == {paths[0]: 2, paths[2]: 1}
+        assert absolute_path(paths[0]).read_bytes() == b"legacy-a"
+        assert not any(absolute_path(p).exists() for p in legacy_paths)
+        # 变体跟随原图改写路径，合并后重复的变体删除
+        variants = {variant.source_path: variant.file_path for variant in db_session.query(ImageVariant)}
+        assert variants == {paths[0]: variant_files[0], paths[2]: variant_files[2]}
+        assert not absolute_path(variant_files[1]).exists()
+        
+        # 重复执行不再改动
+        assert dedupe(db_session)["moved"] == 0
+
+def _png_bytes(width, height, color=(200, 30, 30, 255)):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class TestImageVariants:
+    """缩略图变体测试"""
+    
+    def test_upload_generates_variants(self, client, sample_prompt):
+        """测试上传时生成各尺寸变体，不放大原图"""
+        from PIL import Image
+        from app.image_store import absolute_path
+        
+        files = {"file": ("photo.png", io.BytesIO(_png_bytes(600, 300)), "image/png")}
+        response = client.post(f"/api/v1/images/{sample_prompt.id}", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        variants = response.json()["variants"]
+        
+        assert {(v["width"], v["format"]) for v in variants} == {
+            (160, "webp"), (160, "jpeg"), (480, "webp"), (480, "jpeg"), (600, "webp"), (600, "jpeg")
+        }
+        for variant in variants:
+            assert variant["height"] == variant["width"] // 2
+            with Image.open(absolute_path(variant["file_path"])) as image:
+                assert image.size == (variant["width"], variant["height"])
+        
+        detail = client.get(f"/api/v1/prompts/{sample_prompt.id}").json()
+        assert detail["images"][0]["variants"] == variants
+    
+    def test_invalid_image_has_no_variants(self, client, sample_prompt):
+        """测试无法解码的图片仍可上传，只是没有变体"""
+        files = {"file": ("broken.jpg", io.BytesIO(b"not really a jpeg"), "image/jpeg")}
+        response = client.post(f"/api/v1/images/{sample_prompt.id}", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["variants"] == []
+        
+        from app.image_variants import _failed
+        assert _failed[response.json()["file_path"]] == float("inf")
+    
+    def test_transient_failure_retried(self, client, sample_prompt, monkeypatch):
+        """测试文件系统错误等非解码错误在 IMAGE_RETRY_INTERVAL 后重新生成"""
+        from app import image_variants
+        
+        async def unavailable(func, *args):
+            raise PermissionError(13, "Permission denied")
+        
+        with monkeypatch.context() as patch:
+            patch.setattr(image_variants, "run_in_process", unavailable)
+            files = {"file": ("retry.png", io.BytesIO(_png_bytes(200, 100)), "image/png")}
+            data = client.post(f"/api/v1/images/{sample_prompt.id}", files=files).json()
+        assert data["variants"] == []
+        
+        # 重试间隔内不再尝试
+        client.get(f"/api/v1/prompts/{sample_prompt.id}")
+        assert client.get(f"/api/v1/images/{data['id']}").json()["variants"] == []
+        
+        # 到达重试时间
+        image_variants._failed[data["file_path"]] = 0
+        client.get(f"/api/v1/prompts/{sample_prompt.id}")
+        assert len(client.get(f"/api/v1/images/{data['id']}").json()["variants"]) == 4
+    
+    def test_existing_image_generated_lazily(self, client, db_session, sample_prompt):
+        """测试已有图片在读取时补生成变体"""
+        from app.config import settings
+        from app.image_store import absolute_path
+        from app.models import PromptImage
+        
+        file_path = f"{settings.UPLOAD_DIR}/{sample_prompt.id}/legacy-variant.png"
+        absolute_path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        absolute_path(file_path).write_bytes(_png_bytes(200, 100))
+        image = PromptImage(prompt_id=sample_prompt.id, file_path=file_path, file_name="legacy.png",
+                            file_size=1, file_type="image/png")
+        db_session.add(image)
+        db_session.commit()
+        
+        # 详情接口在响应后补生成
+        first = client.get(f"/api/v1/prompts/{sample_prompt.id}").json()
+        assert first["images"][0]["variants"] == []
+        second = client.get(f"/api/v1/prompts/{sample_prompt.id}").json()
+        assert {v["width"] for v in second["images"][0]["variants"]} == {160, 200}
+        
+        # 图片接口直接返回变体
+        assert len(client.get(f"/api/v1/images/{image.id}").json()["variants"]) == 4
+
+class TestRenderEndpoint:
+    """按需缩放测试"""
+    
+    def _upload_png(self, client, prompt_id, width=400, height=200):
+        files = {"file": ("render.png", io.BytesIO(_png_bytes(width, height)), "image/png")}
+        return client.post(f"/api/v1/images/{prompt_id}", files=files).json()
+    
+    def test_render_and_cache_hit(self, client, sample_prompt, monkeypatch):
+        """测试首次请求缩放，之后直接返回缓存文件"""
+        from PIL import Image
+        from app import render_cache as render_cache_module
+        
+        image = self._upload_png(client, sample_prompt.id)
+        calls = []
+        original = render_cache_module.run_in_process
+        
+        async def counting_run(func, *args):
+            calls.append(args)
+            return await original(func, *args)
+        
+        monkeypatch.setattr(render_cache_module, "run_in_process", counting_run)
+        
+        for _ in range(2):
+            response = client.get(f"/api/v1/images/{image['id']}/render?w=100&fmt=jpeg")
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["content-type"] == "image/jpeg"
+            with Image.open(io.BytesIO(response.content)) as rendered:
+                assert rendered.size == (100, 50)
+        assert len(calls) == 1
+        
+        # 不放大原图
+        response = client.get(f"/api/v1/images/{image['id']}/render?w=1000&h=1000")
+        with Image.open(io.BytesIO(response.content)) as rendered:
+            assert rendered.size == (400, 200)
+            assert rendered.format == "WEBP"
+    
+    def test_render_validation(self, client, sample_prompt):
+        """测试参数校验"""
+        image = self._upload_png(client, sample_prompt.id)
+        assert client.get(f"/api/v1/images/{image['id']}/render").status_code == status.HTTP_400_BAD_REQUEST
+        assert client.get(f"/api/v1/images/{image['id']}/render?w=100&fmt=bmp").status_code == 422
+        assert client.get("/api/v1/images/99999/render?w=100").status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_concurrent_requests_coalesced(self, tmp_path, monkeypatch):
+        """测试相同参数的并发请求只缩放一次"""
+        import asyncio
+        from app import render_cache as render_cache_module
+        from app.render_cache import RenderCache
+        
+        source = tmp_path / "source.png"
+        source.write_bytes(_png_bytes(300, 300))
+        calls = []
+        
+        async def slow_run(func, *args):
+            calls.append(args)
+            await asyncio.sleep(0.05)
+            return func(*args)
+        
+        monkeypatch.setattr(render_cache_module, "run_in_process", slow_run)
+        cache = RenderCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+        
+        async def run():
+            return await asyncio.gather(*[
+                cache.get_or_render(str(source), "source.png", 64, 64, "webp") for _ in range(5)
+            ])
+        
+        paths = asyncio.run(run())
+        assert len(set(paths)) == 1
+        assert len(calls) == 1
+    
+    def test_cancelled_request_keeps_shared_render(self, tmp_path, monkeypatch):
+        """测试先发起的请求被取消时，合并等待的请求仍拿到缩放结果"""
+        import asyncio
+        import os
+        from app import render_cache as render_cache_module
+        from app.render_cache import RenderCache
+        
+        source = tmp_path / "source.png"
+        source.write_bytes(_png_bytes(300, 300))
+        calls = []
+        release = None
+        
+        async def blocked_run(func, *args):
+            calls.append(args)
+            await release.wait()
+            return func(*args)
+        
+        monkeypatch.setattr(render_cache_module, "run_in_process", blocked_run)
+        cache = RenderCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+        
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            first = asyncio.ensure_future(cache.get_or_render(str(source), "source.png", 64, 64, "webp"))
+            while not calls:
+                await asyncio.sleep(0.001)
+            second = asyncio.ensure_future(cache.get_or_render(str(source), "source.png", 64, 64, "webp"))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            path = await second
+            assert first.cancelled()
+            return path
+        
+        assert os.path.exists(asyncio.run(run()))
+        assert len(calls) == 1
+    
+    def test_render_errors(self, client, db_session, sample_prompt, monkeypatch):
+        """测试无法解码的图片返回400，其他错误不当作请求错误"""
+        from app import image_store, render_cache as render_cache_module
+        from app.models import PromptImage
+        
+        image = self._upload_png(client, sample_prompt.id)
+        corrupt = PromptImage(prompt_id=sample_prompt.id, file_path="uploads/images/corrupt.png",
+                              file_name="corrupt.png", file_size=9, file_type="image/png")
+        db_session.add(corrupt)
+        db_session.commit()
+        target = image_store.absolute_path(corrupt.file_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(b"not a png")
+        response = client.get(f"/api/v1/images/{corrupt.id}/render?w=100")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        async def failing_run(func, *args):
+            raise PermissionError(13, "Permission denied")
+        
+        monkeypatch.setattr(render_cache_module, "run_in_process", failing_run)
+        with pytest.raises(PermissionError):
+            client.get(f"/api/v1/images/{image['id']}/render?w=100")
+    
+    def test_lru_eviction(self, tmp_path, monkeypatch):
+        """测试超过容量时淘汰最近最少使用的缓存文件"""
+        import asyncio
+        import os
+        from app import render_cache as render_cache_module
+        from app.render_cache import RenderCache
+        
+        async def inline_run(func, *args):
+            return func(*args)
+        
+        monkeypatch.setattr(render_cache_module, "run_in_process", inline_run)
+        source = tmp_path / "source.png"
+        source.write_bytes(_png_bytes(300, 300, color=(10, 200, 30, 255)))
+        cache = RenderCache(str(tmp_path / "cache"), 1)
+        
+        async def run():
+            first = await cache.get_or_render(str(source), "source.png", 50, 0, "png")
+            second = await cache.get_or_render(str(source), "source.png", 60, 0, "png")
+            return first, second
+        
+        first, second = asyncio.run(run())
+        assert not os.path.exists(first)
+        assert os.path.exists(second)
+        assert cache.total_bytes == os.path.getsize(second)
+
+class TestImageMetadata:
+    """图片元数据和占位图测试"""
+    
+    def _upload(self, client, prompt_id, payload, name="meta.png", sort_order=0):
+        files = {"file": (name, io.BytesIO(payload), "image/png")}
+        response = client.post(f"/api/v1/images/{prompt_id}?sort_order={sort_order}", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+    
+    def test_upload_extracts_metadata(self, client, sample_prompt):
+        """测试上传时提取尺寸、主色和低质量预览图"""
+        import base64
+        from PIL import Image
+        
+        data = self._upload(client, sample_prompt.id, _png_bytes(320, 200, color=(0, 128, 255, 255)))
+        assert (data["width"], data["height"]) == (320, 200)
+        assert data["dominant_color"] == "#0080ff"
+        assert data["placeholder"].startswith("data:image/webp;base64,")
+        assert len(data["placeholder"]) < 1024
+        
+        raw = base64.b64decode(data["placeholder"].split(",", 1)[1])
+        with Image.open(io.BytesIO(raw)) as preview:
+            assert max(preview.size) <= 16
+    
+    def test_existing_image_backfilled(self, client, db_session, sample_prompt):
+        """测试已有图片读取时补充元数据"""
+        from app.config import settings
+        from app.image_store import absolute_path
+        from app.models import PromptImage
+        
+        file_path = f"{settings.UPLOAD_DIR}/{sample_prompt.id}/legacy-meta.png"
+        absolute_path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        absolute_path(file_path).write_bytes(_png_bytes(90, 60))
+        image = PromptImage(prompt_id=sample_prompt.id, file_path=file_path, file_name="legacy.png",
+                            file_size=1, file_type="image/png")
+        db_session.add(image)
+        db_session.commit()
+        
+        data = client.get(f"/api/v1/images/{image.id}").json()
+        assert (data["width"], data["height"]) == (90, 60)
+        db_session.expire_all()
+        assert db_session.get(PromptImage, image.id).placeholder is not None
+    
+    def test_list_cover_placeholder(self, client, db_session, sample_prompt, query_counter):
+        """测试列表按需返回封面图占位信息"""
+        self._upload(client, sample_prompt.id, _png_bytes(50, 50, color=(255, 0, 0, 255)), "second.png", sort_order=2)
+        first = self._upload(client, sample_prompt.id, _png_bytes(40, 80), "first.png", sort_order=1)
+        
+        assert client.get("/api/v1/prompts").json()["items"][0]["cover"] is None
+        
+        query_counter.clear()
+        cover = client.get("/api/v1/prompts?include_cover=true").json()["items"][0]["cover"]
+        assert cover["id"] == first["id"]
+        assert (cover["width"], cover["height"]) == (40, 80)
+        assert cover["placeholder"] == first["placeholder"]
+        # 封面图随列表一次性加载：主查询、总数、标签、效果图
+        assert len(query_counter) <= 4
+
+class TestBatchUpload:
+    """批量上传测试"""
+    
+    def test_batch_upload(self, client, db_session, sample_prompt, query_counter):
+        """测试一次请求上传多个文件，按文件返回结果"""
+        from app.models import PromptImage
+        
+        files = [
+            ("files", ("a.png", io.BytesIO(_png_bytes(30, 20, color=(1, 2, 3, 255))), "image/png")),
+            ("files", ("note.txt", io.BytesIO(b"text"), "text/plain")),
+            ("files", ("b.png", io.BytesIO(_png_bytes(40, 20, color=(4, 5, 6, 255))), "image/png")),
+            ("files", ("a-copy.png", io.BytesIO(_png_bytes(30, 20, color=(1, 2, 3, 255))), "image/png")),
+        ]
+        query_counter.clear()
+        response = client.post(f"/api/v1/images/{sample_prompt.id}/batch?sort_order=10", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        
+        assert (data["succeeded"], data["failed"]) == (3, 1)
+        assert [item["success"] for item in data["items"]] == [True, False, True, True]
+        assert data["items"][1]["file_name"] == "note.txt"
+        assert "不支持的文件类型" in data["items"][1]["error"]
+        
+        first, _, second, copy = [item["image"] for item in data["items"]]
+        assert [first["sort_order"], second["sort_order"], copy["sort_order"]] == [10, 12, 13]
+        assert (second["width"], second["height"]) == (40, 20)
+        # 相同内容共享文件
+        assert first["file_path"] == copy["file_path"] != second["file_path"]
+        
+        # 所有图片记录一条语句插入
+        inserts = [sql for sql in query_counter if sql.lstrip().upper().startswith("INSERT INTO PROMPT_IMAGES")]
+        assert len(inserts) == 1
+        assert db_session.query(PromptImage).count() == 3
+    
+    def test_batch_upload_invalid_prompt(self, client):
+        """测试批量上传到不存在的Prompt"""
+        files = [("files", ("a.png", io.BytesIO(_png_bytes(10, 10)), "image/png"))]
+        response = client.post("/api/v1/images/99999/batch", files=files)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_batch_upload_too_many_files(self, client, sample_prompt, monkeypatch):
+        """测试超过单次文件数限制"""
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "MAX_BATCH_FILES", 1)
+        files = [("files", (f"{i}.png", io.BytesIO(_png_bytes(10, 10)), "image/png")) for i in range(2)]
+        response = client.post(f"/api/v1/images/{sample_prompt.id}/batch", files=files)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
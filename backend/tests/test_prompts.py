@@ -173,8 +173,11 @@ class TestPromptCRUD:
         db_session.commit()
         
         ids = [p.id for p in prompts]
-        response = client.delete("/api/v1/prompts/batch", json={"ids": ids})
+        response = client.request("DELETE", "/api/v1/prompts/batch", json={"ids": ids})
         assert response.status_code == status.HTTP_200_OK
+        assert response.json()["message"] == "成功删除3个Prompt"
+        db_session.expire_all()
+        assert all(p.deleted_at is not None for p in prompts)
     
     def test_copy_prompt(self, client, sample_prompt):
         """测试复制Prompt（增加使用次数）"""
@@ -192,3 +195,687 @@ class TestPromptCRUD:
         """测试复制不存在的Prompt"""
         response = client.post("/api/v1/prompts/99999/copy")
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+class TestPromptTagUpdates:
+    """标签按差异更新测试"""
+    
+    def _relation_writes(self, query_counter):
+        return [
+            sql.lstrip().split()[0].upper() for sql in query_counter
+            if "prompt_tag_relations" in sql and sql.lstrip().split()[0].upper() in ("INSERT", "DELETE")
+        ]
+    
+    def test_unchanged_tags_not_rewritten(self, client, sample_prompt, sample_tag, query_counter):
+        """测试标签未变化时不写关联表"""
+        query_counter.clear()
+        response = client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": [sample_tag.id]})
+        assert response.status_code == status.HTTP_200_OK
+        assert [tag["id"] for tag in response.json()["tags"]] == [sample_tag.id]
+        assert self._relation_writes(query_counter) == []
+    
+    def test_diff_insert_and_delete(self, client, db_session, sample_prompt, sample_tag, query_counter):
+        """测试只插入新增、只删除移除的关联"""
+        from app.models import PromptTag
+        
+        tags = [PromptTag(name=f"差异{i}") for i in range(3)]
+        db_session.add_all(tags)
+        db_session.commit()
+        new_ids = [tag.id for tag in tags]
+        
+        query_counter.clear()
+        response = client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": [sample_tag.id] + new_ids})
+        assert sorted(tag["id"] for tag in response.json()["tags"]) == sorted([sample_tag.id] + new_ids)
+        assert self._relation_writes(query_counter) == ["INSERT"]
+        
+        query_counter.clear()
+        response = client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": new_ids[:1]})
+        assert [tag["id"] for tag in response.json()["tags"]] == new_ids[:1]
+        assert self._relation_writes(query_counter) == ["DELETE"]
+    
+    def test_invalid_tag_rejected(self, client, sample_prompt, sample_tag):
+        """测试新增不存在的标签时不修改"""
+        response = client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": [99999]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = client.get(f"/api/v1/prompts/{sample_prompt.id}")
+        assert [tag["id"] for tag in response.json()["tags"]] == [sample_tag.id]
+    
+    def test_concurrent_duplicate_skipped(self, client, db_session, sample_prompt, sample_tag, monkeypatch):
+        """测试读取差异后其他请求已插入相同关联时跳过，不违反唯一索引"""
+        from app.models import PromptTag, prompt_tag_relations
+        from app.taxonomy import taxonomy
+        
+        tag = PromptTag(name="并发标签")
+        db_session.add(tag)
+        db_session.commit()
+        tag_id = tag.id
+        
+        async def concurrent_insert(db, tag_ids):
+            db_session.execute(prompt_tag_relations.insert().values(prompt_id=sample_prompt.id, tag_id=tag_id))
+            db_session.commit()
+            return False
+        
+        monkeypatch.setattr(taxonomy, "missing_tags", concurrent_insert)
+        response = client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": [sample_tag.id, tag_id]})
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(tag["id"] for tag in response.json()["tags"]) == sorted([sample_tag.id, tag_id])
+        
+        db_session.execute(prompt_tag_relations.delete().where(prompt_tag_relations.c.tag_id == tag_id))
+        db_session.commit()
+        response = client.post("/api/v1/prompts/bulk", json={
+            "action": "add_tags", "ids": [sample_prompt.id], "tag_ids": [tag_id]
+        })
+        assert response.status_code == status.HTTP_200_OK
+    
+    def test_relation_unique(self, db_session, sample_prompt, sample_tag):
+        """测试同一Prompt和标签不能重复关联"""
+        import sqlalchemy
+        from app.models import prompt_tag_relations
+        
+        with pytest.raises(sqlalchemy.exc.IntegrityError):
+            db_session.execute(prompt_tag_relations.insert().values(prompt_id=sample_prompt.id, tag_id=sample_tag.id))
+        db_session.rollback()
+    
+    def test_ensure_indexes_removes_duplicates(self, db_session, sample_prompt, sample_tag):
+        """测试为已有数据补建唯一索引前删除重复的关联"""
+        from sqlalchemy import func, inspect, select, text
+        from app.database import ensure_indexes
+        from app.models import prompt_tag_relations
+        
+        db_session.execute(text("DROP INDEX ix_prompt_tag_relations_prompt_tag"))
+        db_session.execute(prompt_tag_relations.insert(), [
+            dict(prompt_id=sample_prompt.id, tag_id=sample_tag.id) for _ in range(2)
+        ])
+        db_session.commit()
+        
+        ensure_indexes(db_session.get_bind())
+        count = db_session.execute(select(func.count()).select_from(prompt_tag_relations)).scalar()
+        assert count == 1
+        names = {index["name"] for index in inspect(db_session.get_bind()).get_indexes("prompt_tag_relations")}
+        assert {"ix_prompt_tag_relations_prompt_tag", "ix_prompt_tag_relations_tag_prompt"} <= names
+
+class TestPromptCursorPagination:
+    """游标分页测试"""
+    
+    @pytest.fixture
+    def fields(self):
+        """创建时间各不相同、usage_count 有重复的Prompt"""
+        from datetime import datetime, timedelta
+        
+        base = datetime(2026, 1, 1)
+        return dict(
+            name=lambda i: f"游标{i:02d}", usage_count=lambda i: i % 3, created_at=lambda i: base + timedelta(minutes=i)
+        )
+    
+    def _collect(self, client, params):
+        ids = []
+        cursor = ""
+        while cursor is not None:
+            response = client.get("/api/v1/prompts", params={**params, "cursor": cursor})
+            assert response.status_code == status.HTTP_200_OK
+            data = response.json()
+            ids.extend(item["id"] for item in data["items"])
+            cursor = data["next_cursor"]
+            # 游标没有前进时会无限翻页
+            assert len(ids) == len(set(ids))
+        return ids
+    
+    def test_cursor_matches_offset_order(self, client, make_prompts, fields):
+        """测试游标分页结果与页码分页一致"""
+        make_prompts(7, **fields)
+        offset_ids = [item["id"] for item in client.get("/api/v1/prompts?page_size=100").json()["items"]]
+        assert self._collect(client, {"page_size": 3}) == offset_ids
+    
+    def test_cursor_ties_use_id(self, client, make_prompts, fields):
+        """测试排序键相同时按id继续翻页，不重复不遗漏"""
+        prompts = make_prompts(8, **fields)
+        ids = self._collect(client, {"page_size": 2, "sort_by": "usage_count", "order": "asc"})
+        assert sorted(ids) == sorted(p.id for p in prompts)
+        assert len(ids) == len(set(ids))
+    
+    def test_cursor_server_default_timestamps(self, client):
+        """测试创建时间取服务端默认值（不带微秒、同一秒内相同）时游标分页不重复读取同一页"""
+        created = [
+            client.post("/api/v1/prompts", json={"name": f"默认时间{i}", "content": "内容"}).json()["id"]
+            for i in range(5)
+        ]
+        for order in ("desc", "asc"):
+            offset_ids = [item["id"] for item in client.get(
+                "/api/v1/prompts", params={"page_size": 100, "order": order}
+            ).json()["items"]]
+            assert sorted(offset_ids) == sorted(created)
+            assert self._collect(client, {"page_size": 2, "order": order}) == offset_ids
+    
+    def test_cursor_last_page(self, client, make_prompts, fields):
+        """测试最后一页没有next_cursor"""
+        make_prompts(2, **fields)
+        data = client.get("/api/v1/prompts?cursor=&page_size=5&total_mode=exact").json()
+        assert len(data["items"]) == 2
+        assert data["next_cursor"] is None
+        assert data["total"] == 2
+    
+    def test_cursor_skips_total_by_default(self, client, make_prompts, fields, query_counter):
+        """测试游标分页默认不计算总数"""
+        make_prompts(3, **fields)
+        query_counter.clear()
+        data = client.get("/api/v1/prompts?cursor=&page_size=2").json()
+        assert (data["total"], data["total_kind"]) == (None, "none")
+        assert data["has_more"] is True
+        assert not any("count(" in statement.lower() for statement in query_counter)
+    
+    def test_cursor_sort_mismatch(self, client, make_prompts, fields):
+        """测试游标与排序方式不一致"""
+        make_prompts(3, **fields)
+        cursor = client.get("/api/v1/prompts?cursor=&page_size=1").json()["next_cursor"]
+        response = client.get(f"/api/v1/prompts?cursor={cursor}&sort_by=name")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_invalid_cursor(self, client):
+        """测试无效游标"""
+        from app.utils import encode_cursor
+        
+        response = client.get("/api/v1/prompts?cursor=not-a-cursor")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        # 排序键类型与排序字段不符
+        for sort_by, key in (("usage_count", "1"), ("usage_count", [1]), ("usage_count", True), ("name", 1), ("name", None)):
+            cursor = encode_cursor(sort_by, "desc", key, 1)
+            response = client.get(f"/api/v1/prompts?cursor={cursor}&sort_by={sort_by}")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_offset_mode_has_no_cursor(self, client, make_prompts, fields):
+        """测试页码分页不返回游标"""
+        make_prompts(3, **fields)
+        data = client.get("/api/v1/prompts?page=1&page_size=1").json()
+        assert data["next_cursor"] is None
+        assert len(data["items"]) == 1
+
+class TestPromptQueryCount:
+    """查询次数测试：各接口的查询次数与返回数量无关"""
+    
+    @pytest.fixture
+    def fields(self, db_session):
+        """每个Prompt关联同一分组、3个标签和2张效果图"""
+        from app.models import PromptGroup, PromptTag, PromptImage
+        
+        group = PromptGroup(name="计数分组")
+        tags = [PromptTag(name=f"计数标签{i}") for i in range(3)]
+        db_session.add(group)
+        db_session.add_all(tags)
+        db_session.flush()
+        return dict(prefix="计数", content="计数内容", group_id=group.id, tags=tags, images=lambda i: [
+            PromptImage(file_path=f"uploads/images/{i}/{j}.png", file_name=f"{j}.png", file_size=1, file_type="image/png")
+            for j in range(2)
+        ])
+    
+    def _count(self, client, query_counter, url):
+        query_counter.clear()
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(query_counter)
+    
+    def test_list_query_count(self, client, make_prompts, fields, query_counter):
+        """测试列表接口查询次数与page_size无关"""
+        make_prompts(12, **fields)
+        small = self._count(client, query_counter, "/api/v1/prompts?page_size=2")
+        large = self._count(client, query_counter, "/api/v1/prompts?page_size=12")
+        assert small == large <= 3
+    
+    def test_search_query_count(self, client, make_prompts, fields, query_counter):
+        """测试搜索接口查询次数与limit无关"""
+        make_prompts(12, **fields)
+        small = self._count(client, query_counter, "/api/v1/search?keyword=计数&limit=2")
+        large = self._count(client, query_counter, "/api/v1/search?keyword=计数&limit=12")
+        assert small == large <= 2
+    
+    def test_detail_query_count(self, client, make_prompts, fields, query_counter):
+        """测试详情接口一次性加载分组、标签、效果图及其变体"""
+        prompt = make_prompts(1, **fields)[0]
+        # 首次读取会在后台尝试补生成变体（测试数据没有实际的图片文件）
+        client.get(f"/api/v1/prompts/{prompt.id}")
+        assert self._count(client, query_counter, f"/api/v1/prompts/{prompt.id}") <= 4
+        data = client.get(f"/api/v1/prompts/{prompt.id}").json()
+        assert data["group"]["name"] == "计数分组"
+        assert len(data["tags"]) == 3
+        assert len(data["images"]) == 2
+    
+    def test_unlisted_relation_raises(self, make_prompts, fields, db_session):
+        """测试加载策略外的关系访问会抛出异常"""
+        import sqlalchemy.exc
+        from app.models import Prompt
+        from app.loading import PROMPT_LIST
+        
+        make_prompts(1, **fields)
+        db_session.expunge_all()
+        prompt = db_session.query(Prompt).options(*PROMPT_LIST).first()
+        with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+            prompt.images
+
+class TestPromptExport:
+    """流式导出测试"""
+    
+    def _lines(self, body: bytes):
+        import json
+        
+        return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    
+    def test_export_ndjson(self, client, make_prompts, db_session, sample_group, sample_tag, monkeypatch):
+        """测试导出所有Prompt，含分组、标签和效果图元数据，跨多个批次"""
+        from app.config import settings
+        from app.models import PromptImage
+        
+        monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+        prompts = make_prompts(5, prefix="导出", group=sample_group, tags=[sample_tag])
+        db_session.add(PromptImage(
+            prompt_id=prompts[0].id, file_path="uploads/images/a.png", file_name="a.png",
+            file_size=10, file_type="image/png", width=30, height=20
+        ))
+        db_session.commit()
+        
+        response = client.get("/api/v1/prompts/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert ".ndjson" in response.headers["content-disposition"]
+        
+        records = self._lines(response.content)
+        assert [record["id"] for record in records] == [prompt.id for prompt in prompts]
+        assert records[0]["group"]["name"] == sample_group.name
+        assert records[0]["tags"][0]["name"] == sample_tag.name
+        assert records[0]["images"][0]["width"] == 30
+        assert records[1]["images"] == []
+    
+    def test_export_filters(self, client, make_prompts, sample_group, sample_tag):
+        """测试筛选参数与列表接口一致"""
+        make_prompts(2, prefix="导出", group=sample_group)
+        make_prompts(3, prefix="导出", tags=[sample_tag])
+        
+        def ids(url):
+            return sorted(record["id"] for record in self._lines(client.get(url).content))
+        
+        def list_ids(params):
+            response = client.get(f"/api/v1/prompts?page_size=100&{params}")
+            return sorted(item["id"] for item in response.json()["items"])
+        
+        for params in (f"group_id={sample_group.id}", "group_id=0", f"tag_id={sample_tag.id}", "keyword=导出1"):
+            assert ids(f"/api/v1/prompts/export?{params}") == list_ids(params)
+    
+    def test_export_excludes_deleted(self, client, make_prompts, db_session):
+        """测试已删除的Prompt不导出"""
+        from datetime import datetime
+        
+        prompts = make_prompts(2, prefix="导出")
+        prompts[0].deleted_at = datetime.utcnow()
+        db_session.commit()
+        
+        records = self._lines(client.get("/api/v1/prompts/export").content)
+        assert [record["id"] for record in records] == [prompts[1].id]
+    
+    def test_export_gzip(self, client, make_prompts):
+        """测试gzip压缩导出"""
+        import gzip
+        
+        make_prompts(3, prefix="导出")
+        response = client.get("/api/v1/prompts/export?compression=gzip")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        assert len(self._lines(gzip.decompress(response.content))) == 3
+    
+    def test_export_cli(self, make_prompts, db_session, sample_tag, tmp_path):
+        """测试命令行导出使用同一查询和编码"""
+        import gzip
+        from app.export import Compressor, export_query, write_export
+        
+        make_prompts(3, prefix="导出", tags=[sample_tag])
+        output = tmp_path / "prompts.ndjson.gz"
+        with open(output, "wb") as f:
+            count = write_export(db_session, export_query(db_session, tag_id=sample_tag.id), f, Compressor("gzip"))
+        
+        assert count == 3
+        records = self._lines(gzip.decompress(output.read_bytes()))
+        assert [record["tags"][0]["id"] for record in records] == [sample_tag.id] * 3
+
+class TestPromptImport:
+    """批量导入测试"""
+    
+    def _post(self, client, records, **params):
+        import json
+        
+        lines = [record if isinstance(record, str) else json.dumps(record, ensure_ascii=False) for record in records]
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        return client.post("/api/v1/prompts/import", content=body, params=params)
+    
+    def test_import_prompts(self, client, db_session, sample_group, sample_tag):
+        """测试导入Prompt，分组和标签按名称匹配，不存在时创建"""
+        from app.models import Prompt, PromptGroup, PromptTag
+        
+        response = self._post(client, [
+            {"name": "导入1", "content": "内容1", "group": sample_group.name, "tags": [sample_tag.name, "新标签"]},
+            {"name": "导入2", "content": "内容2", "group": {"name": "新分组", "description": "导入创建"},
+             "tags": [{"name": "新标签", "color": "#ff0000"}], "usage_count": 7},
+            {"name": "导入3", "content": "内容3"},
+        ])
+        assert response.status_code == 200
+        assert response.json() == {"total": 3, "imported": 3, "failed": 0, "errors": [], "aborted": None}
+        
+        prompts = {prompt.name: prompt for prompt in db_session.query(Prompt).all()}
+        assert prompts["导入1"].group_id == sample_group.id
+        assert sorted(tag.name for tag in prompts["导入1"].tags) == sorted([sample_tag.name, "新标签"])
+        assert prompts["导入2"].group.description == "导入创建"
+        assert prompts["导入2"].usage_count == 7
+        assert prompts["导入3"].group_id is None and prompts["导入3"].tags == []
+        assert db_session.query(PromptGroup).count() == 2
+        assert db_session.query(PromptTag).filter(PromptTag.name == "新标签").count() == 1
+    
+    def test_import_reports_record_errors(self, client, db_session):
+        """测试格式或校验错误的行单独报告，其他行正常导入"""
+        from app.models import Prompt
+        
+        response = self._post(client, [
+            {"name": "正常1", "content": "内容"},
+            "{not json",
+            {"name": "缺少内容"},
+            "",
+            {"name": "标签过长", "content": "内容", "tags": ["x" * 51]},
+            {"name": "正常2", "content": "内容"},
+        ])
+        data = response.json()
+        assert (data["total"], data["imported"], data["failed"]) == (5, 2, 3)
+        assert [error["line"] for error in data["errors"]] == [2, 3, 5]
+        assert "content" in data["errors"][1]["error"]
+        assert sorted(name for name, in db_session.query(Prompt.name)) == ["正常1", "正常2"]
+    
+    def test_import_batches_statements(self, client, db_session, query_counter, monkeypatch):
+        """测试按批写入：每批的插入语句数与行数无关"""
+        from app.config import settings
+        from app.models import Prompt
+        
+        monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 10)
+        records = [
+            {"name": f"批量{i}", "content": "内容", "group": f"分组{i % 3}", "tags": [f"标签{i % 4}", f"标签{i % 5}"]}
+            for i in range(25)
+        ]
+        query_counter.clear()
+        response = self._post(client, records)
+        assert response.json()["imported"] == 25
+        
+        inserts = [sql for sql in query_counter if sql.lstrip().upper().startswith("INSERT")]
+        relation_inserts = [sql for sql in inserts if "prompt_tag_relations" in sql]
+        # 3 批，每批最多一条关联插入
+        assert len(relation_inserts) == 3
+        assert db_session.query(Prompt).count() == 25
+        prompt = db_session.query(Prompt).filter(Prompt.name == "批量7").one()
+        assert prompt.group.name == "分组1"
+        assert sorted(tag.name for tag in prompt.tags) == ["标签2", "标签3"]
+    
+    def test_import_gzip_roundtrip(self, client, db_session, sample_group, sample_tag):
+        """测试导出的gzip文件可以直接导入"""
+        from app.models import Prompt
+        
+        db_session.add(Prompt(name="往返", content="内容", group=sample_group, tags=[sample_tag]))
+        db_session.commit()
+        exported = client.get("/api/v1/prompts/export?compression=gzip").content
+        
+        response = client.post("/api/v1/prompts/import?compression=gzip", content=exported)
+        assert response.json()["imported"] == 1
+        copies = db_session.query(Prompt).filter(Prompt.name == "往返").all()
+        assert len(copies) == 2
+        assert {prompt.group_id for prompt in copies} == {sample_group.id}
+        assert all([tag.id for tag in prompt.tags] == [sample_tag.id] for prompt in copies)
+    
+    def test_import_corrupt_body(self, client):
+        """测试无法解压的请求体"""
+        response = client.post("/api/v1/prompts/import?compression=gzip", content=b"not gzip")
+        assert response.status_code == 400
+        data = response.json()
+        assert (data["total"], data["imported"]) == (0, 0)
+        assert data["aborted"]["line"] == 1
+    
+    def test_import_corrupt_tail_reports_committed(self, client, db_session, monkeypatch):
+        """测试请求体中途损坏时，之前的行照常导入，结果报告已导入数量和出错的行号"""
+        import json
+        import zlib
+        from starlette.requests import Request
+        from app.config import settings
+        from app.models import Prompt
+        
+        monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+        lines = "".join(json.dumps({"name": f"中途{i}", "content": "内容"}, ensure_ascii=False) + "\n" for i in range(5))
+        compressor = zlib.compressobj(wbits=31)
+        head = compressor.compress(lines.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        
+        # 测试客户端把请求体作为一个消息发送，这里按两段接收：完整的压缩数据和损坏的数据
+        async def stream(request):
+            for chunk in (head, b"\xff" * 64):
+                yield chunk
+        
+        monkeypatch.setattr(Request, "stream", stream)
+        response = client.post("/api/v1/prompts/import?compression=gzip", content=head)
+        assert response.status_code == 400
+        data = response.json()
+        assert (data["total"], data["imported"], data["failed"]) == (5, 5, 0)
+        assert data["aborted"]["line"] == 6
+        assert db_session.query(Prompt).count() == 5
+
+class TestPromptBulkOperations:
+    """批量操作测试"""
+    
+    def _ids(self, prompts):
+        return [prompt.id for prompt in prompts]
+    
+    def _bulk(self, client, **body):
+        response = client.post("/api/v1/prompts/bulk", json=body)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        return response.json()
+    
+    def test_delete_and_restore(self, client, make_prompts, db_session):
+        """测试批量软删除和恢复，只统计实际变化的行"""
+        from app.models import Prompt
+        
+        ids = self._ids(make_prompts(3, prefix="批量操作"))
+        assert self._bulk(client, action="delete", ids=ids[:2])["affected"] == 2
+        assert self._bulk(client, action="delete", ids=ids)["affected"] == 1
+        assert client.get("/api/v1/prompts").json()["total"] == 0
+        
+        data = self._bulk(client, action="restore", ids=ids[:2] + [99999])
+        assert (data["requested"], data["affected"]) == (3, 2)
+        db_session.expire_all()
+        assert db_session.query(Prompt).filter(Prompt.deleted_at.is_(None)).count() == 2
+    
+    def test_move(self, client, make_prompts, db_session, sample_group):
+        """测试批量移动分组，已在目标分组的不计入，0表示移出分组"""
+        from app.models import Prompt
+        
+        ids = self._ids(make_prompts(2, prefix="批量操作") + make_prompts(1, prefix="批量操作", group_id=sample_group.id))
+        assert self._bulk(client, action="move", ids=ids, group_id=sample_group.id)["affected"] == 2
+        db_session.expire_all()
+        assert {prompt.group_id for prompt in db_session.query(Prompt)} == {sample_group.id}
+        
+        assert self._bulk(client, action="move", ids=ids[:1], group_id=0)["affected"] == 1
+        db_session.expire_all()
+        assert db_session.get(Prompt, ids[0]).group_id is None
+        
+        response = client.post("/api/v1/prompts/bulk", json={"action": "move", "ids": ids, "group_id": 99999})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_add_and_remove_tags(self, client, make_prompts, db_session, sample_tag):
+        """测试批量添加/移除标签，已有的关联跳过"""
+        from app.models import Prompt, PromptTag
+        
+        other = PromptTag(name="批量标签")
+        db_session.add(other)
+        db_session.commit()
+        ids = self._ids(make_prompts(2, prefix="批量操作") + make_prompts(1, prefix="批量操作", tags=[sample_tag]))
+        
+        data = self._bulk(client, action="add_tags", ids=ids, tag_ids=[sample_tag.id, other.id])
+        assert data["affected"] == 5
+        assert self._bulk(client, action="add_tags", ids=ids, tag_ids=[sample_tag.id])["affected"] == 0
+        db_session.expire_all()
+        for prompt in db_session.query(Prompt):
+            assert sorted(tag.id for tag in prompt.tags) == sorted([sample_tag.id, other.id])
+        
+        assert self._bulk(client, action="remove_tags", ids=ids[:2], tag_ids=[other.id])["affected"] == 2
+        db_session.expire_all()
+        assert [tag.id for tag in db_session.get(Prompt, ids[0]).tags] == [sample_tag.id]
+        
+        response = client.post("/api/v1/prompts/bulk", json={"action": "add_tags", "ids": ids, "tag_ids": [99999]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_single_statement(self, client, make_prompts, sample_tag, query_counter):
+        """测试每个操作只执行一条写语句，不加载Prompt对象"""
+        ids = self._ids(make_prompts(20, prefix="批量操作"))
+        for body in (
+            {"action": "add_tags", "ids": ids, "tag_ids": [sample_tag.id]},
+            {"action": "remove_tags", "ids": ids, "tag_ids": [sample_tag.id]},
+            {"action": "delete", "ids": ids},
+            {"action": "restore", "ids": ids},
+        ):
+            query_counter.clear()
+            self._bulk(client, **body)
+            writes = [sql for sql in query_counter if sql.lstrip().split()[0].upper() in ("INSERT", "UPDATE", "DELETE")]
+            prompt_selects = [sql for sql in query_counter if sql.lstrip().upper().startswith("SELECT PROMPTS.")]
+            assert len(writes) == 1
+            assert prompt_selects == []
+    
+    def test_legacy_batch_delete(self, client, make_prompts):
+        """测试兼容旧的批量删除接口"""
+        ids = self._ids(make_prompts(2, prefix="批量操作"))
+        response = client.post("/api/v1/prompts/batch", json=ids)
+        assert response.json()["message"] == "成功删除2个Prompt"
+        response = client.post("/api/v1/prompts/batch", json=ids)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestFastJSON:
+    """JSON 快速路径测试：与默认序列化的响应一致"""
+    
+    @pytest.fixture
+    def fields(self, db_session):
+        """分组、标签数量和使用次数各不相同、带一张效果图的Prompt"""
+        from app.models import PromptGroup, PromptTag, PromptImage
+        
+        group = PromptGroup(name="快速分组", description="分组描述")
+        tags = [PromptTag(name=f"快速标签{i}", color="#123456") for i in range(2)]
+        db_session.add(group)
+        db_session.add_all(tags)
+        db_session.flush()
+        return dict(
+            prefix="快速", content=lambda i: f"快速内容{i}", usage_count=lambda i: i,
+            group_id=lambda i: group.id if i % 2 else None, tags=lambda i: tags[:i % 3],
+            images=lambda i: [
+                PromptImage(file_path=f"uploads/images/fast{i}.png", file_name=f"fast{i}.png", file_size=1,
+                            file_type="image/png", width=10, height=20, dominant_color="#000000")
+            ]
+        )
+    
+    def _compare(self, client, monkeypatch, url):
+        from app.config import settings
+        
+        expected = client.get(url)
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+        actual = client.get(url)
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", False)
+        assert expected.status_code == actual.status_code == status.HTTP_200_OK
+        assert actual.json() == expected.json()
+        return actual.json()
+    
+    def test_list_matches_default(self, client, make_prompts, fields, monkeypatch):
+        """测试列表（含封面图、游标分页）与默认序列化一致"""
+        make_prompts(5, **fields)
+        data = self._compare(client, monkeypatch, "/api/v1/prompts?page_size=3")
+        assert len(data["items"]) == 3
+        self._compare(client, monkeypatch, "/api/v1/prompts?page_size=10&include_cover=true")
+        data = self._compare(client, monkeypatch, "/api/v1/prompts?cursor=&page_size=2&sort_by=usage_count")
+        self._compare(client, monkeypatch, f"/api/v1/prompts?cursor={data['next_cursor']}&page_size=2&sort_by=usage_count")
+    
+    def test_search_matches_default(self, client, make_prompts, fields, monkeypatch):
+        """测试搜索与默认序列化一致"""
+        make_prompts(4, **fields)
+        data = self._compare(client, monkeypatch, "/api/v1/search?keyword=快速&limit=3")
+        assert len(data["items"]) == 3
+    
+    def test_detail_matches_default(self, client, make_prompts, fields, monkeypatch):
+        """测试详情与默认序列化一致"""
+        prompts = make_prompts(3, **fields)
+        for prompt in prompts:
+            self._compare(client, monkeypatch, f"/api/v1/prompts/{prompt.id}")
+    
+    def test_list_reads_rows(self, client, make_prompts, fields, monkeypatch, query_counter):
+        """测试列表按列读取，查询次数与page_size无关"""
+        from app.config import settings
+        
+        make_prompts(12, **fields)
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+        counts = []
+        for page_size in (2, 12):
+            query_counter.clear()
+            assert client.get(f"/api/v1/prompts?page_size={page_size}").status_code == status.HTTP_200_OK
+            counts.append(len(query_counter))
+        assert counts[0] == counts[1] <= 3
+    
+    def test_disabled_without_orjson(self, monkeypatch):
+        """测试未安装 orjson 时不启用快速路径"""
+        from app import fast_json
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+        monkeypatch.setattr(fast_json, "orjson", None)
+        assert not fast_json.enabled()
+
+
+class TestSparseFields:
+    """字段选择和内容截断测试"""
+    
+    @pytest.fixture
+    def prompts(self, make_prompts, sample_group, sample_tag):
+        """3个属于示例分组、带示例标签的长内容Prompt"""
+        return make_prompts(
+            3, prefix="稀疏", content="长内容" * 100, group_id=sample_group.id, usage_count=lambda i: i, tags=[sample_tag]
+        )
+    
+    def test_list_fields(self, client, prompts, sample_group, sample_tag):
+        """测试列表只返回指定字段"""
+        response = client.get("/api/v1/prompts?fields=name,tags")
+        assert response.status_code == status.HTTP_200_OK
+        items = response.json()["items"]
+        assert len(items) == 3
+        assert set(items[0]) == {"id", "name", "tags"}
+        assert items[0]["tags"][0]["name"] == sample_tag.name
+    
+    def test_list_snippet(self, client, prompts, sample_group, sample_tag, query_counter):
+        """测试content在数据库中截断"""
+        query_counter.clear()
+        response = client.get("/api/v1/prompts?snippet_len=10&include_cover=true")
+        assert response.status_code == status.HTTP_200_OK
+        item = response.json()["items"][0]
+        assert item["content"] == ("长内容" * 100)[:10]
+        assert item["group"]["name"] == sample_group.name
+        assert item["cover"] is None
+        assert any("substr" in statement.lower() for statement in query_counter)
+    
+    def test_fields_match_full_response(self, client, prompts, sample_group, sample_tag):
+        """测试选择的字段与完整响应一致"""
+        full = client.get("/api/v1/prompts").json()["items"]
+        sparse = client.get("/api/v1/prompts?fields=group,usage_count,created_at").json()["items"]
+        assert sparse == [
+            {key: item[key] for key in ("id", "group", "usage_count", "created_at")}
+            for item in full
+        ]
+    
+    def test_cursor_without_sort_field(self, client, prompts, sample_group, sample_tag):
+        """测试游标分页的排序字段未被选择时仍可翻页"""
+        first = client.get("/api/v1/prompts?cursor=&page_size=2&sort_by=usage_count&fields=name").json()
+        assert [item["name"] for item in first["items"]] == ["稀疏2", "稀疏1"]
+        second = client.get(f"/api/v1/prompts?cursor={first['next_cursor']}&page_size=2&sort_by=usage_count&fields=name").json()
+        assert [item["name"] for item in second["items"]] == ["稀疏0"]
+    
+    def test_search_fields(self, client, prompts, sample_group, sample_tag):
+        """测试搜索支持字段选择和内容截断"""
+        for total_mode in ("exact", "none"):
+            response = client.get(f"/api/v1/search?keyword=稀疏&fields=name,content&snippet_len=3&total_mode={total_mode}")
+            assert response.status_code == status.HTTP_200_OK
+            items = response.json()["items"]
+            assert len(items) == 3
+            assert items[0] == {"id": items[0]["id"], "name": items[0]["name"], "content": "长内容"}
+    
+    def test_invalid_fields(self, client):
+        """测试未知字段"""
+        response = client.get("/api/v1/prompts?fields=name,password")
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,141 @@
+"""
+接口响应缓存测试
+"""
+import asyncio
+import pytest
+from fastapi import status
+from app.response_cache import MemoryCacheBackend, response_cache
+
+@pytest.fixture
+def cache(monkeypatch):
+    """启用进程内响应缓存"""
+    monkeypatch.setattr(response_cache, "backend", MemoryCacheBackend(100, 1 << 20))
+    asyncio.run(response_cache.clear())
+    yield response_cache
+    asyncio.run(response_cache.clear())
+
+class TestResponseCache:
+    """列表、搜索、分组、详情接口的响应缓存测试"""
+    
+    def _get_twice(self, client, url):
+        first = client.get(url)
+        second = client.get(url)
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+        assert second.json() == first.json()
+        assert second.headers["etag"] == first.headers["etag"]
+        return first, second
+    
+    def test_hit_skips_queries(self, client, cache, sample_prompt, query_counter):
+        """测试命中时不执行列表查询"""
+        uncached = client.get("/api/v1/prompts?page_size=5").json()
+        client.get("/api/v1/prompts?page_size=5")
+        query_counter.clear()
+        response = client.get("/api/v1/prompts?page_size=5")
+        assert response.headers["x-cache"] == "HIT"
+        assert response.json() == uncached
+        assert query_counter == []
+    
+    def test_endpoints(self, client, cache, sample_prompt, monkeypatch):
+        """测试各接口缓存前后内容一致，分组接口保留未分组数量响应头"""
+        from app.config import settings
+        
+        self._get_twice(client, "/api/v1/search?keyword=测试")
+        self._get_twice(client, f"/api/v1/prompts/{sample_prompt.id}")
+        first, second = self._get_twice(client, "/api/v1/groups")
+        assert second.headers["x-ungrouped-count"] == first.headers["x-ungrouped-count"]
+        
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+        self._get_twice(client, "/api/v1/prompts?fields=name,tags")
+    
+    def test_write_invalidates(self, client, cache, db_session, sample_prompt, sample_group):
+        """测试接口或其他连接提交写入后不再命中"""
+        self._get_twice(client, "/api/v1/prompts")
+        client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"tag_ids": []})
+        response = client.get("/api/v1/prompts")
+        assert response.headers["x-cache"] == "MISS"
+        assert response.json()["items"][0]["tags"] == []
+        
+        self._get_twice(client, "/api/v1/groups")
+        sample_group.description = "其他连接修改"
+        db_session.commit()
+        response = client.get("/api/v1/groups")
+        assert response.headers["x-cache"] == "MISS"
+        assert response.json()[0]["description"] == "其他连接修改"
+    
+    def test_detail_pending_images_not_cached(self, client, cache, db_session, sample_prompt):
+        """测试效果图待补生成元数据和变体时详情不缓存"""
+        import uuid
+        from app.models import PromptImage
+        
+        db_session.add(PromptImage(
+            prompt_id=sample_prompt.id, file_path=f"uploads/images/{uuid.uuid4().hex}.png",
+            file_name="pending.png", file_size=1, file_type="image/png"
+        ))
+        db_session.commit()
+        response = client.get(f"/api/v1/prompts/{sample_prompt.id}")
+        assert response.status_code == status.HTTP_200_OK
+        assert "x-cache" not in response.headers
+        assert cache.stats()["endpoints"]["prompt"]["stores"] == 0
+    
+    def test_oversized_not_cached(self, client, cache, sample_prompt, monkeypatch):
+        """测试超过大小限制的响应不缓存"""
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "RESPONSE_CACHE_MAX_ITEM_BYTES", 10)
+        for _ in range(2):
+            assert client.get("/api/v1/groups").headers["x-cache"] == "MISS"
+        assert cache.stats()["endpoints"]["groups"]["oversized"] == 2
+    
+    def test_backend_errors_are_misses(self, client, cache, sample_prompt, monkeypatch):
+        """测试缓存后端不可用时正常返回"""
+        async def broken(*args):
+            raise ConnectionError("unavailable")
+        
+        monkeypatch.setattr(cache.backend, "get", broken)
+        monkeypatch.setattr(cache.backend, "set", broken)
+        response = client.get("/api/v1/groups")
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 1
+        assert cache.stats()["endpoints"]["groups"]["errors"] == 2
+    
+    def test_stats(self, client, cache, sample_prompt):
+        """测试命中统计"""
+        self._get_twice(client, "/api/v1/groups")
+        stats = client.get("/cache/stats").json()
+        assert stats["endpoints"]["groups"] == {"hits": 1, "misses": 1, "stores": 1, "oversized": 0, "errors": 0}
+        assert stats["hit_rate"] == 0.5
+
+class TestMemoryCacheBackend:
+    """进程内缓存后端测试"""
+    
+    def test_lru_limits(self):
+        """测试按条目数和总字节数淘汰最久未使用的条目"""
+        backend = MemoryCacheBackend(max_entries=2, max_bytes=10)
+        
+        async def run():
+            await backend.set("a", b"1", 60)
+            await backend.set("b", b"2", 60)
+            assert await backend.get("a") == b"1"
+            await backend.set("c", b"3", 60)
+            assert await backend.get("b") is None
+            await backend.set("d", b"0123456789", 60)
+            return [await backend.get(key) for key in ("a", "c", "d")]
+        
+        assert asyncio.run(run()) == [None, None, b"0123456789"]
+    
+    def test_ttl(self, monkeypatch):
+        """测试条目过期"""
+        from app import response_cache as module
+        
+        backend = MemoryCacheBackend(max_entries=10, max_bytes=100)
+        now = [1000.0]
+        monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+        
+        async def run():
+            await backend.set("a", b"1", 5)
+            before = await backend.get("a")
+            now[0] += 5
+            return before, await backend.get("a")
+        
+        assert asyncio.run(run()) == (b"1", None)
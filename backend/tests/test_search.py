@@ -58,3 +58,50 @@ class TestSearch:
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert len(data["items"]) <= 3
+    
+    def test_search_total_exceeds_limit(self, client, db_session):
+        """测试总数统计不受返回数量限制影响"""
+        from app.models import Prompt
+        
+        for i in range(5):
+            db_session.add(Prompt(name=f"总数{i}", content="内容"))
+        db_session.commit()
+        
+        response = client.get("/api/v1/search?keyword=总数&limit=2")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data["items"]) == 2
+        assert data["total"] == 5
+    
+    def test_search_by_tag_name(self, client, sample_prompt, sample_tag):
+        """测试按标签名称搜索"""
+        response = client.get(f"/api/v1/search?keyword={sample_tag.name}")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        ids = [item["id"] for item in data["items"]]
+        assert ids.count(sample_prompt.id) == 1
+        assert data["total"] == len(ids)
+    
+    def test_search_excludes_deleted(self, client, db_session, sample_prompt):
+        """测试不返回已删除的Prompt"""
+        from datetime import datetime
+        
+        sample_prompt.deleted_at = datetime.utcnow()
+        db_session.commit()
+        
+        response = client.get(f"/api/v1/search?keyword={sample_prompt.name}")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["total"] == 0
+    
+    def test_search_indexes_skipped_without_postgres(self):
+        """测试非PostgreSQL数据库退化为ILIKE匹配"""
+        from sqlalchemy import create_engine
+        from app import fulltext
+        
+        saved = dict(fulltext.capabilities)
+        engine = create_engine("sqlite://")
+        try:
+            assert fulltext.ensure_search_indexes(engine) == {"fts": False, "trgm": False}
+        finally:
+            engine.dispose()
+            fulltext.capabilities.update(saved)
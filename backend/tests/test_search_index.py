@@ -0,0 +1,157 @@
+"""
+进程内搜索索引测试
+"""
+import pytest
+from fastapi import status
+from app.search_index import search_index, tokenize
+
+@pytest.fixture
+def index(db_session):
+    """启用进程内索引"""
+    search_index.rebuild(db_session)
+    yield search_index
+    search_index.ready = False
+    search_index._clear()
+
+class TestTokenize:
+    """切词测试"""
+    
+    def test_cjk_bigrams(self):
+        """测试中文按一元和二元切分"""
+        assert tokenize("测试内容") == {"测", "试", "内", "容", "测试", "试内", "内容"}
+    
+    def test_latin_words(self):
+        """测试拉丁文本按单词切分并转小写"""
+        assert tokenize("Hello, World_2") == {"hello", "world_2"}
+    
+    def test_mixed(self):
+        """测试中英文混排"""
+        assert tokenize("AI绘画") == {"ai", "绘", "画", "绘画"}
+
+class TestSearchIndex:
+    """索引查询与增量更新测试"""
+    
+    def test_search_from_index(self, client, sample_prompt, index):
+        """测试通过索引搜索"""
+        response = client.get("/api/v1/search?keyword=测试")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [item["id"] for item in data["items"]] == [sample_prompt.id]
+        assert data["total"] == 1
+    
+    def test_latin_prefix_match(self, client, db_session, index):
+        """测试拉丁单词前缀匹配"""
+        from app.models import Prompt
+        
+        db_session.add(Prompt(name="Portrait", content="cinematic lighting"))
+        db_session.commit()
+        
+        assert len(index.search("cinema")) == 1
+        assert index.search("light cine") == index.search("cinematic")
+        assert index.search("lamp") == []
+    
+    def test_tag_name_match(self, sample_prompt, sample_tag, index):
+        """测试标签名称匹配"""
+        assert index.search(sample_tag.name) == [sample_prompt.id]
+        assert index.search(sample_tag.name, include_tags=False) == []
+    
+    def test_incremental_create_update_delete(self, client, index):
+        """测试通过API写入后索引增量更新"""
+        response = client.post("/api/v1/prompts", json={
+            "name": "风景",
+            "content": "日落时分的海边"
+        })
+        prompt_id = response.json()["id"]
+        assert index.search("海边") == [prompt_id]
+        
+        client.put(f"/api/v1/prompts/{prompt_id}", json={"content": "雪山"})
+        assert index.search("海边") == []
+        assert index.search("雪山") == [prompt_id]
+        
+        client.delete(f"/api/v1/prompts/{prompt_id}")
+        assert index.search("雪山") == []
+    
+    def test_bulk_operations_refresh_index(self, client, sample_prompt, index):
+        """测试批量操作和批量导入后索引更新"""
+        ids = [sample_prompt.id]
+        response = client.post("/api/v1/tags", json={"name": "批量新标签"})
+        tag_id = response.json()["id"]
+        client.post("/api/v1/prompts/bulk", json={"action": "add_tags", "ids": ids, "tag_ids": [tag_id]})
+        assert index.search("批量新标签") == ids
+        
+        client.post("/api/v1/prompts/bulk", json={"action": "delete", "ids": ids})
+        assert index.search("测试") == []
+        client.post("/api/v1/prompts/bulk", json={"action": "restore", "ids": ids})
+        assert index.search("测试") == ids
+        
+        client.post("/api/v1/prompts/import", content='{"name": "导入", "content": "山谷", "tags": ["导入标签"]}'.encode())
+        assert len(index.search("山谷")) == 1
+        assert index.search("导入标签") == index.search("山谷")
+    
+    def test_rollback_not_applied(self, db_session, index):
+        """测试回滚的修改不进入索引"""
+        from app.models import Prompt
+        
+        db_session.add(Prompt(name="回滚", content="不会提交"))
+        db_session.flush()
+        db_session.rollback()
+        assert index.search("回滚") == []
+    
+    def test_list_keyword_uses_index(self, client, sample_prompt, index):
+        """测试列表接口的关键词筛选"""
+        response = client.get("/api/v1/prompts?keyword=测试")
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in response.json()["items"]] == [sample_prompt.id]
+    
+    def test_list_keyword_keeps_substring_semantics(self, client, db_session, index, query_counter, monkeypatch):
+        """测试列表接口按索引缩小范围后仍按子串匹配，候选过多或从单词中间匹配时只用数据库条件"""
+        from app.config import settings
+        from app.models import Prompt
+        
+        db_session.add_all([
+            Prompt(name="山 谷", content="内容"),
+            Prompt(name="谷山", content="内容"),
+            Prompt(name="Prompt", content="内容"),
+        ])
+        db_session.commit()
+        index.rebuild(db_session)
+        
+        def names(keyword):
+            response = client.get("/api/v1/prompts", params={"keyword": keyword})
+            assert response.status_code == status.HTTP_200_OK
+            return [item["name"] for item in response.json()["items"]]
+        
+        query_counter.clear()
+        assert names("山 谷") == ["山 谷"]
+        assert any("prompts.id IN" in sql for sql in query_counter)
+        assert names("rompt") == ["Prompt"]
+        
+        monkeypatch.setattr(settings, "SEARCH_INDEX_MAX_IDS", 1)
+        query_counter.clear()
+        assert names("山") == ["谷山", "山 谷"]
+        assert not any("prompts.id IN" in sql for sql in query_counter)
+    
+    def test_search_matches_list_semantics(self, client, db_session, index):
+        """测试启用索引时搜索接口与列表接口的关键词匹配一致（子串匹配、排除已删除）"""
+        from datetime import datetime
+        from app.models import Prompt
+        
+        db_session.add_all([
+            Prompt(name="山 谷", content="内容"),
+            Prompt(name="谷山", content="内容"),
+            Prompt(name="abc token", content="内容"),
+            Prompt(name="已删除的山 谷", content="内容", deleted_at=datetime.utcnow()),
+        ])
+        db_session.commit()
+        index.rebuild(db_session)
+        
+        for keyword in ("山 谷", "bc", "谷", "tok"):
+            search = client.get("/api/v1/search", params={"keyword": keyword}).json()
+            listed = client.get("/api/v1/prompts", params={"keyword": keyword}).json()
+            assert sorted(item["name"] for item in search["items"]) == sorted(item["name"] for item in listed["items"])
+            assert search["total"] == listed["total"]
+        assert [item["name"] for item in client.get("/api/v1/search?keyword=山 谷").json()["items"]] == ["山 谷"]
+    
+    def test_untokenizable_keyword_falls_back(self, index):
+        """测试无法切词的关键词退回数据库查询"""
+        assert index.search("%%") is None
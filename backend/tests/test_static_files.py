@@ -0,0 +1,92 @@
+"""
+上传文件静态访问测试
+"""
+import io
+import pytest
+from fastapi import status
+from app.static_files import parse_range, safe_relative_path
+
+@pytest.fixture
+def uploaded(client, sample_prompt):
+    """上传一张图片，返回其访问路径和内容"""
+    payload = bytes(range(256)) * 4
+    files = {"file": ("static.png", io.BytesIO(payload), "image/png")}
+    data = client.post(f"/api/v1/images/{sample_prompt.id}", files=files).json()
+    return "/" + data["file_path"], payload
+
+class TestUploadFiles:
+    """静态文件缓存头、条件请求和范围请求测试"""
+    
+    def test_immutable_headers(self, client, uploaded):
+        """测试返回长期缓存头和强ETag"""
+        url, payload = uploaded
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == payload
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["etag"].startswith('"') and not response.headers["etag"].startswith("W/")
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["accept-ranges"] == "bytes"
+    
+    def test_conditional_get(self, client, uploaded):
+        """测试If-None-Match和If-Modified-Since返回304"""
+        url, _ = uploaded
+        first = client.get(url)
+        etag = first.headers["etag"]
+        
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert client.get(url, headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+        assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+        
+        last_modified = first.headers["last-modified"]
+        assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+        assert client.get(url, headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+    
+    def test_range_requests(self, client, uploaded):
+        """测试字节范围请求"""
+        url, payload = uploaded
+        size = len(payload)
+        
+        response = client.get(url, headers={"Range": "bytes=10-19"})
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.content == payload[10:20]
+        assert response.headers["content-range"] == f"bytes 10-19/{size}"
+        
+        assert client.get(url, headers={"Range": "bytes=-5"}).content == payload[-5:]
+        assert client.get(url, headers={"Range": "bytes=1000-"}).content == payload[1000:]
+        
+        response = client.get(url, headers={"Range": f"bytes={size}-"})
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response.headers["content-range"] == f"bytes */{size}"
+        
+        # 多个范围和If-Range不匹配时返回完整内容
+        assert client.get(url, headers={"Range": "bytes=0-1,5-6"}).content == payload
+        assert client.get(url, headers={"Range": "bytes=0-1", "If-Range": '"stale"'}).status_code == 200
+    
+    def test_head_request(self, client, uploaded):
+        """测试HEAD请求只返回头部"""
+        url, payload = uploaded
+        response = client.head(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-length"] == str(len(payload))
+        assert response.content == b""
+    
+    def test_rejects_path_traversal(self, client):
+        """测试拒绝路径穿越和非法路径"""
+        assert client.get("/uploads/../backend/main.py").status_code == status.HTTP_404_NOT_FOUND
+        assert client.get("/uploads/images/%2e%2e/%2e%2e/backend/main.py").status_code == status.HTTP_404_NOT_FOUND
+        assert client.get("/uploads/images/missing.png").status_code == status.HTTP_404_NOT_FOUND
+        assert client.get("/uploads/images").status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_path_and_range_parsing(self):
+        """测试路径校验和Range解析"""
+        assert safe_relative_path("/images/ab/abc.png") == "images/ab/abc.png"
+        for bad in ["", "/", "/images/../x", "/images//x", "/images/./x", "/images\\x", "/images/x\x00"]:
+            assert safe_relative_path(bad) is None
+        assert parse_range("bytes=0-0", 10) == (0, 0)
+        assert parse_range("bytes=5-100", 10) == (5, 9)
+        assert parse_range("items=0-1", 10) is None
+        with pytest.raises(ValueError):
+            parse_range("bytes=3-2", 10)
@@ -0,0 +1,147 @@
+"""
+分组、标签快照测试
+"""
+import dataclasses
+from fastapi import status
+from app.taxonomy import taxonomy
+
+def _simulate_unseen_write():
+    """把快照标记为最新，模拟其他进程的写入（本进程版本号未变化）"""
+    taxonomy._snapshot = dataclasses.replace(taxonomy._snapshot, key=taxonomy._key())
+
+class TestTaxonomyCache:
+    """分组、标签快照测试"""
+    
+    def test_tags_list_without_queries(self, client, sample_tag, query_counter):
+        """测试快照有效时标签列表不查询数据库，ETag 随标签变化"""
+        first = client.get("/api/v1/tags")
+        query_counter.clear()
+        second = client.get("/api/v1/tags", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == status.HTTP_304_NOT_MODIFIED
+        assert query_counter == []
+        
+        client.post("/api/v1/tags", json={"name": "新标签"})
+        response = client.get("/api/v1/tags", headers={"If-None-Match": first.headers["etag"]})
+        assert response.status_code == status.HTTP_200_OK
+        assert [tag["name"] for tag in response.json()] == [sample_tag.name, "新标签"]
+        assert set(response.json()[0]) == {"id", "name", "color", "created_at"}
+    
+    def test_create_prompt_validation_without_queries(self, client, sample_group, sample_tag, query_counter):
+        """测试创建Prompt时分组、标签的校验不查询数据库"""
+        client.get("/api/v1/tags")
+        query_counter.clear()
+        response = client.post("/api/v1/prompts", json={
+            "name": "快照校验", "content": "内容", "group_id": sample_group.id, "tag_ids": [sample_tag.id, sample_tag.id]
+        })
+        assert response.status_code == status.HTTP_200_OK
+        assert [tag["id"] for tag in response.json()["tags"]] == [sample_tag.id]
+        assert not [sql for sql in query_counter if "FROM prompt_groups" in sql and "prompts" not in sql]
+        assert not [sql for sql in query_counter if "FROM prompt_tags" in sql and "prompts" not in sql]
+    
+    def test_other_session_write_refreshes(self, client, db_session, sample_tag):
+        """测试本进程其他连接提交的写入在下次读取时生效"""
+        client.get("/api/v1/tags")
+        sample_tag.color = "#000000"
+        db_session.commit()
+        assert client.get("/api/v1/tags").json()[0]["color"] == "#000000"
+    
+    def test_stale_snapshot_does_not_reject(self, client, db_session, sample_group):
+        """测试快照过期时，分组不存在、名称已存在的结果重新加载后确认"""
+        from app.models import PromptGroup
+        
+        client.get("/api/v1/tags")
+        group = PromptGroup(name="其他进程创建")
+        db_session.add(group)
+        db_session.delete(sample_group)
+        db_session.commit()
+        _simulate_unseen_write()
+        
+        response = client.post("/api/v1/prompts", json={"name": "新分组", "content": "内容", "group_id": group.id})
+        assert response.status_code == status.HTTP_200_OK
+        _simulate_unseen_write()
+        assert client.post("/api/v1/groups", json={"name": "测试分组"}).status_code == status.HTTP_200_OK
+        assert client.post("/api/v1/groups", json={"name": "测试分组"}).status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_invalidate_and_ttl(self, client, db_session, sample_group, monkeypatch):
+        """测试收到刷新通知或超过 TAXONOMY_CACHE_TTL 后重新加载"""
+        from app.config import settings
+        from app.models import PromptGroup
+        
+        def create_prompt():
+            response = client.post("/api/v1/prompts", json={"name": "读取快照", "content": "内容", "group_id": sample_group.id})
+            assert response.status_code == status.HTTP_200_OK
+            return set(taxonomy._snapshot.group_names)
+        
+        create_prompt()
+        db_session.add(PromptGroup(name="其他进程创建"))
+        db_session.commit()
+        _simulate_unseen_write()
+        assert "其他进程创建" not in create_prompt()
+        taxonomy.invalidate()
+        assert "其他进程创建" in create_prompt()
+        
+        db_session.add(PromptGroup(name="再次创建"))
+        db_session.commit()
+        _simulate_unseen_write()
+        monkeypatch.setattr(settings, "TAXONOMY_CACHE_TTL", 0)
+        assert "再次创建" in create_prompt()
+    
+    def test_tags_list_checks_db_version(self, client, db_session, sample_tag):
+        """测试标签列表按 table_versions 核对，其他进程的写入立即生效，ETag 与进程无关"""
+        first = client.get("/api/v1/tags")
+        sample_tag.name = "其他进程修改"
+        db_session.commit()
+        _simulate_unseen_write()
+        response = client.get("/api/v1/tags", headers={"If-None-Match": first.headers["etag"]})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]["name"] == "其他进程修改"
+        
+        taxonomy.invalidate()
+        assert client.get("/api/v1/tags", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    
+    def test_stale_name_conflict_returns_400(self, client, db_session, sample_tag):
+        """测试快照过期时名称冲突由唯一约束捕获，返回与校验相同的 400"""
+        from app.models import PromptGroup, PromptTag
+        
+        client.get("/api/v1/tags")
+        db_session.add_all([PromptGroup(name="其他进程分组"), PromptTag(name="其他进程标签")])
+        db_session.commit()
+        _simulate_unseen_write()
+        
+        response = client.post("/api/v1/groups", json={"name": "其他进程分组"})
+        assert (response.status_code, response.json()["detail"]) == (400, "分组名称已存在")
+        _simulate_unseen_write()
+        response = client.put(f"/api/v1/tags/{sample_tag.id}", json={"name": "其他进程标签"})
+        assert (response.status_code, response.json()["detail"]) == (400, "标签名称已存在")
+        assert "其他进程标签" in taxonomy._snapshot.tag_names
+    
+    def test_stale_reference_returns_400(self, client, db_session, sample_group, sample_prompt):
+        """测试快照过期时引用已删除的分组由外键约束捕获，返回与校验相同的 400"""
+        from sqlalchemy import event
+        from tests.conftest import async_engine
+        
+        if async_engine.dialect.name == "sqlite":
+            # SQLite 默认不检查外键
+            def enable_foreign_keys(dbapi_connection, connection_record):
+                dbapi_connection.execute("PRAGMA foreign_keys=ON")
+            event.listen(async_engine.sync_engine, "connect", enable_foreign_keys)
+        try:
+            client.get("/api/v1/tags")
+            stale = taxonomy._snapshot
+            sample_prompt.group_id = None
+            db_session.delete(sample_group)
+            db_session.commit()
+            _simulate_unseen_write()
+            
+            response = client.post("/api/v1/prompts", json={"name": "新", "content": "内容", "group_id": sample_group.id})
+            assert (response.status_code, response.json()["detail"]) == (400, "分组不存在")
+            assert sample_group.id not in taxonomy._snapshot.groups
+            taxonomy._snapshot = stale
+            _simulate_unseen_write()
+            response = client.post("/api/v1/prompts/bulk", json={
+                "action": "move", "ids": [sample_prompt.id], "group_id": sample_group.id
+            })
+            assert (response.status_code, response.json()["detail"]) == (400, "分组不存在")
+        finally:
+            if async_engine.dialect.name == "sqlite":
+                event.remove(async_engine.sync_engine, "connect", enable_foreign_keys)
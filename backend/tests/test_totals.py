@@ -0,0 +1,90 @@
+"""
+列表总数计算方式测试
+"""
+import pytest
+from fastapi import status
+from app.totals import count_cache
+
+@pytest.fixture(autouse=True)
+def clear_count_cache():
+    count_cache.clear()
+    yield
+    count_cache.clear()
+
+class TestTotals:
+    """总数计算测试"""
+    
+    def test_exact_by_default(self, client, make_prompts):
+        """测试默认精确计数"""
+        make_prompts(3, prefix="总数")
+        data = client.get("/api/v1/prompts?page_size=2").json()
+        assert data["total"] == 3
+        assert data["total_kind"] == "exact"
+        assert data["has_more"] is True
+    
+    def test_none_mode(self, client, make_prompts, query_counter):
+        """测试不计算总数，仅返回has_more"""
+        make_prompts(3, prefix="总数")
+        query_counter.clear()
+        data = client.get("/api/v1/prompts?page_size=3&total_mode=none").json()
+        assert data["total"] is None
+        assert data["total_kind"] == "none"
+        assert data["has_more"] is False
+        assert not any("count(" in statement.lower() for statement in query_counter)
+    
+    def test_cached_mode_invalidated_by_write(self, client, make_prompts):
+        """测试缓存总数在写入提交后失效"""
+        make_prompts(2, prefix="总数")
+        first = client.get("/api/v1/prompts?total_mode=cached").json()
+        assert (first["total"], first["total_kind"]) == (2, "exact")
+        second = client.get("/api/v1/prompts?total_mode=cached").json()
+        assert (second["total"], second["total_kind"]) == (2, "cached")
+        
+        client.post("/api/v1/prompts", json={"name": "新增", "content": "内容"})
+        third = client.get("/api/v1/prompts?total_mode=cached").json()
+        assert (third["total"], third["total_kind"]) == (3, "exact")
+    
+    def test_cached_mode_invalidated_by_other_process(self, client, make_prompts, monkeypatch):
+        """测试其他进程（本进程版本号不变）提交的写入同样使缓存总数失效"""
+        from app import versions
+        
+        make_prompts(2, prefix="总数")
+        client.get("/api/v1/prompts?total_mode=cached")
+        monkeypatch.setattr(versions, "bump", lambda *tables: None)
+        make_prompts(1, prefix="其他进程")
+        data = client.get("/api/v1/prompts?total_mode=cached").json()
+        assert (data["total"], data["total_kind"]) == (3, "exact")
+    
+    def test_cached_mode_invalidated_by_tag_delete(self, client, sample_prompt, sample_tag):
+        """测试删除标签后按标签筛选的缓存总数失效"""
+        url = f"/api/v1/prompts?total_mode=cached&tag_id={sample_tag.id}"
+        assert client.get(url).json()["total"] == 1
+        assert client.get(url).json()["total_kind"] == "cached"
+        client.delete(f"/api/v1/tags/{sample_tag.id}")
+        assert client.get(url).json()["total"] == 0
+    
+    def test_cached_mode_keyed_by_filters(self, client, make_prompts, sample_prompt, sample_group):
+        """测试缓存按筛选条件区分"""
+        make_prompts(2, prefix="总数")
+        assert client.get("/api/v1/prompts?total_mode=cached").json()["total"] == 3
+        assert client.get(f"/api/v1/prompts?total_mode=cached&group_id={sample_group.id}").json()["total"] == 1
+    
+    def test_estimated_falls_back_without_postgres(self, client, make_prompts):
+        """测试非PostgreSQL数据库估算退回缓存计数"""
+        make_prompts(2, prefix="总数")
+        data = client.get("/api/v1/prompts?total_mode=estimated").json()
+        assert data["total"] == 2
+        assert data["total_kind"] in ("exact", "cached")
+    
+    def test_search_total_modes(self, client, make_prompts):
+        """测试搜索接口的总数计算方式"""
+        make_prompts(3, prefix="总数")
+        data = client.get("/api/v1/search?keyword=总数&limit=2&total_mode=none").json()
+        assert (data["total"], data["has_more"]) == (None, True)
+        data = client.get("/api/v1/search?keyword=总数&limit=2&total_mode=cached").json()
+        assert (data["total"], data["has_more"]) == (3, True)
+    
+    def test_invalid_mode(self, client):
+        """测试无效的总数计算方式"""
+        response = client.get("/api/v1/prompts?total_mode=fast")
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,186 @@
+"""
+使用次数写后回写测试
+"""
+import asyncio
+import pytest
+from fastapi import status
+from app.models import Prompt
+from app.usage_counter import RedisCounterStore, usage_counter, flush_statement
+
+def _stored_count(db_session, prompt_id):
+    db_session.expire_all()
+    return db_session.get(Prompt, prompt_id).usage_count
+
+class FakeRedis:
+    """RedisCounterStore 用到的命令的内存实现，每个命令都让出事件循环以便并发交错"""
+    
+    def __init__(self):
+        self.data = {}
+    
+    async def hincrby(self, key, field, amount):
+        await asyncio.sleep(0)
+        hash_ = self.data.setdefault(key, {})
+        hash_[str(field).encode()] = int(hash_.get(str(field).encode(), 0)) + amount
+    
+    async def set(self, key, value, nx=False, px=None):
+        await asyncio.sleep(0)
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+    
+    async def exists(self, key):
+        await asyncio.sleep(0)
+        return int(key in self.data)
+    
+    async def rename(self, src, dst):
+        from redis.exceptions import ResponseError
+        
+        await asyncio.sleep(0)
+        if src not in self.data:
+            raise ResponseError("no such key")
+        self.data[dst] = self.data.pop(src)
+    
+    async def hgetall(self, key):
+        await asyncio.sleep(0)
+        return dict(self.data.get(key, {}))
+    
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+    
+    async def eval(self, script, numkeys, *args):
+        # 与 ACK_SCRIPT / RELEASE_SCRIPT 的语义一致：仍持有锁时删除其余的键和锁
+        await asyncio.sleep(0)
+        keys, (token,) = args[:numkeys], args[numkeys:]
+        if self.data.get(keys[0]) != token:
+            return 0
+        await self.delete(*keys[1:], keys[0])
+        return 1
+
+class TestRedisCounterStore:
+    """Redis 增量存储的并发回写测试"""
+    
+    def test_concurrent_drains(self):
+        """测试两个 worker 同时回写时增量只被取出一次"""
+        redis = FakeRedis()
+        first, second = RedisCounterStore(redis), RedisCounterStore(redis)
+        
+        async def run():
+            await first.incr(1, 3)
+            await second.incr(2, 1)
+            drained = await asyncio.gather(first.drain(), second.drain())
+            assert sorted(drained, key=len) == [{}, {1: 3, 2: 1}]
+            owner = first if drained[0] else second
+            other = second if owner is first else first
+            # 回写期间的新增量留在 pending，确认前其他 worker 不会重复取出 inflight
+            await other.incr(1, 1)
+            assert await other.drain() == {}
+            await other.ack()
+            await owner.ack()
+            return await asyncio.gather(first.drain(), second.drain())
+        
+        assert sorted(asyncio.run(run()), key=len) == [{}, {1: 1}]
+    
+    def test_lock_expiry_hands_over_inflight(self):
+        """测试持锁的 worker 退出后，锁过期时其他 worker 接手遗留的增量"""
+        redis = FakeRedis()
+        crashed, other = RedisCounterStore(redis), RedisCounterStore(redis)
+        
+        async def run():
+            await crashed.incr(1, 2)
+            assert await crashed.drain() == {1: 2}
+            await crashed.incr(1, 5)
+            await redis.delete(RedisCounterStore.LOCK_KEY)  # 锁过期
+            assert await other.drain() == {1: 2}
+            await crashed.ack()  # 已不持有锁，不删除其他 worker 的 inflight
+            assert await other.drain() == {}
+            await other.ack()
+            return await other.drain()
+        
+        assert asyncio.run(run()) == {1: 5}
+
+class TestUsageCounter:
+    """使用次数计数测试"""
+    
+    def test_copies_are_buffered(self, client, db_session, sample_prompt):
+        """测试复制只累加增量，读取时叠加未回写的次数"""
+        for _ in range(5):
+            assert client.post(f"/api/v1/prompts/{sample_prompt.id}/copy").status_code == status.HTTP_200_OK
+        
+        assert _stored_count(db_session, sample_prompt.id) == 0
+        assert client.get(f"/api/v1/prompts/{sample_prompt.id}").json()["usage_count"] == 5
+        items = client.get("/api/v1/prompts").json()["items"]
+        assert items[0]["usage_count"] == 5
+    
+    def test_flush_writes_single_update(self, client, db_session, sample_prompt, query_counter):
+        """测试回写使用一条UPDATE语句并清空增量"""
+        other = Prompt(name="另一个", content="内容")
+        db_session.add(other)
+        db_session.commit()
+        for prompt_id in (sample_prompt.id, sample_prompt.id, other.id):
+            client.post(f"/api/v1/prompts/{prompt_id}/copy")
+        
+        query_counter.clear()
+        assert asyncio.run(usage_counter.flush()) == 2
+        updates = [sql for sql in query_counter if sql.lstrip().upper().startswith("UPDATE")]
+        assert len(updates) == 1
+        
+        assert _stored_count(db_session, sample_prompt.id) == 2
+        assert _stored_count(db_session, other.id) == 1
+        assert asyncio.run(usage_counter.pending([sample_prompt.id, other.id])) == {}
+        assert client.get(f"/api/v1/prompts/{sample_prompt.id}").json()["usage_count"] == 2
+    
+    def test_usage_writes_keep_versions(self, client, db_session, sample_prompt, monkeypatch):
+        """测试回写和直接更新使用次数不递增版本号，ETag 不变；其他写入仍使 ETag 变化"""
+        from app import versions
+        
+        def load():
+            return versions.get_versions("prompts"), db_session.execute(versions.table_versions.select()).all()
+        
+        etag = client.get("/api/v1/prompts").headers["etag"]
+        before = load()
+        client.post(f"/api/v1/prompts/{sample_prompt.id}/copy")
+        assert asyncio.run(usage_counter.flush()) == 1
+        monkeypatch.setattr(usage_counter, "store", None)
+        client.post(f"/api/v1/prompts/{sample_prompt.id}/copy")
+        assert _stored_count(db_session, sample_prompt.id) == 2
+        assert load() == before
+        
+        response = client.get("/api/v1/prompts", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        client.put(f"/api/v1/prompts/{sample_prompt.id}", json={"description": "新描述"})
+        response = client.get("/api/v1/prompts", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["items"][0]["usage_count"] == 2
+    
+    def test_flush_on_shutdown(self, client, db_session, sample_prompt):
+        """测试应用关闭时回写剩余增量"""
+        client.post(f"/api/v1/prompts/{sample_prompt.id}/copy")
+        client.__exit__(None, None, None)
+        assert _stored_count(db_session, sample_prompt.id) == 1
+    
+    def test_direct_mode(self, client, db_session, sample_prompt, monkeypatch):
+        """测试不缓冲时直接原子更新"""
+        monkeypatch.setattr(usage_counter, "store", None)
+        response = client.post(f"/api/v1/prompts/{sample_prompt.id}/copy")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"]["content"] == sample_prompt.content
+        assert _stored_count(db_session, sample_prompt.id) == 1
+        
+        assert client.post("/api/v1/prompts/99999/copy").status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_deleted_prompt_not_counted(self, client, sample_prompt):
+        """测试已删除的Prompt不计数"""
+        client.delete(f"/api/v1/prompts/{sample_prompt.id}")
+        assert client.post(f"/api/v1/prompts/{sample_prompt.id}/copy").status_code == status.HTTP_404_NOT_FOUND
+        assert asyncio.run(usage_counter.pending([sample_prompt.id])) == {}
+    
+    def test_flush_statement_dialects(self):
+        """测试回写语句在不同数据库上的形式"""
+        from sqlalchemy.dialects import postgresql, sqlite
+        
+        pg_sql = str(flush_statement("postgresql", {1: 2, 3: 4}).compile(dialect=postgresql.dialect()))
+        assert "FROM (VALUES" in pg_sql
+        sqlite_sql = str(flush_statement("sqlite", {1: 2, 3: 4}).compile(dialect=sqlite.dialect()))
+        assert "CASE" in sqlite_sql
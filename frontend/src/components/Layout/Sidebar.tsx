@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { usePromptStore } from '../../store/promptStore'
-import { groupApi, promptApi, PromptGroup } from '../../services/api'
+import { groupApi, PromptGroup } from '../../services/api'
 import './Sidebar.css'
 
 const Sidebar: React.FC = () => {
@@ -14,21 +14,18 @@ const Sidebar: React.FC = () => {
 
   useEffect(() => {
     loadGroups()
-    loadUngroupedCount()
     fetchPrompts()
   }, [])
 
   useEffect(() => {
     // 当分组切换时，重新加载分组列表和未分组数量
     loadGroups()
-    loadUngroupedCount()
   }, [selectedGroup])
 
   // 监听prompt变化事件，当prompt被创建、删除或更新时，重新加载分组数量
   useEffect(() => {
     const handlePromptChange = () => {
       loadGroups()
-      loadUngroupedCount()
     }
 
     window.addEventListener('prompt-changed', handlePromptChange)
@@ -39,28 +36,15 @@ const Sidebar: React.FC = () => {
 
   const loadGroups = async () => {
     try {
-      const data = await groupApi.getGroups()
-      setGroups(data)
+      // 分组列表的响应头同时带回未分组数量
+      const { groups, ungroupedCount } = await groupApi.getGroupsWithUngroupedCount()
+      setGroups(groups)
+      setUngroupedCount(ungroupedCount)
     } catch (error) {
       console.error('加载分组失败:', error)
     }
   }
 
-  const loadUngroupedCount = async () => {
-    try {
-      // 直接调用API获取未分组的prompt总数（不使用关键词搜索，确保获取准确数量）
-      const response = await promptApi.getPrompts({ 
-        group_id: 0, 
-        page_size: 1, 
-        keyword: undefined,
-        tag_id: undefined
-      })
-      setUngroupedCount(response.total)
-    } catch (error) {
-      console.error('加载未分组数量失败:', error)
-    }
-  }
-
   const handleCreateGroup = async () => {
     if (!newGroupName.trim()) return
     try {
@@ -68,7 +52,6 @@ const Sidebar: React.FC = () => {
       setNewGroupName('')
       setShowCreateGroup(false)
       await loadGroups()
-      await loadUngroupedCount()
     } catch (error) {
       console.error('创建分组失败:', error)
     }
@@ -1,12 +1,10 @@
 import React, { useEffect, useState } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
 import { usePromptStore } from '../../store/promptStore'
-import { groupApi, tagApi, imageApi, promptApi, PromptGroup, PromptTag } from '../../services/api'
+import { groupApi, tagApi, imageApi, promptApi, getImageUrl, PromptGroup, PromptTag } from '../../services/api'
 import { modalManager } from '../../components/Modal'
 import './PromptDetail.css'
 
-const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'
-
 const PromptDetail: React.FC = () => {
   const { id } = useParams<{ id: string }>()
   const navigate = useNavigate()
@@ -371,7 +369,7 @@ const PromptDetail: React.FC = () => {
                   <div className="prompt-detail-pending-images">
                     {currentPrompt.images.map((image) => (
                       <div key={image.id} className="prompt-detail-pending-image-item">
-                        <img src={`${API_BASE_URL}/${image.file_path}`} alt={image.file_name} />
+                        <img src={getImageUrl(image, 160)} alt={image.file_name} />
                         <button
                           type="button"
                           onClick={() => handleDeleteImage(image.id)}
@@ -439,7 +437,7 @@ const PromptDetail: React.FC = () => {
                   <div className="prompt-detail-images-grid">
                     {currentPrompt.images.map(image => (
                       <div key={image.id} className="prompt-detail-image-item">
-                        <img src={`${API_BASE_URL}/${image.file_path}`} alt={image.file_name} />
+                        <img src={getImageUrl(image, 480)} alt={image.file_name} />
                       </div>
                     ))}
                   </div>
@@ -21,6 +21,16 @@ export interface Prompt {
   group?: PromptGroup
   tags: PromptTag[]
   images: PromptImage[]
+  cover?: ImagePlaceholder | null
+}
+
+export interface ImagePlaceholder {
+  id: number
+  file_path: string
+  width?: number
+  height?: number
+  dominant_color?: string
+  placeholder?: string
 }
 
 export interface PromptGroup {
@@ -40,6 +50,14 @@ export interface PromptTag {
   created_at: string
 }
 
+export interface ImageVariant {
+  width: number
+  height: number
+  format: string
+  file_path: string
+  file_size: number
+}
+
 export interface PromptImage {
   id: number
   prompt_id: number
@@ -49,8 +67,41 @@ export interface PromptImage {
   file_type: string
   sort_order: number
   created_at: string
+  width?: number
+  height?: number
+  dominant_color?: string
+  placeholder?: string
+  variants?: ImageVariant[]
+}
+
+export interface BatchUploadItem {
+  file_name: string
+  success: boolean
+  image?: PromptImage
+  error?: string
+}
+
+export interface BatchUploadResponse {
+  items: BatchUploadItem[]
+  succeeded: number
+  failed: number
+}
+
+// 选择不小于目标宽度的最小变体（优先 WebP），没有变体时使用原图
+export const getImageUrl = (image: PromptImage, width?: number): string => {
+  const variants = (image.variants || [])
+    .filter(v => v.format === 'webp')
+    .sort((a, b) => a.width - b.width)
+  const variant = width
+    ? variants.find(v => v.width >= width) || variants[variants.length - 1]
+    : undefined
+  return `${API_BASE_URL}/${variant ? variant.file_path : image.file_path}`
 }
 
+// 按需缩放到指定尺寸（服务端缓存结果）
+export const getRenderUrl = (imageId: number, width: number, height = 0, fmt: 'webp' | 'jpeg' | 'png' = 'webp'): string =>
+  `${API_BASE_URL}/api/v1/images/${imageId}/render?w=${width}&h=${height}&fmt=${fmt}`
+
 export interface PromptListParams {
   page?: number
   page_size?: number
@@ -59,13 +110,21 @@ export interface PromptListParams {
   keyword?: string
   sort_by?: 'created_at' | 'updated_at' | 'usage_count' | 'name'
   order?: 'asc' | 'desc'
+  cursor?: string
+  total_mode?: 'exact' | 'cached' | 'estimated' | 'none'
+  include_cover?: boolean
+  fields?: string
+  snippet_len?: number
 }
 
 export interface PromptListResponse {
   items: Prompt[]
   total: number
+  total_kind?: 'exact' | 'cached' | 'estimated' | 'none'
+  has_more?: boolean
   page: number
   page_size: number
+  next_cursor?: string | null
 }
 
 export const promptApi = {
@@ -115,6 +174,17 @@ export const promptApi = {
     await api.delete('/api/v1/prompts/batch', { data: { ids } })
   },
 
+  // 批量操作：删除 / 恢复 / 移动分组（0表示移出分组） / 添加标签 / 移除标签
+  bulkOperation: async (data: {
+    action: 'delete' | 'restore' | 'move' | 'add_tags' | 'remove_tags'
+    ids: number[]
+    group_id?: number
+    tag_ids?: number[]
+  }): Promise<{ action: string; requested: number; affected: number }> => {
+    const response = await api.post('/api/v1/prompts/bulk', data)
+    return response.data
+  },
+
   // 复制Prompt
   copyPrompt: async (id: number): Promise<{ content: string }> => {
     const response = await api.post(`/api/v1/prompts/${id}/copy`)
@@ -128,6 +198,15 @@ export const groupApi = {
     return response.data
   },
 
+  // 获取分组列表和未分组的Prompt数量（X-Ungrouped-Count 响应头，无需单独请求）
+  getGroupsWithUngroupedCount: async (): Promise<{ groups: PromptGroup[]; ungroupedCount: number }> => {
+    const response = await api.get('/api/v1/groups')
+    return {
+      groups: response.data,
+      ungroupedCount: Number(response.headers['x-ungrouped-count'] ?? 0),
+    }
+  },
+
   createGroup: async (data: { name: string; description?: string; sort_order?: number }): Promise<PromptGroup> => {
     const response = await api.post('/api/v1/groups', data)
     return response.data
@@ -182,6 +261,16 @@ export const imageApi = {
     return response.data
   },
 
+  uploadImages: async (promptId: number, files: File[], sortOrder: number = 0): Promise<BatchUploadResponse> => {
+    const formData = new FormData()
+    files.forEach((file) => formData.append('files', file))
+    const response = await api.post(`/api/v1/images/${promptId}/batch`, formData, {
+      params: { sort_order: sortOrder },
+      headers: { 'Content-Type': 'multipart/form-data' },
+    })
+    return response.data
+  },
+
   deleteImage: async (imageId: number): Promise<void> => {
     await api.delete(`/api/v1/images/${imageId}`)
   },